@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import os
+from time import time
+
+from payload import PayloadSource, HEADER, wrap, PACKET_SIZE, MAX_PACKET_SIZE, SEQ_ID_SIZE, SEQ_SPACE, WRAPPING_VERSION
+from congestion import CONTROLLERS, get_controller
+from timers import TimerWheel
+from pacing import PACING_MODES, make_pacer
+from receiver import FINACK
+from sender import Sender, RECEIVER_ADDRESS, FIN_RETRIES
+from handshake import negotiate_version
+from log import logging_arguments, setup_logging
+
+# epoll sleeps in whole milliseconds, loop timers fire up to this late
+LOOP_GRANULARITY = 0.001
+
+
+class DatagramIO:
+    # Same interface as the batchio backends, on top of an asyncio transport.
+    # The transport queues whatever the kernel won't take right away
+    def __init__(self, transport):
+        self.transport = transport
+
+    def send(self, position, chunk=b''):
+        self.transport.sendto(HEADER.pack(wrap(position)) + chunk)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Transfer(Sender, asyncio.DatagramProtocol):
+    # One file to one receiver, driven by event loop callbacks instead of a
+    # blocking loop so any number of transfers can share one thread. ACK,
+    # timeout and retransmit handling is Sender's, each transfer has its own
+    # controller, RTT estimator, timers, pacer and statistics
+    def __init__(self, data, controller, address=RECEIVER_ADDRESS, pacing='rate'):
+        super().__init__(data, controller, address, None, pacing)
+        self.loop = None
+        self.transport = None
+        self.done = None
+        # Single loop timer for the earliest retransmission or paced packet
+        self.wakeup = None
+        # Transport buffer is full, stop sending until it drains
+        self.paused = False
+        # Set once every byte is acknowledged and the fin exchange starts
+        self.finishing = False
+        self.fin_attempts = 0
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.done = self.loop.create_future()
+        # Connected socket on an ephemeral port, transfers never share a port
+        transport, _ = await self.loop.create_datagram_endpoint(lambda: self, remote_addr=self.address)
+        try:
+            return await self.done
+        finally:
+            self.cancel_wakeup()
+            transport.close()
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.io = DatagramIO(transport)
+        self.pacer = make_pacer(self.pacing, self.tcp, self.rtt, transport.get_extra_info('socket'), self.data.message_size,
+                                LOOP_GRANULARITY)
+        self.stats.start()
+        self.timers = TimerWheel(time())
+        self.guarded(self.pump)
+
+    def datagram_received(self, packet, addr):
+        if self.finishing:
+            if packet[SEQ_ID_SIZE:].startswith(b'fin'):
+                self.close()
+            return
+        self.guarded(self.handle_packet, packet, time())
+        self.guarded(self.pump)
+
+    def error_received(self, exc):
+        # ICMP errors for a receiver that isn't up yet, the timers resend
+        pass
+
+    def connection_lost(self, exc):
+        if not self.done.done():
+            self.done.set_exception(exc or ConnectionError('transport closed before the transfer finished'))
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        self.guarded(self.pump)
+
+    def guarded(self, callback, *args):
+        # Errors end this transfer only, the others on the loop carry on
+        if self.done.done():
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            self.cancel_wakeup()
+            self.done.set_exception(e)
+
+    def pump(self):
+        expired = self.timers.expire(time())
+        if expired:
+            self.handle_timeout(expired)
+
+        if not self.paused:
+            self.send_window()
+
+        # Handle completion
+        if self.next_position >= len(self.data) and not self.in_flight:
+            self.finishing = True
+            self.send_fin()
+            return
+
+        # Wake up for the next paced packet or the earliest retransmission
+        # timer. Timers are armed one RTO out, so a wakeup that is already
+        # armed is rarely later than a new one and skips the timer scan
+        now = time()
+        if not self.paused and self.paced_backlog():
+            wait = self.pacer.next_time() - now
+        elif self.wakeup is not None:
+            return
+        else:
+            deadline = self.timers.next_deadline()
+            wait = self.rtt.get_RTO() if deadline is None else deadline - now
+        if self.wakeup is not None and self.wakeup.when() <= self.loop.time() + wait:
+            return
+        self.call_later(wait, self.on_wakeup)
+
+    def on_wakeup(self):
+        self.wakeup = None
+        self.guarded(self.pump)
+
+    def call_later(self, delay, callback):
+        self.cancel_wakeup()
+        self.wakeup = self.loop.call_later(max(delay, 0), callback)
+
+    def cancel_wakeup(self):
+        if self.wakeup is not None:
+            self.wakeup.cancel()
+            self.wakeup = None
+
+    def send_fin(self):
+        # Empty packet signals completion, resent until the receiver's fin
+        if self.fin_attempts == FIN_RETRIES:
+            self.close()
+            return
+        self.fin_attempts += 1
+        self.io.send(len(self.data))
+        self.call_later(self.rtt.get_RTO(), self.send_fin)
+
+    def close(self):
+        self.cancel_wakeup()
+        self.io.send(0, FINACK)
+        self.stats.stop()
+        if not self.done.done():
+            self.done.set_result(self.stats)
+
+
+async def send_file(algorithm, path, address=RECEIVER_ADDRESS, pacing='rate', packet_size=PACKET_SIZE):
+    message_size = packet_size - SEQ_ID_SIZE
+    with PayloadSource(path, message_size) as data:
+        # Same check as sender.run, the handshake blocks so it gets a thread
+        if len(data) >= SEQ_SPACE:
+            version = await asyncio.get_running_loop().run_in_executor(None, negotiate_version, address, ("0.0.0.0", 0))
+            if version < WRAPPING_VERSION:
+                raise ConnectionError(f'{path} is {len(data)} bytes, the receiver only takes files below {SEQ_SPACE} bytes')
+        return await Transfer(data, get_controller(algorithm, message_size), address, pacing).run()
+
+
+async def send_all(jobs, pacing='rate', packet_size=PACKET_SIZE):
+    # jobs: iterable of (algorithm, path, address), all sent concurrently.
+    # Returns Statistics or the exception of each job, in order
+    return await asyncio.gather(*(send_file(algorithm, path, address, pacing, packet_size) for algorithm, path, address in jobs),
+                                return_exceptions=True)
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(':')
+    return host or RECEIVER_ADDRESS[0], int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Send files to one or more receivers concurrently from one event loop')
+    parser.add_argument('files', nargs='+', help='files to send, each one goes to every receiver')
+    parser.add_argument('-a', '--algorithm', default='reno', choices=sorted(CONTROLLERS))
+    parser.add_argument('-r', '--receiver', action='append', type=parse_address, metavar='HOST:PORT',
+                        help=f'receiver address, repeat for fan-out (default {RECEIVER_ADDRESS[0]}:{RECEIVER_ADDRESS[1]})')
+    parser.add_argument('--pacing', default='rate', choices=PACING_MODES,
+                        help='none sends bursts, rate paces at cwnd/SRTT in userspace, kernel uses SO_MAX_PACING_RATE')
+    parser.add_argument('--packet-size', type=int, default=PACKET_SIZE,
+                        help=f'datagram size including the {SEQ_ID_SIZE} byte header')
+    logging_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_logging(args.log_level, args.log_sample)
+
+    if not SEQ_ID_SIZE < args.packet_size <= MAX_PACKET_SIZE:
+        parser.error(f'--packet-size must be between {SEQ_ID_SIZE + 1} and {MAX_PACKET_SIZE}')
+
+    receivers = args.receiver or [RECEIVER_ADDRESS]
+    jobs = [(args.algorithm, path, address) for path in args.files for address in receivers]
+    results = asyncio.run(send_all(jobs, args.pacing, args.packet_size))
+
+    for (_, path, address), result in zip(jobs, results):
+        print(f"{path} -> {address[0]}:{address[1]}")
+        if isinstance(result, Exception):
+            print(f"Error occurred: {result}")
+            continue
+        result.print_summary(os.path.getsize(path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+import ctypes
+import errno
+import mmap
+import os
+import select
+import socket
+import struct
+import sys
+
+from payload import HEADER, MAX_PACKET_SIZE, PacketWriter, wrap
+from log import get_logger
+
+# Datagrams per sendmmsg/recvmmsg call
+BATCH_SIZE = 64
+# ACKs are a header plus at most a few SACK blocks
+ACK_BUFFER_SIZE = 64
+
+# UDP generic segmentation offload (Linux 4.18+)
+SOL_UDP = getattr(socket, 'SOL_UDP', 17)
+UDP_SEGMENT = getattr(socket, 'UDP_SEGMENT', 103)
+GSO_MAX_SEGMENTS = 64
+
+IO_MODES = ('auto', 'mmsg', 'gso', 'plain')
+
+logger = get_logger('batchio')
+
+
+class iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+
+class msghdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint32),
+        ('msg_iov', ctypes.POINTER(iovec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int),
+    ]
+
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', msghdr), ('msg_len', ctypes.c_uint)]
+
+
+class sockaddr_in(ctypes.Structure):
+    _fields_ = [
+        ('sin_family', ctypes.c_ushort),
+        ('sin_port', ctypes.c_uint16),
+        ('sin_addr', ctypes.c_uint8 * 4),
+        ('sin_zero', ctypes.c_uint8 * 8),
+    ]
+
+
+def load_libc():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.sendmmsg
+        libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    libc.mmap.restype = ctypes.c_void_p
+    libc.mmap.argtypes = (ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long)
+    libc.munmap.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+    return libc
+
+
+libc = load_libc()
+MAP_FAILED = ctypes.c_void_p(-1).value
+
+
+def wait_writable(udp_socket):
+    select.select([], [udp_socket], [])
+
+
+def wait_readable(udp_socket, timeout):
+    return bool(select.select([udp_socket], [], [], max(timeout, 0))[0])
+
+
+class PlainIO:
+    # One sendmsg per datagram and non-blocking recv calls to drain ACKs,
+    # works everywhere
+    def __init__(self, udp_socket, address, data):
+        self.udp_socket = udp_socket
+        self.writer = PacketWriter(udp_socket, address)
+
+    def send(self, position, chunk=b''):
+        self.writer.send(position, chunk)
+
+    def flush(self):
+        pass
+
+    def recv_acks(self):
+        acks = []
+        while True:
+            try:
+                acks.append(self.udp_socket.recv(ACK_BUFFER_SIZE))
+            except BlockingIOError:
+                return acks
+
+    def close(self):
+        pass
+
+
+class MMsgIO:
+    # Queues datagrams and hands a whole window to the kernel with one
+    # sendmmsg, drains every queued ACK with one recvmmsg. Payloads are
+    # passed by address, straight out of the mapped file
+    def __init__(self, udp_socket, address, data):
+        self.udp_socket = udp_socket
+        self.fd = udp_socket.fileno()
+
+        host, port = socket.getaddrinfo(address[0], address[1], socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+        self.name = sockaddr_in(socket.AF_INET, socket.htons(port), (ctypes.c_uint8 * 4)(*socket.inet_aton(host)))
+
+        # A read-only shared mapping of its own gives payload iovecs an
+        # address: ctypes can't take one from a read-only mmap object, and a
+        # private copy-on-write one would reserve commit charge for the
+        # whole file
+        self.data = data
+        self.mapping = 0
+        self.mapping_size = 0
+        self.base = 0
+        if data.map is not None:
+            self.mapping_size = len(data.map)
+            self.mapping = libc.mmap(None, self.mapping_size, mmap.PROT_READ, mmap.MAP_SHARED, data.file.fileno(), 0)
+            if self.mapping == MAP_FAILED:
+                error = ctypes.get_errno()
+                raise OSError(error, os.strerror(error))
+            self.base = self.mapping + data.offset
+
+        # Send side: per datagram one header iovec and one payload iovec
+        self.headers = ctypes.create_string_buffer(HEADER.size * BATCH_SIZE)
+        self.send_iovs = (iovec * (2 * BATCH_SIZE))()
+        self.send_msgs = (mmsghdr * BATCH_SIZE)()
+        headers_address = ctypes.addressof(self.headers)
+        for i in range(BATCH_SIZE):
+            self.send_iovs[2 * i].iov_base = headers_address + i * HEADER.size
+            self.send_iovs[2 * i].iov_len = HEADER.size
+            hdr = self.send_msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self.name)
+            hdr.msg_namelen = ctypes.sizeof(self.name)
+            hdr.msg_iov = ctypes.pointer(self.send_iovs[2 * i])
+            hdr.msg_iovlen = 2
+        self.count = 0
+        # Payloads that don't live in the mapping, kept alive until flushed
+        self.pinned = []
+
+        # Receive side
+        self.ack_buffers = ctypes.create_string_buffer(ACK_BUFFER_SIZE * BATCH_SIZE)
+        self.recv_iovs = (iovec * BATCH_SIZE)()
+        self.recv_msgs = (mmsghdr * BATCH_SIZE)()
+        buffers_address = ctypes.addressof(self.ack_buffers)
+        for i in range(BATCH_SIZE):
+            self.recv_iovs[i].iov_base = buffers_address + i * ACK_BUFFER_SIZE
+            self.recv_iovs[i].iov_len = ACK_BUFFER_SIZE
+            hdr = self.recv_msgs[i].msg_hdr
+            hdr.msg_iov = ctypes.pointer(self.recv_iovs[i])
+            hdr.msg_iovlen = 1
+
+    def send(self, position, chunk=b''):
+        i = self.count
+        HEADER.pack_into(self.headers, i * HEADER.size, wrap(position))
+        iov = self.send_iovs[2 * i + 1]
+        if isinstance(chunk, memoryview) and chunk.obj is self.data.map:
+            iov.iov_base = self.base + position
+        else:
+            chunk = bytes(chunk)
+            self.pinned.append(chunk)
+            iov.iov_base = ctypes.cast(ctypes.c_char_p(chunk), ctypes.c_void_p).value
+        iov.iov_len = len(chunk)
+
+        self.count += 1
+        if self.count == BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        sent = 0
+        while sent < self.count:
+            result = libc.sendmmsg(self.fd, ctypes.byref(self.send_msgs, sent * ctypes.sizeof(mmsghdr)), self.count - sent, 0)
+            if result < 0:
+                error = ctypes.get_errno()
+                if error in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    wait_writable(self.udp_socket)
+                    continue
+                if error == errno.EINTR:
+                    continue
+                raise OSError(error, os.strerror(error))
+            sent += result
+
+        self.count = 0
+        self.pinned.clear()
+
+    def recv_acks(self):
+        received = libc.recvmmsg(self.fd, self.recv_msgs, BATCH_SIZE, socket.MSG_DONTWAIT, None)
+        if received < 0:
+            error = ctypes.get_errno()
+            if error in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(error, os.strerror(error))
+
+        buffers_address = ctypes.addressof(self.ack_buffers)
+        return [ctypes.string_at(buffers_address + i * ACK_BUFFER_SIZE, self.recv_msgs[i].msg_len) for i in range(received)]
+
+    def close(self):
+        self.flush()
+        if self.mapping:
+            libc.munmap(self.mapping, self.mapping_size)
+            self.mapping = 0
+
+
+class GSOIO(PlainIO):
+    # Lays consecutive full-size packets out back to back and hands them to
+    # the kernel in one sendmsg with UDP_SEGMENT, which cuts them into
+    # datagrams of segment_size. Short packets go out on their own
+    def __init__(self, udp_socket, address, data):
+        super().__init__(udp_socket, address, data)
+        self.address = address
+        self.segment_size = HEADER.size + data.message_size
+        self.max_segments = min(GSO_MAX_SEGMENTS, MAX_PACKET_SIZE // self.segment_size)
+        self.ancillary = [(SOL_UDP, UDP_SEGMENT, struct.pack('=H', self.segment_size))]
+
+        header_buffer = bytearray(HEADER.size * self.max_segments)
+        self.header_buffer = header_buffer
+        self.headers = [memoryview(header_buffer)[i * HEADER.size:(i + 1) * HEADER.size] for i in range(self.max_segments)]
+        self.buffers = []
+
+    def send(self, position, chunk=b''):
+        if HEADER.size + len(chunk) != self.segment_size:
+            self.flush()
+            self.writer.send(position, chunk)
+            return
+
+        i = len(self.buffers) // 2
+        HEADER.pack_into(self.header_buffer, i * HEADER.size, wrap(position))
+        self.buffers.append(self.headers[i])
+        self.buffers.append(chunk)
+        if i + 1 == self.max_segments:
+            self.flush()
+
+    def flush(self):
+        if not self.buffers:
+            return
+        while True:
+            try:
+                self.udp_socket.sendmsg(self.buffers, self.ancillary, 0, self.address)
+                break
+            except BlockingIOError:
+                wait_writable(self.udp_socket)
+        self.buffers.clear()
+
+    def close(self):
+        self.flush()
+
+
+def gso_supported(udp_socket):
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        # 0 leaves segmentation off, it only tests that the option exists
+        udp_socket.setsockopt(SOL_UDP, UDP_SEGMENT, 0)
+    except OSError:
+        return False
+    return True
+
+
+def make_io(mode, udp_socket, address, data):
+    # gso only batches runs of payloads exactly message_size long. Compressed
+    # chunks vary in size and parity is larger, so with --compress or --fec
+    # it mostly sends one datagram per call. mmsg batches any sizes
+    if mode == 'plain':
+        return PlainIO(udp_socket, address, data)
+    if mode == 'gso':
+        if gso_supported(udp_socket):
+            return GSOIO(udp_socket, address, data)
+        logger.warning("UDP_SEGMENT not available, falling back")
+    if libc is not None and udp_socket.family == socket.AF_INET:
+        return MMsgIO(udp_socket, address, data)
+    if mode == 'mmsg':
+        logger.warning("sendmmsg/recvmmsg not available, using plain sendmsg")
+    return PlainIO(udp_socket, address, data)
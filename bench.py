@@ -0,0 +1,332 @@
+import argparse
+import contextlib
+import csv
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import statistics
+import sys
+import tempfile
+
+from payload import PayloadSource, PACKET_SIZE, SEQ_ID_SIZE
+from congestion import CONTROLLERS, get_controller
+from pacing import PACING_MODES
+from batchio import IO_MODES
+from receiver import Receiver
+from sender import Sender
+from fec import PARITY
+from compress import CODECS, TAG_SIZE
+from netem import Emulator, Link
+
+# The four course variants
+ALGORITHMS = ('stop_and_wait', 'fixed_window', 'tahoe', 'reno')
+# Link kwargs per named condition, ACKs come back over a clean link with the same delay
+CONDITIONS = {
+    'clean': {},
+    'lossy': {'loss': 0.01},
+    'wan': {'bandwidth': 1_250_000, 'delay': 0.02, 'jitter': 0.002},
+    'lossy_wan': {'bandwidth': 1_250_000, 'delay': 0.02, 'loss': 0.01},
+    'bursty': {'bandwidth': 1_250_000, 'delay': 0.02, 'burst_start': 0.002, 'burst_end': 0.3},
+}
+DEFAULT_CONDITIONS = ('clean', 'lossy', 'wan')
+DEFAULT_SIZES = ('256K', '1M')
+DEFAULT_TRIALS = 3
+# Payload file contents: random bytes, or log lines that compress about 2:1 per packet
+PAYLOADS = ('random', 'text')
+# Wall time a single transfer may take before the trial counts as failed
+TRIAL_TIMEOUT = 120
+# Ports: sender, emulator, receiver
+SENDER_PORT = 5000
+EMULATOR_PORT = 5001
+RECEIVER_PORT = 5002
+
+# Columns of the summary dict that get aggregated
+METRICS = ('throughput', 'avg_packet_delay', 'avg_jitter', 'metric', 'timeouts', 'delay_p99', 'jitter_p99', 'duration',
+           'retransmissions', 'retransmitted_bytes', 'parity_packets', 'fec_repairs', 'wire_throughput')
+# Higher is better for these, lower for the rest
+HIGHER_IS_BETTER = ('throughput', 'metric')
+# A change smaller than this fraction of the baseline is never a regression
+REGRESSION_TOLERANCE = 0.05
+
+# Two-sided 95% Student t critical values by degrees of freedom
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+        11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086,
+        21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042,
+        40: 2.021, 60: 2.000, 120: 1.980}
+
+
+def t_critical(df):
+    # Between table entries the smaller df's value, which errs on the wide side
+    return T_95[max(limit for limit in T_95 if limit <= df)]
+
+
+def confidence_interval(values):
+    # Mean and 95% half-width, a single trial has no interval
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, 0.0
+    return mean, t_critical(len(values) - 1) * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def parse_size(value):
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper()
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def make_file(directory, size, payload='random'):
+    # Random bytes by default so compression or caching can't flatter anyone
+    path = os.path.join(directory, f'payload-{size}.bin' if payload == 'random' else f'payload-{size}.{payload}')
+    if not os.path.exists(path):
+        with open(path, 'wb') as f:
+            remaining = size
+            rng = random.Random(size)
+            while remaining:
+                block = min(remaining, 1024 * 1024)
+                f.write(os.urandom(block) if payload == 'random' else log_lines(rng, block))
+                remaining -= block
+    return path
+
+
+def log_lines(rng, size):
+    # Sensor log lines from a seeded generator, cut to exactly size bytes
+    lines = []
+    length = 0
+    while length < size:
+        line = (f"{1_700_000_000 + rng.randrange(10 ** 6)},sensor-{rng.randrange(40):02d},"
+                f"{rng.uniform(-20, 40):.3f},{rng.choice(('ok', 'warn', 'fail'))},{rng.randrange(1000)}\n")
+        lines.append(line)
+        length += len(line)
+    return ''.join(lines).encode()[:size]
+
+
+def run_receiver(port, sack, fec, compress, ready, results):
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        results.put(('received', Receiver(("0.0.0.0", port), sack=sack, fec=fec, compress=compress).run(ready)))
+
+
+def run_emulator(forward, reverse, listen_port, target_port, ready, stop, results):
+    emulator = Emulator(forward, reverse, ("0.0.0.0", listen_port), ('localhost', target_port))
+    with emulator:
+        ready.set()
+        stop.wait()
+    results.put(('emulator', emulator.summary()))
+
+
+def run_sender(algorithm, path, address, bind_port, pacing, io, packet_size, window, fec, compress, results):
+    message_size = packet_size - SEQ_ID_SIZE - max(PARITY.size if fec else 0, TAG_SIZE if compress else 0)
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        with PayloadSource(path, message_size) as data:
+            sender = Sender(data, get_controller(algorithm, message_size, window), address, ("0.0.0.0", bind_port),
+                            pacing, io, fec, compress)
+            results.put(('summary', sender.run().summary(len(data))))
+
+
+def run_trial(algorithm, condition, path, size, seed, options):
+    # Receiver, emulator and sender each get their own process so none of
+    # them competes with another for the GIL
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    receiver_ready = multiprocessing.Event()
+    emulator_ready = multiprocessing.Event()
+
+    link = CONDITIONS[condition]
+    forward = Link(**link, seed=seed)
+    reverse = Link(delay=link.get('delay', 0), seed=seed + 1)
+
+    receiver = multiprocessing.Process(target=run_receiver, args=(options.receiver_port, options.sack, options.fec,
+                                                                  options.compress is not None, receiver_ready,
+                                                                  results))
+    emulator = multiprocessing.Process(target=run_emulator, args=(forward, reverse, options.emulator_port,
+                                                                  options.receiver_port, emulator_ready, stop, results))
+    sender = multiprocessing.Process(target=run_sender, args=(algorithm, path, ('localhost', options.emulator_port),
+                                                              options.sender_port, options.pacing, options.io,
+                                                              options.packet_size, options.window, options.fec,
+                                                              options.compress, results))
+    processes = (receiver, emulator, sender)
+    try:
+        receiver.start()
+        emulator.start()
+        receiver_ready.wait(5)
+        emulator_ready.wait(5)
+        sender.start()
+        sender.join(options.timeout)
+        stop.set()
+        emulator.join(5)
+        receiver.join(5)
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    collected = {}
+    while True:
+        try:
+            key, value = results.get(timeout=0.1)
+        except queue.Empty:
+            break
+        collected[key] = value
+
+    summary = collected.get('summary')
+    return {
+        'algorithm': algorithm,
+        'condition': condition,
+        'size': size,
+        'seed': seed,
+        # Complete only if the sender finished and the receiver got every byte
+        'ok': summary is not None and collected.get('received') == size,
+        'summary': summary,
+        'emulator': collected.get('emulator'),
+    }
+
+
+def aggregate(trials):
+    # One row per (algorithm, condition, size) with mean and 95% CI of each metric
+    groups = {}
+    for trial in trials:
+        groups.setdefault((trial['algorithm'], trial['condition'], trial['size']), []).append(trial)
+
+    rows = []
+    for (algorithm, condition, size), group in groups.items():
+        done = [trial['summary'] for trial in group if trial['ok']]
+        row = {'algorithm': algorithm, 'condition': condition, 'size': size, 'trials': len(group), 'ok': len(done)}
+        for name in METRICS:
+            # Tail metrics are None for transfers too short to have them
+            values = [summary[name] for summary in done if summary[name] is not None]
+            if values:
+                row[name], row[f'{name}_ci'] = confidence_interval(values)
+            else:
+                row[name] = row[f'{name}_ci'] = None
+        rows.append(row)
+    return rows
+
+
+def find_regressions(rows, baseline, tolerance=REGRESSION_TOLERANCE):
+    # A metric regresses when it moved the wrong way by more than the
+    # tolerance and by more than both confidence intervals together
+    previous = {(row['algorithm'], row['condition'], row['size']): row for row in baseline}
+    regressions = []
+    for row in rows:
+        old = previous.get((row['algorithm'], row['condition'], row['size']))
+        if old is None:
+            continue
+        if row['ok'] < row['trials'] and old['ok'] == old['trials']:
+            regressions.append({**key_of(row), 'metric': 'ok', 'baseline': old['ok'], 'current': row['ok']})
+        for name in HIGHER_IS_BETTER + ('avg_packet_delay', 'avg_jitter', 'delay_p99'):
+            if row[name] is None or old.get(name) is None:
+                continue
+            change = row[name] - old[name] if name in HIGHER_IS_BETTER else old[name] - row[name]
+            noise = (row[f'{name}_ci'] or 0) + (old.get(f'{name}_ci') or 0)
+            if -change > max(noise, tolerance * abs(old[name])):
+                regressions.append({**key_of(row), 'metric': name, 'baseline': old[name], 'current': row[name]})
+    return regressions
+
+
+def key_of(row):
+    return {'algorithm': row['algorithm'], 'condition': row['condition'], 'size': row['size']}
+
+
+def write_csv(path, rows):
+    columns = ['algorithm', 'condition', 'size', 'trials', 'ok']
+    for name in METRICS:
+        columns += [name, f'{name}_ci']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_rows(rows):
+    print(f"{'algorithm':<17}{'condition':<10}{'size':>10}{'ok':>6}{'throughput':>24}{'wire':>12}{'delay':>22}"
+          f"{'metric':>24}{'duration':>10}{'resent':>8}")
+    for row in rows:
+        if row['throughput'] is None:
+            print(f"{row['algorithm']:<17}{row['condition']:<10}{row['size']:>10}{row['ok']:>3}/{row['trials']:<2}")
+            continue
+        print(f"{row['algorithm']:<17}{row['condition']:<10}{row['size']:>10}{row['ok']:>3}/{row['trials']:<2}"
+              f"{row['throughput']:>14.0f} ±{row['throughput_ci']:<8.0f}{row['wire_throughput']:>12.0f}"
+              f"{row['avg_packet_delay']:>12.5f} ±{row['avg_packet_delay_ci']:<8.5f}"
+              f"{row['metric']:>14.1f} ±{row['metric_ci']:<8.1f}"
+              f"{row['duration']:>10.3f}{row['retransmissions']:>8.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sweep the senders over emulated links and record the project metric')
+    parser.add_argument('-a', '--algorithms', nargs='+', default=list(ALGORITHMS), choices=sorted(CONTROLLERS))
+    parser.add_argument('-c', '--conditions', nargs='+', default=list(DEFAULT_CONDITIONS), choices=sorted(CONDITIONS))
+    parser.add_argument('-s', '--sizes', nargs='+', default=list(DEFAULT_SIZES), help='file sizes, e.g. 256K 1M')
+    parser.add_argument('-n', '--trials', type=int, default=DEFAULT_TRIALS, help='repetitions per combination')
+    parser.add_argument('--seed', type=int, default=1, help='trial i uses seed + i for its link')
+    parser.add_argument('--timeout', type=float, default=TRIAL_TIMEOUT, help='seconds before a transfer is abandoned')
+    parser.add_argument('--pacing', default='rate', choices=PACING_MODES)
+    parser.add_argument('--io', default='auto', choices=IO_MODES)
+    parser.add_argument('--packet-size', type=int, default=PACKET_SIZE)
+    parser.add_argument('--window', type=int, default=None, help='window in packets for every sender')
+    parser.add_argument('--sack', action='store_true', help='receiver appends SACK blocks to its ACKs')
+    parser.add_argument('--fec', action='store_true', help='senders add XOR parity, the receiver repairs from it')
+    parser.add_argument('--compress', choices=sorted(CODECS), help='senders compress chunks, the receiver decodes them')
+    parser.add_argument('--payload', default='random', choices=PAYLOADS,
+                        help='file contents, text compresses and random does not')
+    parser.add_argument('--sender-port', type=int, default=SENDER_PORT)
+    parser.add_argument('--emulator-port', type=int, default=EMULATOR_PORT)
+    parser.add_argument('--receiver-port', type=int, default=RECEIVER_PORT)
+    parser.add_argument('--json', help='write trials and aggregates here')
+    parser.add_argument('--csv', help='write the aggregate table here')
+    parser.add_argument('--baseline', help='compare against the aggregates in this JSON file')
+    parser.add_argument('--save-baseline', help='store the aggregates here as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help='relative change never flagged as a regression')
+    parser.add_argument('--workdir', help='where the payload files are kept (default: a temporary directory)')
+    options = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in options.sizes]
+    trials = []
+    with contextlib.ExitStack() as stack:
+        workdir = options.workdir or stack.enter_context(tempfile.TemporaryDirectory())
+        for size in sizes:
+            path = make_file(workdir, size, options.payload)
+            for condition in options.conditions:
+                for algorithm in options.algorithms:
+                    for i in range(options.trials):
+                        trial = run_trial(algorithm, condition, path, size, options.seed + i, options)
+                        trials.append(trial)
+                        status = 'ok' if trial['ok'] else 'FAILED'
+                        metric = trial['summary']['metric'] if trial['summary'] else float('nan')
+                        print(f"{algorithm} {condition} {size} trial {i + 1}/{options.trials}: {status}, metric {metric:.1f}",
+                              file=sys.stderr)
+
+    rows = aggregate(trials)
+    print_rows(rows)
+
+    regressions = []
+    if options.baseline:
+        with open(options.baseline) as f:
+            regressions = find_regressions(rows, json.load(f)['aggregates'], options.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression['algorithm']} {regression['condition']} {regression['size']} "
+                  f"{regression['metric']}: {regression['baseline']} -> {regression['current']}")
+        if not regressions:
+            print('No regressions against the baseline')
+
+    report = {'options': vars(options), 'trials': trials, 'aggregates': rows, 'regressions': regressions}
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if options.csv:
+        write_csv(options.csv, rows)
+    if options.save_baseline:
+        with open(options.save_baseline, 'w') as f:
+            json.dump({'options': vars(options), 'aggregates': rows}, f, indent=2)
+
+    # Non-zero exit so CI can gate on it
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
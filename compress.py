@@ -0,0 +1,137 @@
+import lzma
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# With compression on, every data payload starts with one of these tags
+RAW = 0
+ZLIB = 1
+LZMA = 2
+TAG_SIZE = 1
+RAW_TAG = bytes((RAW,))
+CODECS = {'zlib': ZLIB, 'lzma': LZMA}
+
+# Raw deflate without the zlib header and checksum. Past level 1 a 1 KB
+# chunk shrinks by only a few percent more for ~40% more CPU
+ZLIB_LEVEL = 1
+# Raw LZMA2 with a small dictionary, the default 8 MiB one is set up per call
+LZMA_FILTERS = [{'id': lzma.FILTER_LZMA2, 'preset': 6, 'dict_size': 1 << 16}]
+# A chunk that doesn't shrink below this fraction of itself goes out raw,
+# a few saved bytes aren't worth the receiver's decode
+MAX_RATIO = 0.9
+
+# Worker threads, chunks per task, and how many tasks run ahead of the send
+# position. zlib and lzma release the GIL while they work
+WORKERS = 2
+BATCH = 64
+AHEAD = 8
+# After a batch where nothing paid, skip this many batches, doubling up to
+# MAX_SKIP while the data stays incompressible
+MAX_SKIP = 64
+
+
+def compress(codec, chunk):
+    if codec == ZLIB:
+        compressor = zlib.compressobj(ZLIB_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return compressor.compress(chunk) + compressor.flush()
+    return lzma.compress(chunk, lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+
+
+def decode(payload):
+    # Raw bytes of one tagged payload, every chunk decodes on its own
+    tag = payload[0]
+    if tag == ZLIB:
+        return zlib.decompress(payload[TAG_SIZE:], -zlib.MAX_WBITS)
+    if tag == LZMA:
+        return lzma.decompress(payload[TAG_SIZE:], lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+    return payload[TAG_SIZE:]
+
+
+class Compressor:
+    # Tags each chunk of a PayloadSource for the wire, compressed when a
+    # worker got to it in time and it paid, raw otherwise. encode() never
+    # waits on the pool, a batch that isn't done yet just means raw chunks.
+    # Compressed payloads are handed out once, retransmissions go raw
+    def __init__(self, data, codec='zlib', workers=WORKERS):
+        self.data = data
+        self.codec = CODECS[codec]
+        self.batch = BATCH * data.message_size
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix='compress')
+        # Futures in submission order, finished ones are merged into encoded
+        self.pending = deque()
+        self.encoded = {}
+        # Everything below this has been submitted or skipped
+        self.submitted = 0
+        # Highest position asked for, encodings below it are stale
+        self.position = 0
+        self.skip = 0
+        self.skipping = 0
+
+        self.compressed_chunks = 0
+        self.raw_chunks = 0
+
+    def encode(self, position, chunk):
+        if position > self.position:
+            self.position = position
+        self.harvest()
+        self.submit()
+
+        payload = self.encoded.pop(position, None)
+        if payload is None:
+            self.raw_chunks += 1
+            return RAW_TAG + chunk
+        self.compressed_chunks += 1
+        return payload
+
+    def resend(self, chunk):
+        # Retransmissions go raw and aren't counted, the counts are of chunks
+        return RAW_TAG + chunk
+
+    def harvest(self):
+        pending = self.pending
+        while pending and pending[0].done():
+            tried, encoded = pending.popleft().result()
+            if encoded:
+                self.skip = 0
+            elif tried:
+                self.skip = min(2 * self.skip or 1, MAX_SKIP)
+                self.skipping = self.skip
+            position = self.position
+            self.encoded.update(item for item in encoded.items() if item[0] >= position)
+
+    def submit(self):
+        size = len(self.data)
+        # Nothing below the send position is worth compressing, a resumed
+        # transfer starts past 0
+        self.submitted = max(self.submitted, self.position)
+        limit = min(self.position + AHEAD * self.batch, size)
+        while self.submitted < limit:
+            start = self.submitted
+            self.submitted = min(start + self.batch, size)
+            if self.skipping:
+                self.skipping -= 1
+                continue
+            self.pending.append(self.pool.submit(self.encode_batch, start, self.submitted))
+
+    def encode_batch(self, start, end):
+        # Runs in a worker: chunks tried and {position: tagged payload} of
+        # those that paid. Chunks the send loop already passed went out raw, a worker
+        # that fell behind skips ahead to the send position
+        codec = self.codec
+        tag = bytes((codec,))
+        view = self.data.view
+        message_size = self.data.message_size
+        tried = 0
+        encoded = {}
+        for position in range(start, end, message_size):
+            if position < self.position:
+                continue
+            tried += 1
+            chunk = view[position:position + message_size]
+            body = compress(codec, chunk)
+            if len(body) <= len(chunk) * MAX_RATIO:
+                encoded[position] = tag + body
+        return tried, encoded
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
@@ -0,0 +1 @@
+# The modules live at the top of the repository, tests import them from here
@@ -0,0 +1,571 @@
+from time import time
+
+from payload import MESSAGE_SIZE
+
+# Constants
+TIMEOUT_DURATION = 1
+DUPE_ACK_THRESHOLD = 3
+# In packets, controllers scale them by their segment size (mss)
+# Window = 1 packet, SSHThresh = 64 packets
+INITIAL_WINDOW = 1
+SSH_THRESHOLD = 64
+WINDOW_SIZE = 100
+# Never let a loss shrink ssthresh below 2 packets
+MIN_SSH_THRESHOLD = 2
+# RFC 3465 limit L: slow start credits an ACK with at most this many
+# segments, scaled up to the typical ACK when every ACK is a stretch ACK
+ABC_LIMIT = 2
+# EWMA gain of the typical bytes per ACK
+ACK_SIZE_GAIN = 1 / 8
+
+# {name: controller class}
+CONTROLLERS = {}
+
+
+def register(name):
+    def decorator(cls):
+        cls.name = name
+        CONTROLLERS[name] = cls
+        return cls
+    return decorator
+
+
+def get_controller(name, mss=MESSAGE_SIZE, window=None):
+    # window (packets) overrides the starting window of any controller
+    if name not in CONTROLLERS:
+        raise ValueError(f"Unknown congestion controller '{name}', choose from: {', '.join(sorted(CONTROLLERS))}")
+    controller = CONTROLLERS[name](mss)
+    if window is not None:
+        controller.set_Window(window)
+    return controller
+
+
+class Controller:
+    # RTTEstimator shared by the sender
+    rtt = None
+    # On timeout resend every in-flight packet instead of going back to the base
+    retransmit_all = False
+    # Wall clock by default, instances can be handed another clock
+    clock = staticmethod(time)
+
+    def __init__(self, mss=MESSAGE_SIZE):
+        self.mss = mss
+        self.cwnd = INITIAL_WINDOW * self.mss
+
+    # Retransmission timeout in seconds until the first RTT sample arrives.
+    # Read when the sender starts, so the simulator can sweep TIMEOUT_DURATION
+    @property
+    def timeout_duration(self):
+        return TIMEOUT_DURATION
+
+    def handle_ACK(self, position):
+        return True
+
+    def get_Window(self):
+        return self.cwnd
+
+    # Window in packets, fixed-window controllers keep it, the adaptive ones
+    # grow or shrink from it. Safe to call while a transfer is running
+    def set_Window(self, packets):
+        self.cwnd = packets * self.mss
+
+    # Bytes per second the sender should pace at, None sends the window as a burst
+    def get_PacingRate(self):
+        return None
+
+    # Called with every valid RTT sample (Karn's rule applies)
+    def handle_RTT(self, rtt):
+        pass
+
+    def handle_timeout(self):
+        pass
+
+    # A resumed transfer's first ACK is not progress from 0
+    def resume(self, position):
+        self.lastACK = position
+
+
+@register('stop_and_wait')
+class StopAndWait(Controller):
+    # One packet outstanding at a time
+    pass
+
+
+@register('fixed_window')
+class FixedWindow(Controller):
+    retransmit_all = True
+
+    def __init__(self, mss=MESSAGE_SIZE):
+        self.mss = mss
+        self.cwnd = WINDOW_SIZE * self.mss
+        self.lastACK = 0
+
+    # A whole window is in flight before the first sample, give it longer
+    @property
+    def timeout_duration(self):
+        return 2 * TIMEOUT_DURATION
+
+    def handle_ACK(self, position):
+        self.lastACK = max(self.lastACK, position)
+        return True
+
+    def get_Window(self):
+        #First Window of packets reaches timeout, want to see if reducing # of initial packets helps
+        if self.lastACK == 0:
+            return self.cwnd // 2
+        return self.cwnd
+
+
+# Auto-tuned window bounds (packets), headroom over the measured BDP, and
+# how far the window moves toward its target each round
+AUTO_MIN_WINDOW = 4
+AUTO_MAX_WINDOW = 1024
+AUTO_BDP_GAIN = 1.25
+AUTO_RATE_ROUNDS = 10
+AUTO_SMOOTHING = 0.25
+
+
+@register('auto_window')
+class AutoWindow(FixedWindow):
+    # Fixed window sizing without hand tuning. A probe phase doubles the
+    # window every round until the ACK rate stops growing, then the window is
+    # set to the bandwidth-delay product (max ACK rate x min RTT) and keeps
+    # following it round by round, clamped to [minWindow, maxWindow]
+    timeout_duration = Controller.timeout_duration
+
+    def __init__(self, mss=MESSAGE_SIZE):
+        self.mss = mss
+        self.minWindow = AUTO_MIN_WINDOW * self.mss
+        self.maxWindow = AUTO_MAX_WINDOW * self.mss
+        self.cwnd = self.minWindow
+        self.probing = True
+
+        # Windowed max of the per-round ACK rate, and min RTT
+        self.rateSamples = []
+        self.ackRate = 0
+        self.minRTT = None
+
+        self.roundStart = None
+        self.roundDelivered = 0
+        self.fullRate = 0
+        self.flatRounds = 0
+        self.lastACK = 0
+
+    def handle_ACK(self, position):
+        if position > self.lastACK:
+            self.roundDelivered += position - self.lastACK
+            self.lastACK = position
+
+            # A round is one min RTT of ACKs
+            now = self.clock()
+            if self.roundStart is None:
+                self.roundStart = now
+            elif self.minRTT and now - self.roundStart >= self.minRTT:
+                self.handle_round(now)
+
+        return True
+
+    def handle_round(self, now):
+        self.rateSamples.append(self.roundDelivered / (now - self.roundStart))
+        del self.rateSamples[:-AUTO_RATE_ROUNDS]
+        self.ackRate = max(self.rateSamples)
+        self.roundStart = now
+        self.roundDelivered = 0
+
+        if self.probing:
+            # Double while the ACK rate still grows by 25%, hold the window
+            # when it doesn't, 3 flat rounds mean the pipe is full
+            if self.ackRate >= self.fullRate * 1.25:
+                self.fullRate = self.ackRate
+                self.flatRounds = 0
+                self.cwnd = min(self.cwnd * 2, self.maxWindow)
+            else:
+                self.flatRounds += 1
+            if self.flatRounds >= 3 or self.cwnd >= self.maxWindow:
+                self.probing = False
+                self.cwnd = self.get_Target()
+        else:
+            self.cwnd += (self.get_Target() - self.cwnd) * AUTO_SMOOTHING
+
+    def get_Target(self):
+        return min(max(AUTO_BDP_GAIN * self.ackRate * self.minRTT, self.minWindow), self.maxWindow)
+
+    def get_Window(self):
+        return int(self.cwnd)
+
+    # --window caps the tuned window instead of fixing it
+    def set_Window(self, packets):
+        self.maxWindow = max(packets * self.mss, self.minWindow)
+        self.cwnd = min(self.cwnd, self.maxWindow)
+
+    def handle_RTT(self, rtt):
+        if self.minRTT is None or rtt < self.minRTT:
+            self.minRTT = rtt
+
+    def handle_timeout(self):
+        # The whole window is resent, shrink it so that doesn't repeat
+        self.probing = False
+        self.cwnd = max(self.cwnd / 2, self.minWindow)
+
+
+@register('go_back_n')
+class GoBackN(Controller):
+    # Go-Back-N ARQ: a fixed window of packets, a timeout resends every
+    # outstanding packet from the base. Unlike fixed_window the RTO follows
+    # the RTT estimate and the whole window is used from the start
+    retransmit_all = True
+
+    def __init__(self, mss=MESSAGE_SIZE):
+        self.mss = mss
+        self.cwnd = WINDOW_SIZE * self.mss
+
+
+@register('selective_repeat')
+class SelectiveRepeat(GoBackN):
+    # Selective-Repeat ARQ: same fixed window, but every packet has its own
+    # timer and only the packets whose timers expire are resent. With a
+    # SACK receiver that is exactly the lost ones
+    retransmit_all = False
+
+
+class ByteCounting(Controller):
+    # Appropriate Byte Counting (RFC 3465): the window grows by the bytes an
+    # ACK covers, not once per ACK. Slow start adds up to L segments per ACK,
+    # congestion avoidance one segment per cwnd bytes acknowledged. L scales
+    # with the typical ACK: when the receiver or the path coalesces ACKs every
+    # one of them covers several segments and a fixed L would stall growth,
+    # while a lone ACK far above the usual, like the cumulative jump after a
+    # repaired hole, is still clamped instead of releasing a burst.
+    # grow_Window drives the slowStart/congestionAvoid states of subclasses
+    def __init__(self, mss=MESSAGE_SIZE):
+        self.mss = mss
+        self.sshThresh = SSH_THRESHOLD * self.mss
+        self.cwnd = INITIAL_WINDOW * self.mss
+
+        # Bytes acknowledged towards the next congestion avoidance segment
+        self.bytesAcked = 0
+        # Typical bytes per new ACK, clamped samples so one outlier can't raise it
+        self.ackSize = self.mss
+
+    def get_SlowStartIncrease(self, acked):
+        limit = ABC_LIMIT * max(self.mss, self.ackSize)
+        increase = min(acked, limit)
+        self.ackSize += (increase - self.ackSize) * ACK_SIZE_GAIN
+        return increase
+
+    def grow_Window(self, acked):
+        # Called with the bytes of every new ACK outside loss recovery
+        if self.slowStart:
+            increase = self.get_SlowStartIncrease(acked)
+            room = self.sshThresh - self.cwnd
+            if increase < room:
+                self.cwnd += increase
+                return
+            # Slow start ends at ssthresh, the rest counts towards avoidance
+            self.cwnd = max(self.cwnd, self.sshThresh)
+            self.bytesAcked = max(0, increase - room)
+            self.slowStart = False
+            self.congestionAvoid = True
+        elif self.congestionAvoid:
+            self.bytesAcked += acked
+            if self.bytesAcked >= self.cwnd:
+                self.bytesAcked -= self.cwnd
+                self.cwnd += self.mss
+
+    def reset_Growth(self):
+        # Window changed by a loss, avoidance credit starts over
+        self.bytesAcked = 0
+
+
+@register('reno')
+class TCPReno(ByteCounting):
+    def __init__(self, mss=MESSAGE_SIZE):
+        super().__init__(mss)
+        self.slowStart = True
+        self.congestionAvoid = False
+        self.fastRecovery = False
+
+        self.dupeACKS = 0
+
+        self.lastACK = 0
+        self.recoveryACK = 0
+
+    def handle_ACK(self, position):
+        # New ACK
+        if position > self.lastACK:
+            if self.fastRecovery: #Work on this section
+                if position >= self.recoveryACK:
+                    self.cwnd = self.sshThresh
+                    self.dupeACKS = 0
+                    self.reset_Growth()
+
+                    self.fastRecovery = False
+                    self.congestionAvoid = True
+            else:
+                self.grow_Window(position - self.lastACK)
+
+            self.lastACK = position
+            self.dupeACKS = 0
+
+        # Dupe ACK
+        elif position == self.lastACK:
+            self.dupeACKS += 1
+
+            if self.dupeACKS == DUPE_ACK_THRESHOLD:
+                self.handle_fastRecovery()
+            elif self.fastRecovery:
+                self.cwnd += self.mss
+
+        return True
+
+    def handle_timeout(self):
+        self.sshThresh = max(self.cwnd // 2, MIN_SSH_THRESHOLD * self.mss)
+        self.cwnd = self.mss
+        self.reset_Growth()
+
+        self.fastRecovery = False
+        self.slowStart = True
+        self.congestionAvoid = False
+
+    def handle_fastRecovery(self):
+        self.sshThresh = max(self.cwnd // 2, MIN_SSH_THRESHOLD * self.mss)
+        #Make room for up to 3 dupes
+        self.cwnd = self.sshThresh + (3 * self.mss)
+        self.recoveryACK = self.lastACK
+
+        self.fastRecovery = True
+        self.slowStart = False
+        self.congestionAvoid = False
+
+
+@register('tahoe')
+class TCPTahoe(ByteCounting):
+    def __init__(self, mss=MESSAGE_SIZE):
+        super().__init__(mss)
+        self.slowStart = True
+        self.congestionAvoid = False
+
+        self.dupeACKS = 0
+        self.lastACK = 0
+
+    def handle_ACK(self, ack_position):
+        # New ACK
+        if ack_position > self.lastACK:
+            self.grow_Window(ack_position - self.lastACK)
+
+            self.lastACK = ack_position
+            self.dupeACKS = 0
+
+        # Duplicate ACK
+        elif ack_position == self.lastACK:
+            self.dupeACKS += 1
+            if self.dupeACKS == DUPE_ACK_THRESHOLD:
+                self.handle_fastRetransmit()
+
+        return True
+
+    def handle_timeout(self):
+        self.sshThresh = max(self.cwnd // 2, MIN_SSH_THRESHOLD * self.mss)
+        self.cwnd = self.mss
+        self.reset_Growth()
+        self.slowStart = True
+        self.congestionAvoid = False
+
+    def handle_fastRetransmit(self):
+        self.sshThresh = max(self.cwnd // 2, MIN_SSH_THRESHOLD * self.mss)
+        self.cwnd = self.mss
+        self.reset_Growth()
+        self.slowStart = True
+        self.congestionAvoid = False
+
+
+# CUBIC scaling constant and multiplicative decrease (RFC 8312)
+CUBIC_C = 0.4
+CUBIC_BETA = 0.7
+
+
+@register('cubic')
+class TCPCubic(ByteCounting):
+    # Slow start is byte counted like Reno's, avoidance follows the cubic curve
+    def __init__(self, mss=MESSAGE_SIZE):
+        super().__init__(mss)
+
+        # Window before the last loss and the cubic curve fitted through it
+        self.wMax = 0
+        self.epochStart = None
+        self.originPoint = 0
+        self.K = 0
+
+        self.dupeACKS = 0
+        self.lastACK = 0
+
+    def handle_ACK(self, position):
+        # New ACK
+        if position > self.lastACK:
+            acked = position - self.lastACK
+            if self.cwnd < self.sshThresh:
+                self.cwnd += self.get_SlowStartIncrease(acked)
+            else:
+                self.handle_congestionAvoid(acked)
+
+            self.lastACK = position
+            self.dupeACKS = 0
+
+        # Duplicate ACK
+        elif position == self.lastACK:
+            self.dupeACKS += 1
+            if self.dupeACKS == DUPE_ACK_THRESHOLD:
+                self.handle_loss()
+
+        return True
+
+    def handle_congestionAvoid(self, acked):
+        now = self.clock()
+        if self.epochStart is None:
+            self.epochStart = now
+            if self.cwnd < self.wMax:
+                self.K = ((self.wMax - self.cwnd) / self.mss / CUBIC_C) ** (1 / 3)
+                self.originPoint = self.wMax
+            else:
+                self.K = 0
+                self.originPoint = self.cwnd
+
+        # Window growth depends on the time since the last loss, not on the ACK rate
+        t = now - self.epochStart
+        target = self.originPoint + CUBIC_C * (t - self.K) ** 3 * self.mss
+
+        # Never grow slower than Reno would on the same path
+        if self.rtt is not None and self.rtt.srtt:
+            reno = self.wMax * CUBIC_BETA + 3 * (1 - CUBIC_BETA) / (1 + CUBIC_BETA) * (t / self.rtt.srtt) * self.mss
+            target = max(target, reno)
+
+        if target > self.cwnd:
+            self.cwnd += (target - self.cwnd) * acked / self.cwnd
+        else:
+            self.cwnd += self.mss * acked / (100 * self.cwnd)
+
+    def handle_loss(self):
+        self.epochStart = None
+        # Fast convergence, release bandwidth to newer flows
+        if self.cwnd < self.wMax:
+            self.wMax = self.cwnd * (1 + CUBIC_BETA) / 2
+        else:
+            self.wMax = self.cwnd
+        self.cwnd = max(self.cwnd * CUBIC_BETA, MIN_SSH_THRESHOLD * self.mss)
+        self.sshThresh = self.cwnd
+
+    def handle_timeout(self):
+        self.handle_loss()
+        self.cwnd = self.mss
+
+
+# BBR gains and filter lengths
+BBR_HIGH_GAIN = 2.885
+BBR_PROBE_GAINS = (1.25, 0.75, 1, 1, 1, 1, 1, 1)
+BBR_BW_ROUNDS = 10
+BBR_MIN_RTT_WINDOW = 10
+BBR_PROBE_RTT_DURATION = 0.2
+BBR_MIN_WINDOW = 4  # packets
+
+
+@register('bbr')
+class BBR(Controller):
+    # Model based: cwnd and pacing rate follow the estimated bottleneck
+    # bandwidth and min RTT instead of reacting to every loss
+    def __init__(self, mss=MESSAGE_SIZE):
+        self.mss = mss
+        self.state = 'startup'
+        self.pacingGain = BBR_HIGH_GAIN
+        self.cwndGain = BBR_HIGH_GAIN
+        self.cwnd = BBR_MIN_WINDOW * self.mss
+
+        # Windowed max of the delivery rate, one sample per round
+        self.bwSamples = []
+        self.btlBw = 0
+        self.minRTT = None
+        self.minRTTStamp = 0
+
+        # Round tracking
+        self.roundStart = None
+        self.roundDelivered = 0
+        self.fullBw = 0
+        self.fullBwRounds = 0
+        self.cycleIndex = 0
+        self.probeRTTDone = 0
+
+        self.lastACK = 0
+
+    def handle_ACK(self, position):
+        if position > self.lastACK:
+            self.roundDelivered += position - self.lastACK
+            self.lastACK = position
+
+            now = self.clock()
+            if self.roundStart is None:
+                self.roundStart = now
+            elif self.minRTT and now - self.roundStart >= self.minRTT:
+                self.handle_round(now)
+
+            self.update_Window()
+
+        return True
+
+    def handle_round(self, now):
+        self.bwSamples.append(self.roundDelivered / (now - self.roundStart))
+        del self.bwSamples[:-BBR_BW_ROUNDS]
+        self.btlBw = max(self.bwSamples)
+        self.roundStart = now
+        self.roundDelivered = 0
+
+        if self.state == 'startup':
+            # Bottleneck is full once bandwidth stops growing by 25% for 3 rounds
+            if self.btlBw >= self.fullBw * 1.25:
+                self.fullBw = self.btlBw
+                self.fullBwRounds = 0
+            else:
+                self.fullBwRounds += 1
+                if self.fullBwRounds >= 3:
+                    self.state = 'drain'
+                    self.pacingGain = 1 / BBR_HIGH_GAIN
+        elif self.state == 'drain':
+            # Queue built during startup has had one round to drain
+            self.enter_probeBw()
+        elif self.state == 'probe_bw':
+            self.cycleIndex = (self.cycleIndex + 1) % len(BBR_PROBE_GAINS)
+            self.pacingGain = BBR_PROBE_GAINS[self.cycleIndex]
+        elif self.state == 'probe_rtt' and now >= self.probeRTTDone:
+            self.minRTTStamp = now
+            self.enter_probeBw()
+
+        # Min RTT went stale, drain the pipe briefly to measure it again
+        if self.state != 'probe_rtt' and now - self.minRTTStamp > BBR_MIN_RTT_WINDOW:
+            self.state = 'probe_rtt'
+            self.pacingGain = 1
+            self.probeRTTDone = now + max(BBR_PROBE_RTT_DURATION, self.minRTT)
+            self.minRTT = None
+
+    def enter_probeBw(self):
+        self.state = 'probe_bw'
+        self.cwndGain = 2
+        self.cycleIndex = 0
+        self.pacingGain = BBR_PROBE_GAINS[0]
+
+    def update_Window(self):
+        if self.state == 'probe_rtt':
+            self.cwnd = BBR_MIN_WINDOW * self.mss
+        elif self.btlBw and self.minRTT:
+            self.cwnd = max(self.cwndGain * self.btlBw * self.minRTT, BBR_MIN_WINDOW * self.mss)
+
+    def get_PacingRate(self):
+        if not self.btlBw:
+            return None
+        return self.pacingGain * self.btlBw
+
+    def handle_RTT(self, rtt):
+        if self.minRTT is None or rtt <= self.minRTT:
+            self.minRTT = rtt
+            self.minRTTStamp = self.clock()
+
+    def handle_timeout(self):
+        # Keep the model, only fall back to a small window until ACKs return
+        self.cwnd = BBR_MIN_WINDOW * self.mss
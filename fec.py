@@ -0,0 +1,148 @@
+import struct
+
+from payload import HEADER, FEC_ID, unwrap, wrap
+
+# Parity payload: group start and end positions and the packet stride, then
+# the XOR of the group's payloads, each zero-padded to the stride
+PARITY = struct.Struct('>iiH')
+# Reply to each parity packet: group start, data packets in the group, how
+# many of them were missing when the parity arrived and how many of those
+# were rebuilt
+REPORT = struct.Struct('>iHHH')
+
+# Data packets per parity packet, adapted between these bounds
+MIN_GROUP = 2
+MAX_GROUP = 16
+# Group size aims for this many losses per group on average, XOR parity
+# repairs one loss per group and no more
+TARGET_LOSSES = 0.25
+# EWMA gain of the loss rate estimate, per report
+LOSS_GAIN = 1 / 8
+
+
+def group_size(loss_rate):
+    # K data packets plus one parity packet see (K + 1) * loss losses
+    if loss_rate <= 0:
+        return MAX_GROUP
+    return max(MIN_GROUP, min(MAX_GROUP, int(TARGET_LOSSES / loss_rate) - 1))
+
+
+class ParityEncoder:
+    # Sender side. Every first transmission is XORed into the open group,
+    # which closes after size packets or at the end of the data.
+    # Retransmissions stay outside the groups. With adaptive=True the group
+    # size follows the loss rate the receiver reports
+    def __init__(self, message_size, size=MAX_GROUP, adaptive=True):
+        self.message_size = message_size
+        self.size = size
+        self.adaptive = adaptive
+        self.loss_rate = 0.0
+
+        self.start = 0
+        self.end = 0
+        self.count = 0
+        # Payloads as little-endian integers, so shorter ones are zero-padded
+        self.parity = 0
+        # {start: end} of groups whose parity is out but not reported on
+        self.pending = {}
+
+    def add(self, position, chunk, last=False):
+        # Returns the parity payload when this packet closes a group
+        if not self.count:
+            self.start = position
+        self.parity ^= int.from_bytes(chunk, 'little')
+        self.count += 1
+        self.end = position + len(chunk)
+        if self.count >= self.size or last:
+            return self.close()
+        return None
+
+    def close(self):
+        payload = PARITY.pack(wrap(self.start), wrap(self.end), self.message_size) + self.parity.to_bytes(self.message_size, 'little')
+        self.pending[self.start] = self.end
+        self.count = 0
+        self.parity = 0
+        return payload
+
+    def is_open(self, position):
+        return self.count > 0 and position >= self.start
+
+    def awaiting(self, position):
+        # True while the parity of a closed group may still repair the
+        # packet at position. Groups entirely below position are forgotten,
+        # their parity was lost
+        pending = self.pending
+        while pending:
+            start = next(iter(pending))
+            if pending[start] > position:
+                break
+            del pending[start]
+        for start, end in pending.items():
+            if position < start:
+                break
+            if position < end:
+                return True
+        return False
+
+    def report(self, start, packets, missing):
+        # Returns the group's end, None if it was already forgotten. Lost
+        # parity packets never get a report, so the loss rate comes out
+        # slightly low
+        self.loss_rate += (missing / packets - self.loss_rate) * LOSS_GAIN
+        if self.adaptive:
+            self.size = group_size(self.loss_rate)
+        return self.pending.pop(start, None)
+
+
+class ParityDecoder:
+    # Receiver side. Delivered payloads are kept until the parity of their
+    # group arrives, a group missing exactly one packet is rebuilt from the
+    # parity and the others
+    def __init__(self):
+        # {position: payload} delivered since the last parity packet
+        self.delivered = {}
+        # Groups end below here, so later arrivals below it are not kept
+        self.horizon = 0
+        self.repaired = 0
+
+    def keep(self, position, payload):
+        if position >= self.horizon:
+            self.delivered[position] = payload
+
+    def repair(self, payload, expected, buffered):
+        # Returns the report for the sender and the rebuilt (position,
+        # payload) or None. Positions are below expected once delivered
+        start, end, stride = PARITY.unpack_from(payload)
+        start, end = unwrap(start, expected), unwrap(end, expected)
+        value = int.from_bytes(payload[PARITY.size:], 'little')
+        packets = range(start, end, stride)
+        missing = []
+        complete = True
+        for position in packets:
+            chunk = buffered.get(position)
+            if chunk is None:
+                chunk = self.delivered.get(position)
+            if chunk is not None:
+                value ^= int.from_bytes(chunk, 'little')
+            elif position >= expected:
+                missing.append(position)
+            else:
+                # Delivered before anything was kept, nothing to XOR with
+                complete = False
+
+        rebuilt = None
+        if len(missing) == 1 and complete:
+            position = missing[0]
+            rebuilt = position, value.to_bytes(stride, 'little')[:min(stride, end - position)]
+            self.repaired += 1
+
+        if end > self.horizon:
+            self.horizon = end
+            self.delivered = {position: chunk for position, chunk in self.delivered.items() if position >= end}
+        report = REPORT.pack(wrap(start), len(packets), len(missing), rebuilt is not None)
+        return HEADER.pack(FEC_ID) + report, rebuilt
+
+
+def parse_report(packet, reference=0):
+    start, packets, missing, repaired = REPORT.unpack_from(packet, HEADER.size)
+    return unwrap(start, reference), packets, missing, repaired
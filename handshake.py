@@ -0,0 +1,49 @@
+import os
+import socket
+
+from payload import build_hello, build_resume, parse_hello, parse_resume, HEADER_VERSION, PACKET_SIZE, RESUME_DIGEST_SIZE
+
+HELLO_TIMEOUT = 0.2
+HELLO_ATTEMPTS = 3
+
+
+def exchange(address, bind_address, request, parse):
+    # Sends request until a reply parses to something other than None,
+    # returns it, or None once every attempt timed out
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
+        udp_socket.bind(bind_address)
+        udp_socket.settimeout(HELLO_TIMEOUT)
+        for _ in range(HELLO_ATTEMPTS):
+            udp_socket.sendto(request, address)
+            try:
+                while True:
+                    reply, addr = udp_socket.recvfrom(PACKET_SIZE)
+                    parsed = parse(reply)
+                    if parsed is not None:
+                        return parsed
+            except socket.timeout:
+                continue
+    return None
+
+
+def negotiate_version(address, bind_address, version=HEADER_VERSION):
+    # Offers our highest header version and returns the one the receiver
+    # agrees to. Receivers that never answer, like the course receiver,
+    # only speak version 1
+    agreed = exchange(address, bind_address, build_hello(version), parse_hello)
+    return 1 if agreed is None else min(agreed, version)
+
+
+def negotiate_resume(address, bind_address, limit, unit):
+    # Asks the receiver to keep at most limit bytes of what it has, rounded
+    # down to a multiple of unit, and returns the offset it kept with the
+    # SHA-256 of its bytes below it. None if it never answers. The token
+    # makes a late duplicate of the request harmless
+    token = int.from_bytes(os.urandom(4), 'big')
+
+    def parse(reply):
+        answer = parse_resume(reply)
+        if answer is None or answer[0] != token or len(answer[3]) != RESUME_DIGEST_SIZE:
+            return None
+        return answer[1], answer[3]
+    return exchange(address, bind_address, build_resume(token, limit, unit), parse)
@@ -0,0 +1,92 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+# Every module logs under this parent, setup_logging configures it once
+ROOT_LOGGER = 'udp'
+LOG_LEVELS = ('debug', 'info', 'warning', 'error')
+DEFAULT_LEVEL = 'warning'
+# Repeats of one message pass through 1 in SAMPLE_EVERY times
+SAMPLE_EVERY = 100
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# Listener thread of the last setup_logging call and the process it runs in
+active_listener = None
+
+
+def get_logger(name):
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+class SamplingFilter(logging.Filter):
+    # Lets the first record of each message template through, then one in
+    # every `every`, and notes how many were skipped in between. Warnings
+    # and errors always pass. Runs before formatting, so a dropped record
+    # never builds its message string
+    def __init__(self, every=SAMPLE_EVERY):
+        super().__init__()
+        self.every = every
+        # {template: records seen}
+        self.seen = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every <= 1:
+            return True
+        seen = self.seen.get(record.msg, 0)
+        self.seen[record.msg] = seen + 1
+        if seen % self.every:
+            return False
+        if seen:
+            record.msg = f'{record.msg} [1 of {self.every}, {seen} so far]'
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # QueueHandler.prepare formats the message on the calling thread so the
+    # record can be pickled. This queue never leaves the process, so records
+    # go in as they are and the listener thread formats them
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level=DEFAULT_LEVEL, sample=SAMPLE_EVERY, stream=None):
+    # Records go through a queue to a listener thread, so the send loop
+    # only pays for the level check, the sampling filter and a queue put,
+    # formatting happens on the listener thread.
+    # Safe to call again, e.g. in pool workers after a fork. The previous
+    # listener drains its queue and stops, a forked child only inherits
+    # the parent's and leaves it alone
+    global active_listener
+    logger = logging.getLogger(ROOT_LOGGER)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    if active_listener is not None:
+        previous, pid = active_listener
+        atexit.unregister(previous.stop)
+        if pid == os.getpid():
+            previous.stop()
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(SamplingFilter(sample))
+    logger.addHandler(handler)
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(records, output)
+    listener.start()
+    atexit.register(listener.stop)
+    active_listener = listener, os.getpid()
+    return listener
+
+
+def logging_arguments(parser):
+    parser.add_argument('--log-level', default=DEFAULT_LEVEL, choices=LOG_LEVELS,
+                        help='info shows timeouts and fallbacks, debug every retransmission')
+    parser.add_argument('--log-sample', type=int, default=SAMPLE_EVERY, metavar='N',
+                        help='log 1 in N repeats of a below-warning message (1 logs all)')
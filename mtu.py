@@ -0,0 +1,76 @@
+import socket
+import sys
+
+from payload import HEADER, PROBE_ID, PACKET_SIZE, MAX_PACKET_SIZE, SEQ_ID_SIZE
+
+PROBE_TIMEOUT = 0.2
+PROBE_ATTEMPTS = 3
+# Stop the search once the bounds are this close, in bytes
+PROBE_PRECISION = 16
+
+# Linux: set DF and ignore the cached path MTU so oversized probes fail
+# instead of being fragmented
+IP_MTU_DISCOVER = getattr(socket, 'IP_MTU_DISCOVER', 10)
+IP_PMTUDISC_PROBE = getattr(socket, 'IP_PMTUDISC_PROBE', 3)
+
+
+def build_probe(size):
+    return HEADER.pack(PROBE_ID) + bytes(size - SEQ_ID_SIZE)
+
+
+def parse_probe_reply(reply):
+    # PROBE_ID + b'probe' + size of the probe that arrived
+    if len(reply) < 2 * HEADER.size + 5 or HEADER.unpack_from(reply)[0] != PROBE_ID or reply[HEADER.size:HEADER.size + 5] != b'probe':
+        return None
+    return HEADER.unpack_from(reply, HEADER.size + 5)[0]
+
+
+def build_probe_reply(size):
+    return HEADER.pack(PROBE_ID) + b'probe' + HEADER.pack(size)
+
+
+def probe(udp_socket, address, size):
+    for _ in range(PROBE_ATTEMPTS):
+        try:
+            udp_socket.sendto(build_probe(size), address)
+        except OSError:
+            # EMSGSIZE, bigger than the local interface allows
+            return False
+
+        try:
+            while True:
+                reply, addr = udp_socket.recvfrom(PACKET_SIZE)
+                if parse_probe_reply(reply) == size:
+                    return True
+        except socket.timeout:
+            continue
+    return False
+
+
+def probe_packet_size(address, bind_address, low=PACKET_SIZE, high=MAX_PACKET_SIZE):
+    # Receivers that don't answer probes keep the base size, never more
+    # than high
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
+        udp_socket.bind(bind_address)
+        udp_socket.settimeout(PROBE_TIMEOUT)
+        if sys.platform.startswith('linux'):
+            udp_socket.setsockopt(socket.IPPROTO_IP, IP_MTU_DISCOVER, IP_PMTUDISC_PROBE)
+        return search_packet_size(udp_socket, address, low, high)
+
+
+def search_packet_size(udp_socket, address, low, high):
+    # PLPMTUD-style search (RFC 8899): confirm the base size, then binary
+    # search for the largest probe the receiver acknowledges
+    low = min(low, high)
+    if not probe(udp_socket, address, low):
+        return low
+    if probe(udp_socket, address, high):
+        return high
+
+    while high - low > PROBE_PRECISION:
+        size = (low + high) // 2
+        if probe(udp_socket, address, size):
+            low = size
+        else:
+            high = size
+    return low
@@ -0,0 +1,248 @@
+import argparse
+import heapq
+import itertools
+import random
+import select
+import socket
+import threading
+from time import time
+
+from payload import MAX_PACKET_SIZE
+
+# Senders talk to the emulator on the receiver's usual port, it forwards to
+# a receiver started with --port 5002
+EMULATOR_ADDRESS = ("0.0.0.0", 5001)
+TARGET_ADDRESS = ('localhost', 5002)
+# Drop-tail queue in front of a bandwidth limit
+QUEUE_SIZE = 256 * 1024
+# Longest the loop sleeps without a packet due, so stop() is noticed
+POLL_INTERVAL = 0.1
+
+
+class Link:
+    # Impairments for one direction. Bandwidth is in bytes per second (None
+    # is unlimited), times are in seconds, the rest are per-packet
+    # probabilities. Burst loss is a Gilbert model: burst_start moves the
+    # link into the bad state, where every packet is lost until burst_end
+    # moves it back. Reordered packets skip the delay, like netem's reorder
+    def __init__(self, bandwidth=None, delay=0, jitter=0, loss=0, burst_start=0, burst_end=1, reorder=0,
+                 duplicate=0, queue_size=QUEUE_SIZE, seed=None):
+        self.bandwidth = bandwidth
+        self.delay = delay
+        self.jitter = jitter
+        self.loss = loss
+        self.burst_start = burst_start
+        self.burst_end = burst_end
+        self.reorder = reorder
+        self.duplicate = duplicate
+        self.queue_size = queue_size
+        self.random = random.Random(seed)
+
+        self.bad = False
+        # When the bottleneck finishes serializing what is queued
+        self.busy_until = 0
+        # Latest in-order delivery, jitter never reorders on its own
+        self.last_delivery = 0
+
+        self.forwarded = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.reordered = 0
+
+    def transmit(self, size, now):
+        # Delivery times for one packet: none if it is lost, two if duplicated
+        rand = self.random.random
+        if self.bad:
+            self.bad = rand() >= self.burst_end
+        elif self.burst_start:
+            self.bad = rand() < self.burst_start
+        if self.bad or (self.loss and rand() < self.loss):
+            self.dropped += 1
+            return ()
+
+        departure = now
+        if self.bandwidth:
+            start = max(now, self.busy_until)
+            if (start - now) * self.bandwidth > self.queue_size:
+                self.dropped += 1
+                return ()
+            departure = self.busy_until = start + size / self.bandwidth
+
+        if self.reorder and rand() < self.reorder:
+            self.reordered += 1
+            delivery = departure
+        else:
+            delivery = departure + self.delay
+            if self.jitter:
+                delivery += self.random.uniform(-self.jitter, self.jitter)
+            delivery = self.last_delivery = max(delivery, self.last_delivery, departure)
+
+        self.forwarded += 1
+        if self.duplicate and rand() < self.duplicate:
+            self.duplicated += 1
+            return delivery, delivery
+        return (delivery,)
+
+    def summary(self):
+        return {
+            'forwarded': self.forwarded,
+            'dropped': self.dropped,
+            'duplicated': self.duplicated,
+            'reordered': self.reordered,
+        }
+
+
+class Emulator:
+    # UDP proxy that applies a Link to each direction. Every sender address
+    # gets its own upstream socket, so concurrent transfers stay apart at
+    # the receiver. Runs in the calling thread with run(), or in the
+    # background as a context manager:
+    #
+    #     with Emulator(Link(bandwidth=1_250_000, delay=0.02, loss=0.01)):
+    #         sender.run('reno', 'file.mp3')
+    def __init__(self, forward=None, reverse=None, listen_address=EMULATOR_ADDRESS, target=TARGET_ADDRESS):
+        self.forward = forward or Link()
+        self.reverse = reverse or Link()
+        self.listen_address = listen_address
+        self.target = target
+
+        # (delivery time, order, socket, packet, address)
+        self.queue = []
+        self.order = itertools.count()
+        # {sender address: upstream socket} and back
+        self.upstream = {}
+        self.clients = {}
+
+        self.stopping = threading.Event()
+        self.ready = threading.Event()
+        self.thread = None
+        self.error = None
+
+    def run(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as listen_socket:
+            try:
+                listen_socket.bind(self.listen_address)
+            except OSError as e:
+                self.error = e
+                raise
+            finally:
+                self.ready.set()
+
+            try:
+                self.loop(listen_socket)
+            finally:
+                for upstream in self.upstream.values():
+                    upstream.close()
+                self.upstream.clear()
+                self.clients.clear()
+
+    def loop(self, listen_socket):
+        queue = self.queue
+        # Packets already in flight are still delivered after stop(), the
+        # last one is usually the sender's FINACK
+        while queue or not self.stopping.is_set():
+            now = time()
+            while queue and queue[0][0] <= now:
+                _, _, out, packet, address = heapq.heappop(queue)
+                try:
+                    out.sendto(packet, address)
+                except OSError:
+                    # Nobody listening on the far side, the packet is lost
+                    pass
+
+            wait = min(queue[0][0] - now, POLL_INTERVAL) if queue else POLL_INTERVAL
+            readable, _, _ = select.select([listen_socket, *self.clients], [], [], max(wait, 0))
+
+            now = time()
+            for sock in readable:
+                try:
+                    packet, address = sock.recvfrom(MAX_PACKET_SIZE)
+                except OSError:
+                    continue
+                if sock is listen_socket:
+                    self.schedule(self.forward, packet, self.upstream_for(address), self.target, now)
+                else:
+                    self.schedule(self.reverse, packet, listen_socket, self.clients[sock], now)
+
+    def upstream_for(self, address):
+        upstream = self.upstream.get(address)
+        if upstream is None:
+            upstream = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            upstream.bind(("0.0.0.0", 0))
+            self.upstream[address] = upstream
+            self.clients[upstream] = address
+        return upstream
+
+    def schedule(self, link, packet, out, address, now):
+        for delivery in link.transmit(len(packet), now):
+            heapq.heappush(self.queue, (delivery, next(self.order), out, packet, address))
+
+    def start(self):
+        self.stopping.clear()
+        self.ready.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def summary(self):
+        return {'forward': self.forward.summary(), 'reverse': self.reverse.summary()}
+
+
+def link_arguments(parser, prefix=''):
+    # Same impairment flags for either direction, --ack- for the reverse path
+    parser.add_argument(f'--{prefix}bandwidth', type=float, default=None, help='bottleneck rate in Mbit/s')
+    parser.add_argument(f'--{prefix}delay', type=float, default=0, help='one-way delay in ms')
+    parser.add_argument(f'--{prefix}jitter', type=float, default=0, help='delay varies uniformly by up to this many ms')
+    parser.add_argument(f'--{prefix}loss', type=float, default=0, help='random loss probability')
+    parser.add_argument(f'--{prefix}burst-start', type=float, default=0, help='probability of entering a loss burst')
+    parser.add_argument(f'--{prefix}burst-end', type=float, default=1, help='probability of leaving a loss burst')
+    parser.add_argument(f'--{prefix}reorder', type=float, default=0, help='probability a packet skips the delay')
+    parser.add_argument(f'--{prefix}duplicate', type=float, default=0, help='duplication probability')
+    parser.add_argument(f'--{prefix}queue', type=int, default=QUEUE_SIZE, help='bottleneck queue in bytes')
+
+
+def make_link(args, prefix='', seed=None):
+    value = lambda name: getattr(args, prefix + name)
+    bandwidth = value('bandwidth')
+    return Link(bandwidth * 1e6 / 8 if bandwidth else None, value('delay') / 1000, value('jitter') / 1000,
+                value('loss'), value('burst_start'), value('burst_end'), value('reorder'), value('duplicate'),
+                value('queue'), seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='UDP impairment proxy between the senders and a local receiver')
+    parser.add_argument('--port', type=int, default=EMULATOR_ADDRESS[1], help='port the senders send to')
+    parser.add_argument('--target-host', default=TARGET_ADDRESS[0], help='receiver host')
+    parser.add_argument('--target-port', type=int, default=TARGET_ADDRESS[1], help='receiver port')
+    parser.add_argument('--seed', type=int, default=None, help='seed both directions for repeatable runs')
+    link_arguments(parser)
+    link_arguments(parser, 'ack-')
+    args = parser.parse_args(argv)
+
+    reverse_seed = None if args.seed is None else args.seed + 1
+    emulator = Emulator(make_link(args, seed=args.seed), make_link(args, 'ack_', reverse_seed),
+                        (EMULATOR_ADDRESS[0], args.port), (args.target_host, args.target_port))
+    try:
+        emulator.run()
+    except KeyboardInterrupt:
+        pass
+    print(emulator.summary())
+
+
+if __name__ == '__main__':
+    main()
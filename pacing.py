@@ -0,0 +1,109 @@
+import socket
+import sys
+
+from log import get_logger
+
+# Linux paces at 2x cwnd/SRTT in slow start and 1.2x afterwards
+SLOW_START_GAIN = 2
+CONGESTION_AVOID_GAIN = 1.2
+# Packets allowed back to back before the pacer holds the rest
+BURST_PACKETS = 2
+# Kernel rate is only updated when it moves by more than this fraction
+KERNEL_RATE_SLACK = 0.1
+SO_MAX_PACING_RATE = getattr(socket, 'SO_MAX_PACING_RATE', 47)
+
+PACING_MODES = ('none', 'rate', 'kernel')
+
+logger = get_logger('pacing')
+
+
+def get_pacing_rate(controller, rtt):
+    # Controllers with their own model (BBR) pick the rate, the others are
+    # paced so one window is spread over one smoothed RTT
+    rate = controller.get_PacingRate()
+    if rate is not None or rtt.srtt is None or rtt.srtt <= 0:
+        return rate
+
+    cwnd = controller.get_Window()
+    gain = SLOW_START_GAIN if cwnd < getattr(controller, 'sshThresh', 0) else CONGESTION_AVOID_GAIN
+    return gain * cwnd / rtt.srtt
+
+
+class NoPacer:
+    # Old behaviour: the whole open window goes out as one burst
+    def rate(self):
+        return None
+
+    def ready(self, now):
+        return True
+
+    def on_send(self, size, now):
+        pass
+
+    def next_time(self):
+        return 0
+
+
+class TokenBucketPacer:
+    # granularity is how late the caller's wakeups can run (seconds), the
+    # bucket holds at least that much of the rate so late wakeups don't lose it
+    def __init__(self, controller, rtt, segment_size, granularity=0):
+        self.controller = controller
+        self.rtt = rtt
+        self.burst = BURST_PACKETS * segment_size
+        self.granularity = granularity
+
+        self.tokens = self.burst
+        self.last = None
+        self.current_rate = None
+
+    def rate(self):
+        return self.current_rate
+
+    def refill(self, now):
+        self.current_rate = get_pacing_rate(self.controller, self.rtt)
+        if self.last is not None and self.current_rate:
+            burst = max(self.burst, self.current_rate * self.granularity)
+            self.tokens = min(self.tokens + (now - self.last) * self.current_rate, burst)
+        self.last = now
+
+    def ready(self, now):
+        self.refill(now)
+        return self.current_rate is None or self.tokens > 0
+
+    def on_send(self, size, now):
+        if self.current_rate:
+            self.tokens -= size
+
+    def next_time(self):
+        if not self.current_rate or self.tokens > 0:
+            return self.last or 0
+        return self.last + -self.tokens / self.current_rate
+
+
+class KernelPacer(NoPacer):
+    # Hands the rate to the kernel with SO_MAX_PACING_RATE, the fq qdisc
+    # then spaces the datagrams, userspace just sends the window
+    def __init__(self, controller, rtt, udp_socket):
+        self.controller = controller
+        self.rtt = rtt
+        self.udp_socket = udp_socket
+        self.current_rate = None
+
+    def on_send(self, size, now):
+        rate = get_pacing_rate(self.controller, self.rtt)
+        if rate is None:
+            return
+        if self.current_rate is None or abs(rate - self.current_rate) > KERNEL_RATE_SLACK * self.current_rate:
+            self.current_rate = rate
+            self.udp_socket.setsockopt(socket.SOL_SOCKET, SO_MAX_PACING_RATE, min(int(rate), 2 ** 32 - 1))
+
+
+def make_pacer(mode, controller, rtt, udp_socket, segment_size, granularity=0):
+    if mode == 'none':
+        return NoPacer()
+    if mode == 'kernel':
+        if sys.platform.startswith('linux'):
+            return KernelPacer(controller, rtt, udp_socket)
+        logger.warning("Kernel pacing needs Linux, pacing in userspace instead")
+    return TokenBucketPacer(controller, rtt, segment_size, granularity)
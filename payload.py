@@ -0,0 +1,180 @@
+import mmap
+import os
+import select
+import struct
+
+# Constants
+PACKET_SIZE = 1024
+SEQ_ID_SIZE = 4
+MESSAGE_SIZE = PACKET_SIZE - SEQ_ID_SIZE
+# Largest UDP payload over IPv4, the upper bound for --packet-size
+MAX_PACKET_SIZE = 65507
+# Sequence id of path MTU probes, never a real byte offset
+PROBE_ID = -1
+# Sequence id of FEC parity packets and the receiver's reports on them
+FEC_ID = -2
+
+# Sequence id of the header version handshake
+VERSION_ID = -3
+# Sequence id of the resume handshake
+RESUME_ID = -4
+
+# Big-endian signed sequence id, same layout as int.to_bytes(..., signed=True)
+HEADER = struct.Struct('>i')
+
+# Header versions. 1 carries plain byte offsets, so a file ends below 2 GiB.
+# 2 carries them modulo SEQ_SPACE in the non-negative half of the header,
+# negative ids stay free for control packets. Below SEQ_SPACE both are the
+# same bytes, so version 1 receivers only matter for larger files
+HEADER_VERSION = 2
+WRAPPING_VERSION = 2
+VERSION_MARKER = b'version'
+SEQ_SPACE = 1 << 31
+SEQ_MASK = SEQ_SPACE - 1
+SEQ_HALF = SEQ_SPACE >> 1
+
+# Resume request and reply: a token naming the attempt, an offset and the
+# unit it is rounded down to. The request's offset is the most the sender
+# vouches for, the reply's is where the receiver rewound to and is followed
+# by a SHA-256 of the receiver's bytes below it
+RESUME_MARKER = b'resume'
+RESUME = struct.Struct('>Iqi')
+RESUME_DIGEST_SIZE = 32
+
+# Optional SACK extension: an ACK whose payload starts with SACK_MARKER carries
+# up to MAX_SACK_BLOCKS [start, end) byte ranges received above the cumulative ACK
+SACK_MARKER = b'sack'
+SACK_BLOCK = struct.Struct('>ii')
+MAX_SACK_BLOCKS = 4
+
+
+class PayloadSource:
+    # Serves packet payloads straight out of a memory-mapped file so that
+    # slicing a chunk never copies and the file never has to sit in RAM.
+    # offset/length restrict it to one byte range, positions stay relative
+    def __init__(self, path, message_size=MESSAGE_SIZE, offset=0, length=None):
+        self.message_size = message_size
+        self.file = open(path, 'rb')
+        file_size = os.fstat(self.file.fileno()).st_size
+        self.offset = min(offset, file_size)
+        self.size = file_size - self.offset if length is None else min(length, file_size - self.offset)
+
+        # mmap refuses empty files, an empty view behaves the same for us
+        if file_size > 0:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self.map, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                self.map.madvise(mmap.MADV_SEQUENTIAL)
+            self.view = memoryview(self.map)[self.offset:self.offset + self.size]
+        else:
+            self.map = None
+            self.view = memoryview(b'')
+
+    def __len__(self):
+        return self.size
+
+    def chunk(self, position):
+        return self.view[position:position + self.message_size]
+
+    def close(self):
+        self.view.release()
+        if self.map is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                # A chunk view is still alive, the mapping goes away with it
+                pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PacketWriter:
+    # Writes the sequence id into one reusable header buffer and hands the
+    # header and payload view to the kernel together with sendmsg
+    def __init__(self, udp_socket, address):
+        self.udp_socket = udp_socket
+        self.address = address
+        self.header = bytearray(HEADER.size)
+        self.use_sendmsg = hasattr(udp_socket, 'sendmsg')
+
+    def send(self, position, chunk=b''):
+        HEADER.pack_into(self.header, 0, wrap(position))
+        while True:
+            try:
+                if self.use_sendmsg:
+                    return self.udp_socket.sendmsg((self.header, chunk), (), 0, self.address)
+                # Windows has no sendmsg, fall back to a single copy
+                return self.udp_socket.sendto(bytes(self.header) + chunk, self.address)
+            except BlockingIOError:
+                # Non-blocking socket with a full send buffer
+                select.select([], [self.udp_socket], [])
+
+
+def wrap(position):
+    # Position as it goes on the wire, control ids are negative and unchanged
+    return position if position < SEQ_SPACE else position & SEQ_MASK
+
+
+def unwrap(sequence, reference):
+    # The position closest to reference that wraps to sequence (RFC 1982
+    # serial arithmetic). Exact while less than SEQ_HALF is outstanding, and
+    # the identity for version 1 traffic
+    if sequence < 0:
+        return sequence
+    return reference + ((sequence - reference + SEQ_HALF) & SEQ_MASK) - SEQ_HALF
+
+
+def parse_ack(ack):
+    # The sequence id as sent, unwrap it against a known position
+    return HEADER.unpack_from(ack)[0]
+
+
+def parse_sack(ack, reference=0):
+    if ack[HEADER.size:HEADER.size + len(SACK_MARKER)] != SACK_MARKER:
+        return ()
+    offset = HEADER.size + len(SACK_MARKER)
+    count = min((len(ack) - offset) // SACK_BLOCK.size, MAX_SACK_BLOCKS)
+    blocks = []
+    for i in range(count):
+        start, end = SACK_BLOCK.unpack_from(ack, offset + i * SACK_BLOCK.size)
+        blocks.append((unwrap(start, reference), unwrap(end, reference)))
+    return blocks
+
+
+def build_ack(position, blocks=()):
+    if not blocks:
+        return HEADER.pack(wrap(position)) + b'ack'
+    return HEADER.pack(wrap(position)) + SACK_MARKER + b''.join(SACK_BLOCK.pack(wrap(start), wrap(end))
+                                                                for start, end in blocks[:MAX_SACK_BLOCKS])
+
+
+def build_hello(version=HEADER_VERSION):
+    # Sent by the sender with its highest version, echoed by the receiver
+    # with the version both will use
+    return HEADER.pack(VERSION_ID) + VERSION_MARKER + bytes((version,))
+
+
+def parse_hello(packet):
+    # Version carried by a hello, None for anything else
+    if (len(packet) != HEADER.size + len(VERSION_MARKER) + 1 or HEADER.unpack_from(packet)[0] != VERSION_ID
+            or packet[HEADER.size:-1] != VERSION_MARKER):
+        return None
+    return packet[-1]
+
+
+def build_resume(token, offset, unit, digest=b''):
+    return HEADER.pack(RESUME_ID) + RESUME_MARKER + RESUME.pack(token, offset, unit) + digest
+
+
+def parse_resume(packet):
+    # (token, offset, unit, digest) of a resume packet, the digest is empty
+    # in a request. None for anything else
+    size = HEADER.size + len(RESUME_MARKER) + RESUME.size
+    if (len(packet) not in (size, size + RESUME_DIGEST_SIZE) or HEADER.unpack_from(packet)[0] != RESUME_ID
+            or packet[HEADER.size:HEADER.size + len(RESUME_MARKER)] != RESUME_MARKER):
+        return None
+    return (*RESUME.unpack_from(packet, HEADER.size + len(RESUME_MARKER)), bytes(packet[size:]))
@@ -0,0 +1,210 @@
+import argparse
+import hashlib
+import os
+import socket
+
+from payload import (HEADER, build_ack, build_hello, build_resume, parse_ack, parse_hello, parse_resume, unwrap, wrap,
+                     MAX_PACKET_SIZE, PROBE_ID, FEC_ID, VERSION_ID, RESUME_ID, HEADER_VERSION, SEQ_ID_SIZE)
+from mtu import build_probe_reply
+from fec import ParityDecoder
+from compress import decode
+from resume import prefix_digest
+
+RECEIVER_ADDRESS = ("0.0.0.0", 5001)
+# Room for a few windows of large packets, the kernel caps it at rmem_max
+RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+FINACK = b'==FINACK=='
+
+
+class Receiver:
+    # Local stand-in for the course receiver: cumulative ACKs with b'ack',
+    # b'fin' for the empty end-of-file packet, done on FINACK. With sack=True
+    # every ACK also carries SACK blocks for data buffered above the hole.
+    # Packets may be any size up to MAX_PACKET_SIZE, path MTU probes are echoed.
+    # Sequence ids are unwrapped against the cumulative ACK, which any header
+    # version allows, and a version hello gets our highest version back.
+    # With fec=True parity packets are answered with a loss report and
+    # repair single losses per group. With compress=True every data payload
+    # carries a codec tag and is decoded on arrival, so everything buffered,
+    # delivered and XORed for parity is the raw file. A resume request
+    # rewinds to what the sender vouches for and answers where that is,
+    # with a SHA-256 of the bytes below it so the sender can check them.
+    # With resume=True an existing output file counts as received
+    def __init__(self, bind_address=RECEIVER_ADDRESS, output=None, sack=False, fec=False, compress=False,
+                 resume=False):
+        self.bind_address = bind_address
+        self.output = output
+        self.sack = sack
+        self.fec = ParityDecoder() if fec else None
+        self.compress = compress
+        self.resume = resume
+
+        self.expected = 0
+        # SHA-256 of everything below expected
+        self.digest = hashlib.sha256()
+        # {position: payload} received above the cumulative ACK
+        self.buffered = {}
+        self.received = 0
+        self.last_position = None
+        self.out = None
+        # Set by the sender's FINACK
+        self.done = False
+        # Last resume request answered, a duplicate gets the same answer
+        self.resume_token = None
+        self.resume_reply = None
+
+    # ready, if given, is set once the socket is bound (a threading or
+    # multiprocessing Event), so a harness knows when to start the sender
+    def run(self, ready=None):
+        self.open_output()
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
+                udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+                udp_socket.bind(self.bind_address)
+                self.udp_socket = udp_socket
+                if ready is not None:
+                    ready.set()
+
+                while not self.done:
+                    packet, addr = udp_socket.recvfrom(MAX_PACKET_SIZE)
+                    for reply in self.handle_packet(packet):
+                        udp_socket.sendto(reply, addr)
+        finally:
+            if self.out is not None:
+                self.out.close()
+
+        return self.received
+
+    def open_output(self):
+        # With resume an existing output file counts as received, its bytes
+        # are hashed so a resume request can be answered
+        if self.output and self.resume and os.path.exists(self.output):
+            self.out = open(self.output, 'r+b')
+            self.expected = self.out.seek(0, os.SEEK_END)
+            self.digest = prefix_digest(self.out, self.expected)
+        else:
+            self.out = open(self.output, 'wb') if self.output else None
+
+    def handle_packet(self, packet):
+        # Returns the replies to one datagram, sets done on FINACK. No socket
+        # involved, so the simulator drives the same logic
+        position = unwrap(parse_ack(packet), self.expected)
+        payload = packet[SEQ_ID_SIZE:]
+
+        if position == PROBE_ID:
+            return [build_probe_reply(len(packet))]
+
+        if position == VERSION_ID:
+            offered = parse_hello(packet)
+            return [] if offered is None else [build_hello(min(offered, HEADER_VERSION))]
+
+        if position == RESUME_ID:
+            request = parse_resume(packet)
+            if request is None or request[2] < 1:
+                return []
+            token, limit, unit, _ = request
+            if token != self.resume_token:
+                self.resume_token = token
+                offset = self.rewind(min(self.expected, limit) // unit * unit)
+                self.resume_reply = build_resume(token, offset, unit, self.digest.digest())
+            return [self.resume_reply]
+
+        if position == FEC_ID and self.fec is not None:
+            report, rebuilt = self.fec.repair(payload, self.expected, self.buffered)
+            if rebuilt is None:
+                return [report]
+            self.buffered[rebuilt[0]] = rebuilt[1]
+            self.deliver()
+            return [report, self.ack()]
+
+        if payload == FINACK:
+            self.done = True
+            return []
+
+        # Empty packet marks the end of the file
+        if not payload:
+            if position == self.expected:
+                return [HEADER.pack(wrap(self.expected)) + b'fin']
+            return [self.ack()]
+
+        if position >= self.expected and position not in self.buffered:
+            self.buffered[position] = decode(payload) if self.compress else payload
+            self.last_position = position
+
+        self.deliver()
+        return [self.ack()]
+
+    def rewind(self, offset):
+        # Forgets everything from offset on, the sender starts over there.
+        # Without an output file the bytes below offset can't be hashed
+        # again, so it goes back to the start
+        if offset < self.expected:
+            if self.out is None:
+                offset = 0
+                self.digest = hashlib.sha256()
+            else:
+                self.out.flush()
+                self.digest = prefix_digest(self.out, offset)
+                self.out.truncate(offset)
+                self.out.seek(offset)
+            self.received = max(0, self.received - (self.expected - offset))
+            self.expected = offset
+        self.buffered.clear()
+        if self.fec is not None:
+            self.fec = ParityDecoder()
+        return offset
+
+    def deliver(self):
+        # Deliver everything that is now contiguous
+        out = self.out
+        fec = self.fec
+        while self.expected in self.buffered:
+            chunk = self.buffered.pop(self.expected)
+            if out is not None:
+                out.write(chunk)
+            self.digest.update(chunk)
+            if fec is not None:
+                fec.keep(self.expected, chunk)
+            self.received += len(chunk)
+            self.expected += len(chunk)
+
+    def ack(self):
+        if not self.sack or not self.buffered:
+            return build_ack(self.expected)
+        return build_ack(self.expected, self.sack_blocks())
+
+    def sack_blocks(self):
+        # Merge buffered packets into [start, end) ranges
+        blocks = []
+        for position in sorted(self.buffered):
+            end = position + len(self.buffered[position])
+            if blocks and blocks[-1][1] == position:
+                blocks[-1][1] = end
+            else:
+                blocks.append([position, end])
+
+        # RFC 2018: the block holding the latest arrival goes first
+        blocks.sort(key=lambda block: not (block[0] <= self.last_position < block[1]))
+        return [tuple(block) for block in blocks]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local receiver for the UDP senders')
+    parser.add_argument('-o', '--output', help='write the received file here')
+    parser.add_argument('--port', type=int, default=RECEIVER_ADDRESS[1], help='port to listen on')
+    parser.add_argument('--sack', action='store_true', help='append SACK blocks to every ACK')
+    parser.add_argument('--fec', action='store_true', help='repair single losses per group from parity packets')
+    parser.add_argument('--compress', action='store_true', help='decode payloads from a sender run with --compress')
+    parser.add_argument('--resume', action='store_true',
+                        help='keep an existing output file, a sender run with --resume continues after it')
+    args = parser.parse_args(argv)
+
+    receiver = Receiver((RECEIVER_ADDRESS[0], args.port), args.output, args.sack, args.fec, args.compress,
+                        args.resume)
+    print(f'Received {receiver.run()} bytes')
+    if receiver.fec is not None:
+        print(f'Repaired {receiver.fec.repaired} packets from parity')
+
+
+if __name__ == '__main__':
+    main()
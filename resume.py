@@ -0,0 +1,94 @@
+import contextlib
+import hashlib
+import json
+import os
+
+# Seconds between state file writes while a transfer runs
+CHECKPOINT_INTERVAL = 1.0
+# Read size when hashing a file from disk
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def prefix_digest(f, size):
+    # SHA-256 of the first size bytes of the open binary file f, carried on
+    # by the caller as more bytes are appended
+    digest = hashlib.sha256()
+    f.seek(0)
+    while size > 0:
+        block = f.read(min(size, HASH_BLOCK_SIZE))
+        if not block:
+            break
+        digest.update(block)
+        size -= len(block)
+    return digest
+
+
+class Checkpoint:
+    # Progress of one transfer in a small JSON state file: the file size,
+    # the acknowledged offset and a SHA-256 of every byte below it. Loading
+    # rehashes that prefix, a file that changed since is not resumed. The
+    # hash then carries on from there, each save only reads the bytes
+    # acknowledged since the last one
+    def __init__(self, path, data, interval=CHECKPOINT_INTERVAL):
+        self.path = path
+        self.data = data
+        self.interval = interval
+        self.hash = hashlib.sha256()
+        # Bytes covered by the hash
+        self.offset = 0
+        # The state file was written for this file
+        self.valid = False
+        self.next_save = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        offset = state.get('offset')
+        if state.get('size') != len(self.data) or not isinstance(offset, int) or not 0 <= offset <= len(self.data):
+            return
+        digest = hashlib.sha256(self.data.view[:offset])
+        if digest.hexdigest() == state.get('sha256'):
+            self.hash = digest
+            self.offset = offset
+            self.valid = True
+
+    def update(self, position, now):
+        # Called with each new cumulative ACK, saves once per interval
+        if now >= self.next_save:
+            self.save(position)
+            self.next_save = now + self.interval
+
+    def save(self, position):
+        # A receiver that rewound below the checkpoint leaves it where it is,
+        # it still describes the file
+        if position > self.offset:
+            self.hash.update(self.data.view[self.offset:position])
+            self.offset = position
+        state = {'size': len(self.data), 'offset': self.offset, 'sha256': self.hash.hexdigest()}
+        # Replaced in one step, a crash mid-write leaves the previous state
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(state, f)
+        os.replace(temporary, self.path)
+
+    def digest(self, offset):
+        # SHA-256 of the first offset bytes, to check a receiver's copy
+        # against. Past the checkpoint only the difference is read
+        if offset >= self.offset:
+            digest = self.hash.copy()
+            digest.update(self.data.view[self.offset:offset])
+        else:
+            digest = hashlib.sha256(self.data.view[:offset])
+        return digest.digest()
+
+    def close(self, position):
+        # A finished transfer has nothing left to resume
+        if position >= len(self.data):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path)
+        else:
+            self.save(position)
@@ -0,0 +1,49 @@
+# Retransmission timeout estimation (RFC 6298)
+
+INITIAL_RTO = 1
+MIN_RTO = 0.05
+MAX_RTO = 4
+# Clock granularity, keeps RTO above SRTT when RTTVAR collapses to zero
+CLOCK_GRANULARITY = 0.001
+
+ALPHA = 1 / 8
+BETA = 1 / 4
+K = 4
+
+
+class RTTEstimator:
+    def __init__(self, initial_rto=INITIAL_RTO, min_rto=MIN_RTO, max_rto=MAX_RTO):
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+
+        self.srtt = None
+        self.rttvar = None
+        self.min_rtt = None
+        self.rto = initial_rto
+
+        # Doubled on every timeout, reset by the next valid sample
+        self.backoff = 1
+
+    # Only call with samples from packets that were sent once (Karn's rule),
+    # an ACK for a retransmission can't tell which copy it answers
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - BETA) * self.rttvar + BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - ALPHA) * self.srtt + ALPHA * rtt
+
+        if self.min_rtt is None or rtt < self.min_rtt:
+            self.min_rtt = rtt
+
+        self.rto = self.srtt + max(CLOCK_GRANULARITY, K * self.rttvar)
+        self.backoff = 1
+
+    def get_RTO(self):
+        return min(max(self.rto * self.backoff, self.min_rto), self.max_rto)
+
+    def handle_timeout(self):
+        # Exponential backoff, stop doubling once the cap is reached
+        if self.rto * self.backoff < self.max_rto:
+            self.backoff *= 2
@@ -0,0 +1,107 @@
+from array import array
+
+INITIAL_CAPACITY = 1024
+
+
+class SendBuffer:
+    # Ring of in-flight segments indexed by segment number (position // segment_size).
+    # Segments between head and tail have been sent and not yet acknowledged, so a
+    # cumulative ACK only walks the segments it releases. Segments reported by
+    # SACK blocks form the scoreboard, the unsacked ones below them are holes.
+    # start is the first position that will be sent, a multiple of segment_size
+    def __init__(self, segment_size, capacity=INITIAL_CAPACITY, start=0):
+        self.segment_size = segment_size
+        self.head = start // segment_size
+        self.tail = self.head
+        # One past the highest sacked segment
+        self.high_sack = self.head
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        self.capacity = capacity
+        self.mask = capacity - 1
+        self.send_times = array('d', bytes(8 * capacity))
+        self.retransmitted = array('b', bytes(capacity))
+        self.sacked = array('b', bytes(capacity))
+
+    def grow(self):
+        send_times, retransmitted, sacked, mask = self.send_times, self.retransmitted, self.sacked, self.mask
+        self.allocate(self.capacity * 2)
+        for index in range(self.head, self.tail):
+            self.send_times[index & self.mask] = send_times[index & mask]
+            self.retransmitted[index & self.mask] = retransmitted[index & mask]
+            self.sacked[index & self.mask] = sacked[index & mask]
+
+    def __len__(self):
+        return self.tail - self.head
+
+    def __bool__(self):
+        return self.tail != self.head
+
+    def __contains__(self, position):
+        index = position // self.segment_size
+        return self.head <= index < self.tail
+
+    def __iter__(self):
+        # In-flight positions, oldest first
+        for index in range(self.head, self.tail):
+            yield index * self.segment_size
+
+    def add(self, position, now):
+        if self.tail - self.head == self.capacity:
+            self.grow()
+        slot = self.tail & self.mask
+        self.send_times[slot] = now
+        self.retransmitted[slot] = 0
+        self.sacked[slot] = 0
+        self.tail = position // self.segment_size + 1
+
+    def send_time(self, position):
+        return self.send_times[(position // self.segment_size) & self.mask]
+
+    def is_retransmitted(self, position):
+        return self.retransmitted[(position // self.segment_size) & self.mask]
+
+    def resent(self, position, now):
+        slot = (position // self.segment_size) & self.mask
+        self.send_times[slot] = now
+        self.retransmitted[slot] = 1
+
+    def is_sacked(self, position):
+        return self.sacked[(position // self.segment_size) & self.mask]
+
+    def release(self, ack_position):
+        # Yields (position, send_time, retransmitted) for every segment below
+        # ack_position, segments already reported by sack() are skipped
+        end = min(-(-ack_position // self.segment_size), self.tail)
+        mask = self.mask
+        while self.head < end:
+            slot = self.head & mask
+            position = self.head * self.segment_size
+            self.head += 1
+            if not self.sacked[slot]:
+                yield position, self.send_times[slot], self.retransmitted[slot]
+
+    def sack(self, start, end):
+        # Same as release for the segments in a SACK block [start, end)
+        first = max(-(-start // self.segment_size), self.head)
+        last = min(-(-end // self.segment_size), self.tail)
+        mask = self.mask
+        for index in range(first, last):
+            slot = index & mask
+            if not self.sacked[slot]:
+                self.sacked[slot] = 1
+                yield index * self.segment_size, self.send_times[slot], self.retransmitted[slot]
+        # A block past everything sent reports nothing, it mustn't turn the
+        # whole window into holes
+        if last > first:
+            self.high_sack = max(self.high_sack, last)
+
+    def has_sacks(self):
+        return self.high_sack > self.head
+
+    def holes(self):
+        # Unsacked positions below the highest sacked segment, oldest first
+        for index in range(self.head, min(self.high_sack, self.tail)):
+            if not self.sacked[index & self.mask]:
+                yield index * self.segment_size
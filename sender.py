@@ -0,0 +1,497 @@
+import argparse
+import signal
+import socket
+import threading
+from time import time
+
+from payload import (PayloadSource, PacketWriter, parse_ack, parse_sack, unwrap, PACKET_SIZE, MAX_PACKET_SIZE,
+                     SEQ_ID_SIZE, SEQ_SPACE, FEC_ID, WRAPPING_VERSION)
+from congestion import CONTROLLERS, DUPE_ACK_THRESHOLD, get_controller
+from rtt import RTTEstimator
+from timers import TimerWheel
+from sendbuffer import SendBuffer
+from pacing import PACING_MODES, make_pacer
+from batchio import IO_MODES, make_io, wait_readable
+from mtu import probe_packet_size
+from handshake import negotiate_resume, negotiate_version
+from stats import Statistics
+from tracer import ACK, RETRANSMIT, TIMEOUT, Tracer
+from log import get_logger, logging_arguments, setup_logging
+from fec import PARITY, ParityEncoder, parse_report
+from compress import CODECS, TAG_SIZE, Compressor
+from resume import Checkpoint
+
+SENDER_ADDRESS = ("0.0.0.0", 5000)
+RECEIVER_ADDRESS = ('localhost', 5001)
+# Times to resend the empty packet while waiting for the receiver's fin
+FIN_RETRIES = 3
+
+logger = get_logger('sender')
+
+
+class Sender:
+    # Shared send/ACK/retransmit loop, the window policy comes from the controller
+    # Wall clock by default, the simulator hands instances a virtual one
+    clock = staticmethod(time)
+
+    def __init__(self, data, controller, address=RECEIVER_ADDRESS, bind_address=SENDER_ADDRESS, pacing='rate', io='auto',
+                 fec=False, compress=None, start=0):
+        self.data = data
+        self.tcp = controller
+        self.address = address
+        self.bind_address = bind_address
+        self.stats = Statistics()
+
+        # Shared with the controller so window growth can follow SRTT
+        self.rtt = RTTEstimator(initial_rto=controller.timeout_duration)
+        controller.rtt = self.rtt
+
+        # Window Tracking, a resumed transfer starts where the receiver is
+        self.base_position = start
+        self.next_position = start
+        if start:
+            controller.resume(start)
+        # Send times and retransmission flags of the unacknowledged packets
+        self.in_flight = SendBuffer(data.message_size, start=start)
+        # Per-packet retransmission timers keyed by position
+        self.timers = None
+        # Timeouts below this position belong to a loss the controller already saw
+        self.timeout_recovery = 0
+        self.dupe_acks = 0
+
+        # Spreads each window over an RTT instead of sending it as a burst
+        self.pacing = pacing
+        self.pacer = None
+        # Batched sendmmsg/recvmmsg or one syscall per datagram
+        self.io_mode = io
+        self.io = None
+
+        # Parity after every group of first transmissions, needs a receiver
+        # that repairs from it
+        self.fec = ParityEncoder(data.message_size) if fec else None
+        # Codec tag in front of every payload, compressed by a worker pool
+        # ahead of the send position, needs a receiver that decodes it
+        self.compressor = Compressor(data, compress) if compress else None
+
+        # cwnd/ssthresh/RTT time series, off unless enabled
+        self.tracer = Tracer()
+        # Saves the acknowledged offset for a later resume, off unless set
+        self.checkpoint = None
+
+    def run(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp_socket:
+            self.stats.start()
+            udp_socket.bind(self.bind_address)
+            self.udp_socket = udp_socket
+            self.writer = PacketWriter(udp_socket, self.address)
+            self.pacer = make_pacer(self.pacing, self.tcp, self.rtt, udp_socket, self.data.message_size)
+
+            # Stays non-blocking, waiting is done with select so the loop never
+            # pays for settimeout and drains every queued ACK per wakeup
+            udp_socket.setblocking(False)
+            self.io = make_io(self.io_mode, udp_socket, self.address, self.data)
+
+            self.timers = TimerWheel(self.clock())
+            try:
+                self.transfer()
+            except Exception:
+                # The receiver must not take a failed transfer for a finished
+                # one, no fin. What it did acknowledge is kept for a resume
+                self.shutdown()
+                raise
+            self.shutdown()
+            self.finish()
+            self.stats.stop()
+
+        return self.stats
+
+    def transfer(self):
+        udp_socket = self.udp_socket
+        while True:
+            self.send_window()
+            self.io.flush()
+
+            # Handle completion
+            if self.next_position >= len(self.data) and not self.in_flight:
+                return
+
+            acks = self.io.recv_acks()
+            if not acks:
+                # Wait for ACKs until the earliest retransmission timer or paced packet is due
+                now = self.clock()
+                deadline = self.timers.next_deadline()
+                wait = self.rtt.get_RTO() if deadline is None else deadline - now
+                if self.paced_backlog():
+                    wait = min(wait, self.pacer.next_time() - now)
+                if wait_readable(udp_socket, wait):
+                    acks = self.io.recv_acks()
+
+            # One timestamp for the whole batch of ACKs
+            now = self.clock()
+            for ack in acks:
+                self.handle_packet(ack, now)
+
+            expired = self.timers.expire(now)
+            if expired:
+                self.handle_timeout(expired)
+
+    def shutdown(self):
+        self.io.close()
+        if self.compressor is not None:
+            self.compressor.close()
+        if self.checkpoint is not None:
+            self.checkpoint.close(self.base_position)
+
+    def send_window(self):
+        data = self.data
+        in_flight = self.in_flight
+        windowSize = self.tcp.get_Window()
+        pacer = self.pacer
+        fec = self.fec
+        compressor = self.compressor
+        stats = self.stats
+
+        io = self.io
+        # One timestamp per burst, batched packets leave together anyway
+        now = self.clock()
+
+        # Send packets while window isn't full and we have data to send
+        while (self.next_position - self.base_position) < windowSize and self.next_position < len(data):
+            if not pacer.ready(now):
+                break
+
+            chunk = data.chunk(self.next_position)
+            payload = chunk if compressor is None else compressor.encode(self.next_position, chunk)
+            io.send(self.next_position, payload)
+            stats.record_sent(SEQ_ID_SIZE + len(payload))
+            in_flight.add(self.next_position, now)
+            self.timers.schedule(self.next_position, now + self.rtt.get_RTO())
+            self.next_position += len(chunk)
+            pacer.on_send(len(chunk), now)
+
+            if fec is not None:
+                parity = fec.add(self.next_position - len(chunk), chunk, self.next_position >= len(data))
+                if parity is not None:
+                    self.send_parity(parity, now)
+
+    def paced_backlog(self):
+        # Window has room but the pacer is holding packets back
+        return (self.pacer.rate() is not None
+                and self.next_position < len(self.data)
+                and (self.next_position - self.base_position) < self.tcp.get_Window())
+
+    def handle_packet(self, packet, now):
+        # One datagram from the receiver. Positions on the wire may have
+        # wrapped, they are unwrapped against the window base
+        position = parse_ack(packet)
+        if position == FEC_ID:
+            self.handle_report(packet, now)
+            return
+        base = self.base_position
+        self.handle_ack(unwrap(position, base), parse_sack(packet, base), now)
+
+    def handle_ack(self, ack_position, sack_blocks=(), now=None):
+        # now is taken once per batch of ACKs by the caller
+        if now is None:
+            now = self.clock()
+        # The receiver holds bytes we never sent, e.g. a file it kept for a
+        # resume this transfer didn't negotiate. Nothing it ACKs can be trusted
+        if ack_position > self.next_position:
+            raise ConnectionError(f'Receiver acknowledged {ack_position} bytes, only {self.next_position} were sent')
+
+        # Remove acknowledged packets
+        handled = self.tcp.handle_ACK(ack_position)
+        if self.tracer.enabled:
+            self.tracer.trace(ACK, now, self.tcp, self.rtt, self.next_position - self.base_position, self.dupe_acks)
+        if handled:
+            in_flight = self.in_flight
+            oldest, newest = self.acknowledge(in_flight.release(ack_position), now)
+            for start, end in sack_blocks:
+                sent = self.acknowledge(in_flight.sack(start, end), now)
+                if sent[0] is not None and (oldest is None or sent[0] < oldest):
+                    oldest = sent[0]
+                if sent[1] is not None and (newest is None or sent[1] > newest):
+                    newest = sent[1]
+            # One RTT sample per ACK, from segments that were sent once
+            # (Karn's rule, an ACK for a resent packet can't tell which copy
+            # it answers). The RTO is timed from the oldest one, a stretch
+            # ACK held it longest, the controller from the newest one
+            if oldest is not None:
+                self.rtt.sample(now - oldest)
+                self.tcp.handle_RTT(now - newest)
+
+            if ack_position > self.base_position:
+                self.stats.record_delivered(ack_position - self.base_position, now)
+                self.base_position = ack_position
+                self.dupe_acks = 0
+                if self.checkpoint is not None:
+                    self.checkpoint.update(ack_position, now)
+
+                # Partial ACK after a timeout, the next hole is at the new base
+                if ack_position < self.timeout_recovery and ack_position in in_flight and not in_flight.is_retransmitted(ack_position):
+                    self.retransmit(ack_position, now)
+
+            # Fast retransmit, don't wait for the timer of the missing packet
+            elif ack_position == self.base_position and self.base_position in in_flight:
+                self.dupe_acks += 1
+                if (self.dupe_acks == DUPE_ACK_THRESHOLD and not in_flight.has_sacks()
+                        and not self.awaiting_parity(self.base_position, now)):
+                    self.retransmit(self.base_position, now)
+
+            # With a scoreboard, resend every hole it reveals once
+            if self.dupe_acks >= DUPE_ACK_THRESHOLD and in_flight.has_sacks():
+                self.retransmit_holes(now)
+
+    def send_parity(self, parity, now):
+        self.io.send(FEC_ID, parity)
+        self.stats.record_parity(len(parity))
+        self.stats.record_sent(SEQ_ID_SIZE + len(parity))
+        self.pacer.on_send(len(parity), now)
+
+    def awaiting_parity(self, pos, now):
+        # Holds back a retransmission the receiver may not need. A hole in
+        # the open group closes it early, a small window may never fill it
+        fec = self.fec
+        if fec is None:
+            return False
+        if fec.is_open(pos):
+            self.send_parity(fec.close(), now)
+            return True
+        return fec.awaiting(pos)
+
+    def handle_report(self, report, now):
+        # The receiver's answer to a parity packet. A repaired loss is
+        # ACKed on its own, whatever is still missing is resent now
+        # instead of waiting for its timer
+        if self.fec is None:
+            return
+        start, packets, missing, repaired = parse_report(report, self.base_position)
+        end = self.fec.report(start, packets, missing)
+        self.stats.fec_repairs += repaired
+        if missing <= repaired or end is None:
+            return
+
+        in_flight = self.in_flight
+        if in_flight.has_sacks():
+            for pos in range(max(start, self.base_position), end, self.data.message_size):
+                if pos in in_flight and not in_flight.is_sacked(pos) and not in_flight.is_retransmitted(pos):
+                    self.retransmit(pos, now)
+        elif start <= self.base_position < end:
+            # Without SACK only the hole at the base is known
+            pos = self.base_position
+            if pos in in_flight and not in_flight.is_retransmitted(pos):
+                self.retransmit(pos, now)
+
+    def acknowledge(self, packets, now):
+        # Returns the earliest and latest send time of the packets that were
+        # sent once, (None, None) if every one was resent
+        oldest = newest = None
+        for pos, send_time, retransmitted in packets:
+            self.timers.cancel(pos)
+            self.stats.record_delay(now - send_time)
+            if not retransmitted:
+                if oldest is None or send_time < oldest:
+                    oldest = send_time
+                if newest is None or send_time > newest:
+                    newest = send_time
+        return oldest, newest
+
+    def retransmit_holes(self, now):
+        in_flight = self.in_flight
+        budget = self.tcp.get_Window()
+        for pos in in_flight.holes():
+            if budget <= 0:
+                break
+            if not in_flight.is_retransmitted(pos) and not self.awaiting_parity(pos, now):
+                self.retransmit(pos, now)
+                budget -= len(self.data.chunk(pos))
+
+    def handle_timeout(self, expired):
+        # Timers that expire together, or for packets sent before the last
+        # timeout, are one loss event. A retransmission that expires is a
+        # new one: the RTO backs off again and the window collapses again
+        in_flight = self.in_flight
+        if (max(expired) >= self.timeout_recovery
+                or any(pos in in_flight and in_flight.is_retransmitted(pos) for pos in expired)):
+            self.tcp.handle_timeout()
+            self.rtt.handle_timeout()
+            self.stats.timeout_count += 1
+            self.timeout_recovery = self.next_position
+
+        current_time = self.clock()
+        if self.tracer.enabled:
+            self.tracer.trace(TIMEOUT, current_time, self.tcp, self.rtt, self.next_position - self.base_position, len(expired))
+        if self.tcp.retransmit_all:
+            logger.info("Timeout occurred. Resending all packets in window (%d, %d)", self.base_position, self.next_position)
+            for pos in list(self.in_flight):
+                if not self.in_flight.is_sacked(pos):
+                    self.retransmit(pos, current_time)
+            return
+
+        # Sacked packets have no timer left, whatever expired is a real hole
+        if self.in_flight.has_sacks():
+            logger.info("Timeout: resending %d holes from position %d", len(expired), min(expired))
+            for pos in expired:
+                self.retransmit(pos, current_time)
+            return
+
+        # Packets after a hole time out with it even if they arrived, so only
+        # resend what the window allows, oldest first, and re-arm the rest
+        logger.info("Timeout: resending from position %d", min(expired))
+        budget = self.tcp.get_Window()
+        for pos in sorted(expired):
+            if budget > 0:
+                self.retransmit(pos, current_time)
+                budget -= len(self.data.chunk(pos))
+            else:
+                self.timers.schedule(pos, current_time + self.rtt.get_RTO())
+
+    def retransmit(self, pos, now):
+        if self.tracer.enabled:
+            self.tracer.trace(RETRANSMIT, now, self.tcp, self.rtt, self.next_position - self.base_position, pos)
+        logger.debug("Retransmitting position %d", pos)
+        chunk = self.data.chunk(pos)
+        if self.compressor is not None:
+            chunk = self.compressor.resend(chunk)
+        self.stats.record_retransmission(len(chunk))
+        self.stats.record_sent(SEQ_ID_SIZE + len(chunk))
+        self.io.send(pos, chunk)
+        self.in_flight.resent(pos, now)
+        self.timers.schedule(pos, now + self.rtt.get_RTO())
+
+    def finish(self):
+        udp_socket = self.udp_socket
+        udp_socket.settimeout(self.rtt.get_RTO())
+
+        # Empty packet signals completion, wait for the receiver to confirm it
+        for _ in range(FIN_RETRIES):
+            try:
+                self.writer.send(len(self.data))
+                while True:
+                    ack, addr = udp_socket.recvfrom(PACKET_SIZE)
+                    if ack[SEQ_ID_SIZE:].startswith(b'fin'):
+                        break
+                break
+            except socket.timeout:
+                continue
+            except Exception as e:
+                logger.error("Error occurred: %s", e)
+                break
+
+        # Send FINACK
+        try:
+            self.writer.send(0, b'==FINACK==')
+        except Exception as e:
+            logger.error("Error sending FINACK: %s", e)
+
+
+def toggle_tracing(tracer):
+    # SIGUSR1 switches tracing on and off while the transfer runs
+    def handler(signum, frame):
+        tracer.enabled = not tracer.enabled
+    if hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, handler)
+
+
+def resume_offset(address, bind_address, checkpoint, unit):
+    # Where the receiver continues from. Without an answer we can't know
+    # what it holds, sending from 0 to a receiver that has data would only
+    # draw ACKs for bytes we never sent
+    limit = len(checkpoint.data) if checkpoint.valid else 0
+    for attempt in (limit, 0):
+        answer = negotiate_resume(address, bind_address, attempt, unit)
+        if answer is None:
+            raise ConnectionError(f'No answer to the resume request from {address[0]}:{address[1]}')
+        offset, digest = answer
+        if digest == checkpoint.digest(offset):
+            return offset
+        logger.warning("The receiver's first %d bytes differ from the file, starting over", offset)
+    raise ConnectionError("The receiver's data doesn't match the file even after starting over")
+
+
+def run(algorithm, path, address=RECEIVER_ADDRESS, bind_address=SENDER_ADDRESS, pacing='rate', io='auto',
+        packet_size=PACKET_SIZE, probe=False, trace=None, window=None, fec=False, compress=None, resume=None):
+    # With probe, packet_size is the upper bound of the search
+    if probe:
+        packet_size = probe_packet_size(address, bind_address, high=packet_size)
+        print(f"Probed packet size: {packet_size}")
+    # Parity packets carry a group header on top of a full payload, a chunk
+    # that doesn't compress goes out whole behind its codec tag
+    message_size = packet_size - SEQ_ID_SIZE - max(PARITY.size if fec else 0, TAG_SIZE if compress else 0)
+
+    with PayloadSource(path, message_size) as data:
+        # Offsets past SEQ_SPACE wrap, only a receiver that unwraps them will do
+        if len(data) >= SEQ_SPACE and negotiate_version(address, bind_address) < WRAPPING_VERSION:
+            raise ConnectionError(f'{path} is {len(data)} bytes, the receiver only takes files below {SEQ_SPACE} bytes')
+
+        # The receiver keeps what it has only if the state file vouches for
+        # this exact file and its bytes hash the same as ours, otherwise it
+        # starts over with us
+        start = 0
+        checkpoint = None
+        if resume:
+            checkpoint = Checkpoint(resume, data)
+            start = resume_offset(address, bind_address, checkpoint, message_size)
+            print(f"Resuming at {start} of {len(data)} bytes")
+        sender = Sender(data, get_controller(algorithm, message_size, window), address, bind_address, pacing, io, fec,
+                        compress, start)
+        sender.checkpoint = checkpoint
+        if trace:
+            sender.tracer.enabled = True
+            toggle_tracing(sender.tracer)
+        stats = sender.run()
+        stats.print_summary(len(data) - start)
+        if sender.compressor is not None:
+            compressor = sender.compressor
+            print(f"Compressed Packets: {compressor.compressed_chunks} of "
+                  f"{compressor.compressed_chunks + compressor.raw_chunks}")
+    if trace:
+        sender.tracer.export(trace)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Send a file over UDP with a pluggable congestion controller')
+    parser.add_argument('file', help='file to send')
+    parser.add_argument('-a', '--algorithm', default='reno', choices=sorted(CONTROLLERS))
+    parser.add_argument('--host', default=RECEIVER_ADDRESS[0], help='receiver host')
+    parser.add_argument('--port', type=int, default=RECEIVER_ADDRESS[1], help='receiver port')
+    parser.add_argument('--bind-port', type=int, default=SENDER_ADDRESS[1], help='local port to send from')
+    parser.add_argument('--pacing', default='rate', choices=PACING_MODES,
+                        help='none sends bursts, rate paces at cwnd/SRTT in userspace, kernel uses SO_MAX_PACING_RATE')
+    parser.add_argument('--packet-size', type=int, default=None,
+                        help=f'datagram size including the {SEQ_ID_SIZE} byte header (default {PACKET_SIZE}, or {MAX_PACKET_SIZE} as the probe limit)')
+    parser.add_argument('--probe', action='store_true', help='search for the largest packet size the path delivers')
+    parser.add_argument('--window', type=int, default=None,
+                        help='window in packets, fixed for fixed_window/go_back_n/selective_repeat, initial for the others')
+    parser.add_argument('--io', default='auto', choices=IO_MODES,
+                        help='mmsg batches datagrams with sendmmsg/recvmmsg (Linux), gso batches runs of full-size '
+                             'packets with UDP_SEGMENT (not compressed or parity packets), plain sends one at a time')
+    parser.add_argument('--trace', metavar='PATH',
+                        help='record cwnd/ssthresh/RTT events to PATH (.csv or binary), SIGUSR1 pauses and resumes')
+    parser.add_argument('--fec', action='store_true',
+                        help='send XOR parity per group of packets, the receiver must run with --fec')
+    parser.add_argument('--compress', choices=sorted(CODECS),
+                        help='compress each chunk that pays, the receiver must run with --compress')
+    parser.add_argument('--resume', metavar='STATE',
+                        help='checkpoint progress to STATE and continue after what the receiver already has')
+    logging_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_logging(args.log_level, args.log_sample)
+
+    packet_size = args.packet_size or (MAX_PACKET_SIZE if args.probe else PACKET_SIZE)
+    if not SEQ_ID_SIZE < packet_size <= MAX_PACKET_SIZE:
+        parser.error(f'--packet-size must be between {SEQ_ID_SIZE + 1} and {MAX_PACKET_SIZE}')
+    if args.fec and packet_size <= SEQ_ID_SIZE + PARITY.size:
+        parser.error(f'--packet-size must be above {SEQ_ID_SIZE + PARITY.size} with --fec')
+    if args.compress and packet_size <= SEQ_ID_SIZE + TAG_SIZE:
+        parser.error(f'--packet-size must be above {SEQ_ID_SIZE + TAG_SIZE} with --compress')
+    if args.window is not None and args.window < 1:
+        parser.error('--window must be at least 1 packet')
+
+    run(args.algorithm, args.file, (args.host, args.port), (SENDER_ADDRESS[0], args.bind_port), args.pacing, args.io,
+        packet_size, args.probe, args.trace, args.window, args.fec, args.compress, args.resume)
+
+
+if __name__ == '__main__':
+    main()
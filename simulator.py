@@ -0,0 +1,392 @@
+import argparse
+import contextlib
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+
+import congestion
+import sender as sender_module
+from payload import HEADER, PACKET_SIZE, SEQ_ID_SIZE, wrap
+from congestion import CONTROLLERS, get_controller
+from pacing import make_pacer
+from timers import TimerWheel
+from receiver import Receiver, FINACK
+from sender import Sender, FIN_RETRIES
+from netem import Link
+from fec import PARITY
+from bench import ALGORITHMS, CONDITIONS, DEFAULT_TRIALS, confidence_interval, parse_size
+
+# Only conditions with a delay, on a zero-delay link a whole transfer takes
+# no virtual time at all
+SIM_CONDITIONS = {name: link for name, link in CONDITIONS.items() if link.get('delay')}
+DEFAULT_CONDITIONS = ('wan', 'lossy_wan', 'bursty')
+DEFAULT_SIZE = '1M'
+# Virtual seconds before a transfer counts as failed
+SIM_TIMEOUT = 600
+# Only these pace without a socket
+SIM_PACING_MODES = ('none', 'rate')
+# Paced wakeups land at least this far ahead. The pacer asks for the moment
+# its tokens reach zero, which a virtual clock can hit exactly
+PACING_RESOLUTION = 1e-6
+# Module constants --sweep may change, looked up in congestion and sender
+SWEEPABLE = ('SSH_THRESHOLD', 'DUPE_ACK_THRESHOLD', 'INITIAL_WINDOW', 'WINDOW_SIZE', 'MIN_SSH_THRESHOLD',
+             'TIMEOUT_DURATION', 'ABC_LIMIT')
+
+# Summary columns reported per sweep point
+METRICS = ('throughput', 'avg_packet_delay', 'avg_jitter', 'metric', 'timeouts', 'retransmissions', 'duration')
+
+
+class EventLoop:
+    # Virtual clock and a heap of timed callbacks. Time only moves when the
+    # next event is taken, so a transfer runs as fast as its events do
+    def __init__(self):
+        self.now = 0.0
+        # [when, order, callback, args], callback is None once cancelled
+        self.events = []
+        self.order = itertools.count()
+
+    def time(self):
+        return self.now
+
+    def call_at(self, when, callback, *args):
+        event = [max(when, self.now), next(self.order), callback, args]
+        heapq.heappush(self.events, event)
+        return event
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.now + delay, callback, *args)
+
+    @staticmethod
+    def cancel(event):
+        event[2] = None
+
+    def run(self, until):
+        events = self.events
+        while events and events[0][0] <= until:
+            when, _, callback, args = heapq.heappop(events)
+            if callback is None:
+                continue
+            self.now = when
+            callback(*args)
+
+
+class VirtualPayload:
+    # Stands in for PayloadSource, every chunk is zeros of the right length
+    def __init__(self, size, message_size):
+        self.size = size
+        self.message_size = message_size
+        self.zeros = memoryview(bytes(message_size))
+
+    def __len__(self):
+        return self.size
+
+    def chunk(self, position):
+        return self.zeros[:max(0, min(self.message_size, self.size - position))]
+
+
+def superseded(ack, later):
+    # A cumulative ACK that a later one covers, dupes and fin are kept
+    position = HEADER.unpack_from(ack)[0]
+    return 0 <= position < HEADER.unpack_from(later)[0] and not ack[SEQ_ID_SIZE:].startswith(b'fin')
+
+
+class Network:
+    # Forward and reverse Links between one sender and one Receiver, the
+    # delivery times netem would use become events. With aggregation the
+    # replies are held for that many seconds and leave together, the way
+    # Wi-Fi or DOCSIS uplinks batch them, and every ACK a later one in the
+    # batch covers is dropped, so the sender sees stretch ACKs
+    def __init__(self, loop, forward, reverse, receiver, aggregation=0):
+        self.loop = loop
+        self.forward = forward
+        self.reverse = reverse
+        self.receiver = receiver
+        self.sender = None
+        self.aggregation = aggregation
+        self.held = []
+
+    def send(self, packet):
+        for delivery in self.forward.transmit(len(packet), self.loop.now):
+            self.loop.call_at(delivery, self.arrive, packet)
+
+    def arrive(self, packet):
+        for reply in self.receiver.handle_packet(packet):
+            if not self.aggregation:
+                self.reply(reply)
+                continue
+            if not self.held:
+                self.loop.call_later(self.aggregation, self.release)
+            self.held.append(reply)
+
+    def release(self):
+        held, self.held = self.held, []
+        for ack, later in zip(held, held[1:]):
+            if not superseded(ack, later):
+                self.reply(ack)
+        self.reply(held[-1])
+
+    def reply(self, reply):
+        for delivery in self.reverse.transmit(len(reply), self.loop.now):
+            self.loop.call_at(delivery, self.sender.receive, reply)
+
+
+class SimulatedIO:
+    # Same interface as the batchio backends, packets go into the Network
+    def __init__(self, network):
+        self.network = network
+
+    def send(self, position, chunk=b''):
+        self.network.send(HEADER.pack(wrap(position)) + chunk)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SimulatedSender(Sender):
+    # Sender driven by network events on a virtual clock, the ACK, timeout
+    # and retransmit handling is Sender's and the window comes from the
+    # real controller. Same event structure as aiosender.Transfer
+    def __init__(self, data, controller, loop, network, pacing='rate', fec=False):
+        super().__init__(data, controller, None, None, pacing, fec=fec)
+        self.loop = loop
+        self.clock = loop.time
+        controller.clock = loop.time
+        network.sender = self
+        self.io = SimulatedIO(network)
+        self.pacer = make_pacer(pacing, controller, self.rtt, None, data.message_size)
+
+        self.wakeup = None
+        self.finishing = False
+        self.fin_attempts = 0
+        self.finished = False
+
+    def start(self):
+        self.stats.start(self.loop.now)
+        self.timers = TimerWheel(self.loop.now)
+        self.pump()
+
+    def receive(self, packet):
+        if self.finished:
+            return
+        if self.finishing:
+            if packet[SEQ_ID_SIZE:].startswith(b'fin'):
+                self.close()
+            return
+        self.handle_packet(packet, self.loop.now)
+        self.pump()
+
+    def pump(self):
+        now = self.loop.now
+        expired = self.timers.expire(now)
+        if expired:
+            self.handle_timeout(expired)
+
+        self.send_window()
+
+        # Handle completion
+        if self.next_position >= len(self.data) and not self.in_flight:
+            self.finishing = True
+            self.send_fin()
+            return
+
+        # Next paced packet or earliest retransmission timer, an armed
+        # wakeup is rarely later than a new one and skips the timer scan
+        if self.paced_backlog():
+            when = max(self.pacer.next_time(), now + PACING_RESOLUTION)
+        elif self.wakeup is not None:
+            return
+        else:
+            deadline = self.timers.next_deadline()
+            when = now + self.rtt.get_RTO() if deadline is None else deadline
+        if self.wakeup is not None and self.wakeup[0] <= when:
+            return
+        self.call_at(when, self.on_wakeup)
+
+    def on_wakeup(self):
+        self.wakeup = None
+        if not self.finished:
+            self.pump()
+
+    def call_at(self, when, callback):
+        if self.wakeup is not None:
+            self.loop.cancel(self.wakeup)
+        self.wakeup = self.loop.call_at(when, callback)
+
+    def send_fin(self):
+        # Empty packet signals completion, resent until the receiver's fin
+        if self.fin_attempts == FIN_RETRIES:
+            self.close()
+            return
+        self.fin_attempts += 1
+        self.io.send(len(self.data))
+        self.call_at(self.loop.now + self.rtt.get_RTO(), self.send_fin)
+
+    def close(self):
+        if self.wakeup is not None:
+            self.loop.cancel(self.wakeup)
+            self.wakeup = None
+        self.io.send(0, FINACK)
+        self.stats.stop(self.loop.now)
+        self.finished = True
+
+
+@contextlib.contextmanager
+def constants(**values):
+    # Temporarily sets module constants in congestion and sender, which
+    # read them at call time, e.g. constants(DUPE_ACK_THRESHOLD=2)
+    modules = (congestion, sender_module)
+    saved = []
+    try:
+        for name, value in values.items():
+            if name not in SWEEPABLE:
+                raise ValueError(f"Can't sweep {name}, choose from: {', '.join(SWEEPABLE)}")
+            for module in modules:
+                if hasattr(module, name):
+                    saved.append((module, name, getattr(module, name)))
+                    setattr(module, name, value)
+        yield
+    finally:
+        for module, name, value in reversed(saved):
+            setattr(module, name, value)
+
+
+def simulate(algorithm, size, forward, reverse, packet_size=PACKET_SIZE, pacing='rate', window=None, sack=False,
+             fec=False, aggregation=0, timeout=SIM_TIMEOUT):
+    # One transfer of size bytes over the given Links. Returns the
+    # summary dict, None if it didn't finish within timeout virtual seconds
+    message_size = packet_size - SEQ_ID_SIZE - (PARITY.size if fec else 0)
+    loop = EventLoop()
+    receiver = Receiver(sack=sack, fec=fec)
+    network = Network(loop, forward, reverse, receiver, aggregation)
+    data = VirtualPayload(size, message_size)
+    transfer = SimulatedSender(data, get_controller(algorithm, message_size, window), loop, network, pacing, fec)
+    transfer.start()
+    loop.run(timeout)
+    if not transfer.finished or receiver.received != size:
+        return None
+    return transfer.stats.summary(size)
+
+
+def run_point(algorithm, condition, size, seed, params, options):
+    # One trial of one sweep point, also the pool worker
+    link = SIM_CONDITIONS[condition]
+    forward = Link(**link, seed=seed)
+    reverse = Link(delay=link.get('delay', 0), seed=seed + 1)
+    with constants(**params):
+        summary = simulate(algorithm, size, forward, reverse, options['packet_size'], options['pacing'],
+                           options['window'], options['sack'], options['fec'], options['ack_aggregation'])
+    return {'algorithm': algorithm, 'condition': condition, 'size': size, 'seed': seed, 'params': params,
+            'ok': summary is not None, 'summary': summary}
+
+
+def sweep_points(sweeps):
+    # {name: [values]} to every combination as a list of {name: value}
+    names = sorted(sweeps)
+    return [dict(zip(names, values)) for values in itertools.product(*(sweeps[name] for name in names))]
+
+
+def run_sweep(algorithms, conditions, size, sweeps, trials, seed, options, processes=None):
+    jobs = [(algorithm, condition, size, seed + i, params, options)
+            for params in sweep_points(sweeps) for algorithm in algorithms for condition in conditions
+            for i in range(trials)]
+    if processes == 1:
+        return [run_point(*job) for job in jobs]
+    with multiprocessing.Pool(processes) as pool:
+        return pool.starmap(run_point, jobs)
+
+
+def aggregate(trials):
+    # One row per (params, algorithm, condition) with mean and 95% CI
+    groups = {}
+    for trial in trials:
+        key = (tuple(sorted(trial['params'].items())), trial['algorithm'], trial['condition'])
+        groups.setdefault(key, []).append(trial)
+
+    rows = []
+    for (params, algorithm, condition), group in groups.items():
+        done = [trial['summary'] for trial in group if trial['ok']]
+        row = {**dict(params), 'algorithm': algorithm, 'condition': condition, 'trials': len(group), 'ok': len(done)}
+        for name in METRICS:
+            values = [summary[name] for summary in done if summary[name] is not None]
+            if values:
+                row[name], row[f'{name}_ci'] = confidence_interval(values)
+            else:
+                row[name] = row[f'{name}_ci'] = None
+        rows.append(row)
+    return rows
+
+
+def print_rows(rows, names):
+    header = ''.join(f'{name:>20}' for name in names)
+    print(f"{header}{'algorithm':>14}{'condition':>11}{'ok':>7}{'throughput':>24}{'delay':>22}{'jitter':>22}"
+          f"{'metric':>20}{'resent':>8}")
+    for row in rows:
+        prefix = ''.join(f'{row[name]:>20}' for name in names)
+        prefix += f"{row['algorithm']:>14}{row['condition']:>11}{row['ok']:>4}/{row['trials']:<2}"
+        if row['throughput'] is None:
+            print(prefix)
+            continue
+        print(f"{prefix}{row['throughput']:>14.0f} ±{row['throughput_ci']:<8.0f}"
+              f"{row['avg_packet_delay']:>12.5f} ±{row['avg_packet_delay_ci']:<8.5f}"
+              f"{row['avg_jitter']:>12.5f} ±{row['avg_jitter_ci']:<8.5f}"
+              f"{row['metric']:>12.1f} ±{row['metric_ci']:<6.1f}{row['retransmissions']:>8.0f}")
+
+
+def parse_number(value):
+    # int when integral, so counts stay ints and e.g. 0.5 stays a float
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def parse_sweep(value):
+    # NAME=v1,v2,... with numeric values
+    name, _, values = value.partition('=')
+    name = name.strip().upper()
+    if name not in SWEEPABLE or not values:
+        raise argparse.ArgumentTypeError(f'expected NAME=v1,v2 with NAME one of {", ".join(SWEEPABLE)}')
+    try:
+        return name, [parse_number(v) for v in values.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected numbers after {name}=, got {values}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the congestion controllers over simulated links on a virtual clock')
+    parser.add_argument('-a', '--algorithms', nargs='+', default=list(ALGORITHMS), choices=sorted(CONTROLLERS))
+    parser.add_argument('-c', '--conditions', nargs='+', default=list(DEFAULT_CONDITIONS), choices=sorted(SIM_CONDITIONS))
+    parser.add_argument('-s', '--size', default=DEFAULT_SIZE, help='bytes per transfer, e.g. 256K or 4M')
+    parser.add_argument('-n', '--trials', type=int, default=DEFAULT_TRIALS, help='seeds per sweep point')
+    parser.add_argument('--seed', type=int, default=1, help='trial i uses seed + i for its link')
+    parser.add_argument('--sweep', type=parse_sweep, action='append', default=[], metavar='NAME=v1,v2',
+                        help=f'values for a module constant, repeat for a grid ({", ".join(SWEEPABLE)})')
+    parser.add_argument('--pacing', default='rate', choices=SIM_PACING_MODES)
+    parser.add_argument('--packet-size', type=int, default=PACKET_SIZE)
+    parser.add_argument('--window', type=int, default=None, help='window in packets for every sender')
+    parser.add_argument('--sack', action='store_true', help='receiver appends SACK blocks to its ACKs')
+    parser.add_argument('--fec', action='store_true', help='senders add XOR parity, the receiver repairs from it')
+    parser.add_argument('--ack-aggregation', type=float, default=0, metavar='SECONDS',
+                        help='hold ACKs this long and deliver them as one batch of stretch ACKs')
+    parser.add_argument('-j', '--processes', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--json', help='write trials and aggregates here')
+    args = parser.parse_args(argv)
+
+    sweeps = dict(args.sweep)
+    options = {'packet_size': args.packet_size, 'pacing': args.pacing, 'window': args.window, 'sack': args.sack,
+               'fec': args.fec, 'ack_aggregation': args.ack_aggregation}
+    trials = run_sweep(args.algorithms, args.conditions, parse_size(args.size), sweeps, args.trials, args.seed,
+                       options, args.processes)
+    rows = aggregate(trials)
+    print_rows(rows, sorted(sweeps))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'trials': trials, 'aggregates': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+import math
+from array import array
+from time import time
+
+# Histogram resolution: 2**SUB_BUCKET_BITS linear buckets per power of two,
+# so any recorded value is reported within 1/64 (~1.6%) of itself
+SUB_BUCKET_BITS = 7
+# Values are recorded in microseconds, anything above ~19 hours is clamped
+HIGHEST_TRACKABLE = 2 ** 36
+UNITS_PER_SECOND = 1_000_000
+
+# Width of the throughput-over-time windows in seconds
+THROUGHPUT_WINDOW = 0.1
+# RFC 3550 jitter gain
+JITTER_GAIN = 1 / 16
+
+QUANTILES = (0.5, 0.99, 0.999)
+
+
+class Histogram:
+    # HDR-style log-linear histogram over non-negative seconds. Memory is fixed
+    # by the resolution and range, recording is a few integer operations
+    def __init__(self, sub_bucket_bits=SUB_BUCKET_BITS, highest=HIGHEST_TRACKABLE):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_buckets = 1 << sub_bucket_bits
+        self.half = self.sub_buckets >> 1
+        self.highest = highest - 1
+        self.counts = array('q', bytes(8 * (self.index(self.highest) + 1)))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def index(self, value):
+        # Below sub_buckets every unit has its own bucket, above that each
+        # power of two is split into half linear buckets
+        if value < self.sub_buckets:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_buckets + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def value_at(self, index):
+        # Midpoint of the bucket, in recorded units
+        if index < self.sub_buckets:
+            return index
+        shift, offset = divmod(index - self.sub_buckets, self.half)
+        shift += 1
+        low = (offset + self.half) << shift
+        return low + ((1 << shift) - 1) / 2
+
+    def record(self, seconds):
+        value = min(int(seconds * UNITS_PER_SECOND), self.highest) if seconds > 0 else 0
+        self.counts[self.index(value)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                seen += count
+                if seen >= rank:
+                    # Never report past the exact extremes
+                    value = self.value_at(index) / UNITS_PER_SECOND
+                    return min(max(value, self.min), self.max)
+        return self.max
+
+    def quantiles(self, qs=QUANTILES):
+        return [self.quantile(q) for q in qs]
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+
+class Statistics:
+    # Per-transfer statistics. The project metric keeps its running means,
+    # delay and jitter also go into histograms for the tail, jitter is also
+    # tracked the RFC 3550 way, and delivered bytes are binned in time
+    # windows. Callers pass one timestamp per ACK batch
+    def __init__(self, window=THROUGHPUT_WINDOW):
+        self.total_packet_delay = 0
+        self.total_jitter = 0
+        self.packetCount = 0
+        self.previous_delay = None
+
+        self.delays = Histogram()
+        self.jitters = Histogram()
+        # Smoothed |D| between consecutive delays, RFC 3550 section 6.4.1
+        self.rfc3550_jitter = 0
+
+        # Bytes delivered per window since start
+        self.window = window
+        self.delivered = array('q')
+
+        #Troubleshooting
+        self.timeout_count = 0
+        self.retransmissions = 0
+        self.retransmitted_bytes = 0
+        self.parity_packets = 0
+        self.parity_bytes = 0
+        self.fec_repairs = 0
+        # Every datagram the sender put out, headers, resends and parity included
+        self.wire_bytes = 0
+
+        self.start_throughput = None
+        self.end_throughput = None
+
+    def start(self, now=None):
+        self.start_throughput = time() if now is None else now
+
+    def stop(self, now=None):
+        self.end_throughput = time() if now is None else now
+
+    def record_delay(self, packet_delay):
+        self.total_packet_delay += packet_delay
+        self.packetCount += 1
+        self.delays.record(packet_delay)
+
+        if self.previous_delay is not None:
+            difference = abs(packet_delay - self.previous_delay)
+            self.total_jitter += difference
+            self.jitters.record(difference)
+            self.rfc3550_jitter += (difference - self.rfc3550_jitter) * JITTER_GAIN
+        self.previous_delay = packet_delay
+
+    def record_retransmission(self, size):
+        self.retransmissions += 1
+        self.retransmitted_bytes += size
+
+    def record_parity(self, size):
+        self.parity_packets += 1
+        self.parity_bytes += size
+
+    def record_sent(self, size):
+        self.wire_bytes += size
+
+    def record_delivered(self, size, now):
+        # Bytes newly covered by the cumulative ACK at time now
+        slot = int((now - self.start_throughput) / self.window)
+        delivered = self.delivered
+        if slot >= len(delivered):
+            delivered.extend(array('q', bytes(8 * (slot + 1 - len(delivered)))))
+        delivered[slot] += size
+
+    def throughput_windows(self):
+        # Bytes per second in each window, the last one may be partial
+        return [size / self.window for size in self.delivered]
+
+    def summary(self, size):
+        if self.packetCount == 0:
+            return None
+
+        # Calculate throughput (bytes per second)
+        duration = self.end_throughput - self.start_throughput
+        throughput = size / duration
+
+        # Calculate average packet delay (seconds)
+        avg_packet_delay = self.total_packet_delay / self.packetCount
+
+        # Calculate average jitter (seconds)
+        avg_jitter = self.total_jitter / (self.packetCount - 1) if self.packetCount > 1 else 0
+
+        # Calculate performance metric
+        metric = 0.2 * (throughput / 2000)
+        if avg_jitter > 0:
+            metric += 0.1 / avg_jitter
+        if avg_packet_delay > 0:
+            metric += 0.8 / avg_packet_delay
+
+        delay_p50, delay_p99, delay_p999 = self.delays.quantiles()
+        jitter_p50, jitter_p99, jitter_p999 = self.jitters.quantiles()
+        windows = self.throughput_windows()
+
+        return {
+            'throughput': throughput,
+            'avg_packet_delay': avg_packet_delay,
+            'avg_jitter': avg_jitter,
+            'metric': metric,
+            'timeouts': self.timeout_count,
+            'duration': duration,
+            'retransmissions': self.retransmissions,
+            'retransmitted_bytes': self.retransmitted_bytes,
+            'parity_packets': self.parity_packets,
+            'parity_bytes': self.parity_bytes,
+            'fec_repairs': self.fec_repairs,
+            'wire_bytes': self.wire_bytes,
+            # What the link carried, against the file bytes of throughput
+            'wire_throughput': self.wire_bytes / duration,
+            'delay_p50': delay_p50,
+            'delay_p99': delay_p99,
+            'delay_p999': delay_p999,
+            'max_delay': self.delays.max,
+            'jitter_p50': jitter_p50,
+            'jitter_p99': jitter_p99,
+            'jitter_p999': jitter_p999,
+            'rfc3550_jitter': self.rfc3550_jitter,
+            'min_window_throughput': min(windows) if windows else None,
+            'max_window_throughput': max(windows) if windows else None,
+        }
+
+    def print_summary(self, size):
+        summary = self.summary(size)
+        if summary is None:
+            return
+
+        print(f"Throughput: {round(summary['throughput'], 7)}")
+        print(f"Wire Throughput: {round(summary['wire_throughput'], 7)} ({summary['wire_bytes']} bytes sent)")
+        print(f"Average Per-Packet Delay: {round(summary['avg_packet_delay'], 7)}")
+        print(f"Average Jitter: {round(summary['avg_jitter'], 7)}")
+        print(f"Performance Metric: {round(summary['metric'], 7)}")
+        print(f"Per-Packet Delay p50/p99/p99.9: {round(summary['delay_p50'], 7)} / "
+              f"{round(summary['delay_p99'], 7)} / {round(summary['delay_p999'], 7)}")
+        if summary['jitter_p50'] is not None:
+            print(f"Jitter p50/p99/p99.9: {round(summary['jitter_p50'], 7)} / "
+                  f"{round(summary['jitter_p99'], 7)} / {round(summary['jitter_p999'], 7)}")
+        print(f"RFC 3550 Jitter: {round(summary['rfc3550_jitter'], 7)}")
+        print(f"Timeouts: {summary['timeouts']}")
+        print(f"Retransmissions: {summary['retransmissions']} ({summary['retransmitted_bytes']} bytes)")
+        if summary['parity_packets']:
+            print(f"Parity: {summary['parity_packets']} ({summary['parity_bytes']} bytes), "
+                  f"{summary['fec_repairs']} losses repaired")
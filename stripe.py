@@ -0,0 +1,132 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+
+from payload import PayloadSource, PACKET_SIZE, MAX_PACKET_SIZE, SEQ_ID_SIZE, SEQ_SPACE, WRAPPING_VERSION
+from congestion import CONTROLLERS, get_controller
+from pacing import PACING_MODES
+from batchio import IO_MODES
+from receiver import Receiver, RECEIVER_ADDRESS
+from sender import Sender
+from handshake import negotiate_version
+from log import DEFAULT_LEVEL, SAMPLE_EVERY, logging_arguments, setup_logging
+
+DEFAULT_FLOWS = 4
+# Flows send from ephemeral ports so they never collide with each other
+FLOW_BIND_ADDRESS = ("0.0.0.0", 0)
+
+
+def stripe_ranges(size, flows, message_size):
+    # Splits [0, size) into one (offset, length) range per flow, cut on
+    # packet boundaries so only the last range ends with a short packet
+    packets = -(-size // message_size)
+    ranges = []
+    for i in range(flows):
+        start = min(packets * i // flows * message_size, size)
+        end = min(packets * (i + 1) // flows * message_size, size)
+        ranges.append((start, end - start))
+    return ranges
+
+
+def send_range(algorithm, path, offset, length, address, pacing, io, packet_size):
+    # Runs in a pool worker, one flow with its own controller and socket.
+    # Positions are relative to the range, so every flow is a plain transfer
+    message_size = packet_size - SEQ_ID_SIZE
+    with PayloadSource(path, message_size, offset, length) as data:
+        # Same check as sender.run, a range past SEQ_SPACE wraps its offsets
+        if len(data) >= SEQ_SPACE and negotiate_version(address, FLOW_BIND_ADDRESS) < WRAPPING_VERSION:
+            raise ConnectionError(f'The range at {offset} is {len(data)} bytes, the receiver on port {address[1]} '
+                                  f'only takes ranges below {SEQ_SPACE} bytes')
+        sender = Sender(data, get_controller(algorithm, message_size), address, FLOW_BIND_ADDRESS, pacing, io)
+        return sender.run()
+
+
+def send_striped(algorithm, path, flows=DEFAULT_FLOWS, address=RECEIVER_ADDRESS, pacing='rate', io='auto',
+                 packet_size=PACKET_SIZE, log_level=DEFAULT_LEVEL, log_sample=SAMPLE_EVERY):
+    # Flow i sends the i-th range to port + i, returns one Statistics per flow
+    size = os.path.getsize(path)
+    host, port = address
+    jobs = [(algorithm, path, offset, length, (host, port + i), pacing, io, packet_size)
+            for i, (offset, length) in enumerate(stripe_ranges(size, flows, packet_size - SEQ_ID_SIZE))]
+
+    # Each worker gets its own log queue and listener thread
+    with multiprocessing.Pool(flows, setup_logging, (log_level, log_sample)) as pool:
+        return pool.starmap(send_range, jobs)
+
+
+def receive_range(port, output, sack):
+    return Receiver((RECEIVER_ADDRESS[0], port), output, sack).run()
+
+
+def receive_striped(flows=DEFAULT_FLOWS, port=RECEIVER_ADDRESS[1], output=None, sack=False):
+    # One receiver process per flow on port + i, each writes its range to a
+    # part file and the parts are joined in port order once every flow is done
+    parts = [f'{output}.part{i}' if output else None for i in range(flows)]
+    with multiprocessing.Pool(flows) as pool:
+        received = pool.starmap(receive_range, [(port + i, parts[i], sack) for i in range(flows)])
+
+    if output:
+        with open(output, 'wb') as out:
+            for part in parts:
+                with open(part, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+                os.remove(part)
+    return sum(received)
+
+
+def print_report(flow_stats, ranges):
+    # Aggregate throughput is over the wall time from the first flow's start
+    # to the last flow's end, not the sum of the per-flow rates
+    for i, (stats, (offset, length)) in enumerate(zip(flow_stats, ranges)):
+        summary = stats.summary(length)
+        if summary is None:
+            continue
+        print(f"Flow {i} [{offset}, {offset + length}): {round(summary['throughput'], 7)} B/s, "
+              f"{round(summary['avg_packet_delay'], 7)} s delay, {summary['timeouts']} timeouts")
+
+    elapsed = max(stats.end_throughput for stats in flow_stats) - min(stats.start_throughput for stats in flow_stats)
+    total = sum(length for _, length in ranges)
+    print(f"Aggregate Throughput: {round(total / elapsed, 7)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Striped transfer of one file over parallel flows')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    send = commands.add_parser('send', help='send a file as N ranges from N processes')
+    send.add_argument('file', help='file to send')
+    send.add_argument('-n', '--flows', type=int, default=DEFAULT_FLOWS, help='parallel flows, one process each')
+    send.add_argument('-a', '--algorithm', default='reno', choices=sorted(CONTROLLERS))
+    send.add_argument('--host', default=RECEIVER_ADDRESS[0], help='receiver host')
+    send.add_argument('--port', type=int, default=RECEIVER_ADDRESS[1], help='first receiver port, flow i uses port + i')
+    send.add_argument('--pacing', default='rate', choices=PACING_MODES)
+    send.add_argument('--io', default='auto', choices=IO_MODES)
+    send.add_argument('--packet-size', type=int, default=PACKET_SIZE,
+                      help=f'datagram size including the {SEQ_ID_SIZE} byte header')
+    logging_arguments(send)
+
+    receive = commands.add_parser('receive', help='receive N ranges and join them')
+    receive.add_argument('-o', '--output', help='write the reassembled file here')
+    receive.add_argument('-n', '--flows', type=int, default=DEFAULT_FLOWS, help='parallel flows, one process each')
+    receive.add_argument('--port', type=int, default=RECEIVER_ADDRESS[1], help='first port, flow i listens on port + i')
+    receive.add_argument('--sack', action='store_true', help='append SACK blocks to every ACK')
+    args = parser.parse_args(argv)
+
+    if args.flows < 1:
+        parser.error('--flows must be at least 1')
+
+    if args.command == 'receive':
+        print(f'Received {receive_striped(args.flows, args.port, args.output, args.sack)} bytes')
+        return
+
+    if not SEQ_ID_SIZE < args.packet_size <= MAX_PACKET_SIZE:
+        parser.error(f'--packet-size must be between {SEQ_ID_SIZE + 1} and {MAX_PACKET_SIZE}')
+
+    flow_stats = send_striped(args.algorithm, args.file, args.flows, (args.host, args.port), args.pacing, args.io,
+                              args.packet_size, args.log_level, args.log_sample)
+    print_report(flow_stats, stripe_ranges(os.path.getsize(args.file), args.flows, args.packet_size - SEQ_ID_SIZE))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from aiosender import parse_address, send_all
+from receiver import Receiver
+from stats import Statistics
+
+
+@pytest.fixture
+def receivers(tmp_path):
+    # Started on demand on ephemeral loopback ports, each writes its own file
+    started = []
+
+    def start(sack=False):
+        receiver = Receiver(('127.0.0.1', 0), str(tmp_path / f'out{len(started)}.bin'), sack)
+        ready = threading.Event()
+        thread = threading.Thread(target=receiver.run, args=(ready,), daemon=True)
+        thread.start()
+        assert ready.wait(5)
+        started.append(thread)
+        return receiver.udp_socket.getsockname(), thread
+    yield start
+    for thread in started:
+        thread.join(5)
+
+
+def finished(thread):
+    # The receiver closes its output once the sender's FINACK arrives
+    thread.join(5)
+    return not thread.is_alive()
+
+
+def write(path, size):
+    data = os.urandom(size)
+    path.write_bytes(data)
+    return data
+
+
+def test_concurrent_transfers_to_several_receivers(tmp_path, receivers):
+    first, second = write(tmp_path / 'a.bin', 300_000), write(tmp_path / 'b.bin', 120_000)
+    (address_a, thread_a), (address_b, thread_b) = receivers(), receivers(sack=True)
+    jobs = [('reno', tmp_path / 'a.bin', address_a), ('cubic', tmp_path / 'b.bin', address_b)]
+    results = asyncio.run(send_all(jobs))
+
+    assert all(isinstance(result, Statistics) for result in results)
+    assert finished(thread_a) and finished(thread_b)
+    assert (tmp_path / 'out0.bin').read_bytes() == first
+    assert (tmp_path / 'out1.bin').read_bytes() == second
+
+
+def test_a_failed_job_leaves_the_others_running(tmp_path, receivers):
+    data = write(tmp_path / 'a.bin', 50_000)
+    address, thread = receivers()
+    results = asyncio.run(send_all([('reno', tmp_path / 'missing.bin', address), ('reno', tmp_path / 'a.bin', address)],
+                                   pacing='none'))
+    assert isinstance(results[0], FileNotFoundError)
+    assert isinstance(results[1], Statistics)
+    assert finished(thread)
+    assert (tmp_path / 'out0.bin').read_bytes() == data
+
+
+def test_parse_address():
+    assert parse_address('10.0.0.2:6000') == ('10.0.0.2', 6000)
+    assert parse_address(':6000') == ('localhost', 6000)
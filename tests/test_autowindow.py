@@ -0,0 +1,82 @@
+import pytest
+
+from congestion import AUTO_BDP_GAIN, AUTO_MIN_WINDOW, get_controller
+
+MSS = 1000
+# A power of two, so round boundaries add up exactly
+MIN_RTT = 0.125
+
+
+def auto_window():
+    # On a settable clock, with a min RTT sample and the first round started
+    controller = get_controller('auto_window', MSS)
+    controller.now = 0.0
+    controller.clock = lambda: controller.now
+    controller.handle_RTT(MIN_RTT)
+    controller.handle_ACK(MSS)
+    return controller
+
+
+def run_round(controller, delivered):
+    controller.now += MIN_RTT
+    controller.handle_ACK(controller.lastACK + delivered)
+
+
+def test_starts_at_the_minimum():
+    assert get_controller('auto_window', MSS).get_Window() == AUTO_MIN_WINDOW * MSS
+
+
+def test_window_doubles_while_the_ack_rate_grows():
+    controller = auto_window()
+    windows = []
+    for _ in range(5):
+        run_round(controller, controller.get_Window())
+        windows.append(controller.get_Window() // MSS)
+    assert windows == [8, 16, 32, 64, 128]
+    assert controller.probing
+
+
+def test_window_settles_at_the_bdp_when_the_rate_plateaus():
+    controller = auto_window()
+    capacity = 16 * MSS
+    windows = []
+    for _ in range(6):
+        run_round(controller, min(controller.get_Window(), capacity))
+        windows.append(controller.get_Window() // MSS)
+    # Three rounds without 25% more ACK rate end the probe
+    assert windows[:5] == [8, 16, 32, 32, 32]
+    assert not controller.probing
+    target = AUTO_BDP_GAIN * capacity / MIN_RTT * MIN_RTT
+    assert controller.get_Window() == pytest.approx(target, abs=1)
+    run_round(controller, capacity)
+    assert controller.get_Window() == pytest.approx(target, abs=1)
+
+
+def test_no_rounds_without_an_rtt_sample():
+    controller = get_controller('auto_window', MSS)
+    controller.now = 0.0
+    controller.clock = lambda: controller.now
+    for position in range(MSS, 50 * MSS, MSS):
+        controller.now += MIN_RTT
+        controller.handle_ACK(position)
+    assert controller.get_Window() == AUTO_MIN_WINDOW * MSS and controller.probing
+
+
+def test_timeout_halves_and_ends_the_probe():
+    controller = auto_window()
+    for _ in range(3):
+        run_round(controller, controller.get_Window())
+    controller.handle_timeout()
+    assert controller.get_Window() == 16 * MSS and not controller.probing
+    for _ in range(5):
+        controller.handle_timeout()
+    assert controller.get_Window() == AUTO_MIN_WINDOW * MSS
+
+
+def test_set_window_caps_the_probe():
+    controller = auto_window()
+    controller.set_Window(20)
+    for _ in range(4):
+        run_round(controller, controller.get_Window())
+    assert controller.get_Window() == 20 * MSS
+    assert not controller.probing
@@ -0,0 +1,91 @@
+import socket
+
+import pytest
+
+import batchio
+from batchio import BATCH_SIZE, MMsgIO, PlainIO, make_io
+from payload import HEADER, PayloadSource, build_ack
+
+MESSAGE_SIZE = 500
+CONTENT = bytes(range(256)) * 400
+
+needs_mmsg = pytest.mark.skipif(batchio.libc is None, reason='sendmmsg/recvmmsg need Linux')
+
+
+@pytest.fixture
+def sockets():
+    # A connected pair on loopback, the sender's end is non-blocking
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender, \
+            socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver:
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(1)
+        sender.bind(('127.0.0.1', 0))
+        sender.setblocking(False)
+        yield sender, receiver
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'file.bin'
+    path.write_bytes(CONTENT)
+    # A range that doesn't start at the beginning of the mapping
+    with PayloadSource(path, MESSAGE_SIZE, offset=1000) as data:
+        yield data
+
+
+def receive(receiver, count):
+    return [receiver.recv(2048) for _ in range(count)]
+
+
+@needs_mmsg
+def test_mmsg_sends_mapped_chunks_in_batches(sockets, source):
+    sender, receiver = sockets
+    io = MMsgIO(sender, receiver.getsockname(), source)
+    positions = range(0, len(source), MESSAGE_SIZE)
+    count = BATCH_SIZE + 10
+    for position in positions[:count]:
+        io.send(position, source.chunk(position))
+    # A full batch goes out on its own, the rest waits for flush
+    assert len(receive(receiver, BATCH_SIZE)) == BATCH_SIZE
+    io.flush()
+    rest = receive(receiver, 10)
+    io.close()
+    assert rest[-1] == HEADER.pack(positions[count - 1]) + bytes(source.chunk(positions[count - 1]))
+    assert rest[0][HEADER.size:] == CONTENT[1000 + BATCH_SIZE * MESSAGE_SIZE:1000 + (BATCH_SIZE + 1) * MESSAGE_SIZE]
+
+
+@needs_mmsg
+def test_mmsg_sends_payloads_from_outside_the_mapping(sockets, source):
+    sender, receiver = sockets
+    io = MMsgIO(sender, receiver.getsockname(), source)
+    io.send(-2, bytearray(b'parity'))
+    io.send(len(source))
+    io.close()
+    assert receive(receiver, 2) == [HEADER.pack(-2) + b'parity', HEADER.pack(len(source))]
+
+
+@needs_mmsg
+def test_mmsg_drains_every_queued_ack(sockets, source):
+    sender, receiver = sockets
+    io = MMsgIO(sender, receiver.getsockname(), source)
+    assert io.recv_acks() == []
+    acks = [build_ack(position) for position in range(0, 5000, 500)]
+    for ack in acks:
+        receiver.sendto(ack, sender.getsockname())
+    assert batchio.wait_readable(sender, 1)
+    received = []
+    while len(received) < len(acks):
+        received += io.recv_acks()
+    io.close()
+    assert received == acks
+
+
+def test_plain_io(sockets, source):
+    sender, receiver = sockets
+    io = make_io('plain', sender, receiver.getsockname(), source)
+    assert isinstance(io, PlainIO)
+    io.send(0, source.chunk(0))
+    assert receive(receiver, 1) == [HEADER.pack(0) + CONTENT[1000:1000 + MESSAGE_SIZE]]
+    receiver.sendto(build_ack(500), sender.getsockname())
+    assert batchio.wait_readable(sender, 1)
+    assert io.recv_acks() == [build_ack(500)]
@@ -0,0 +1,116 @@
+import csv
+import math
+
+import pytest
+
+import bench
+from bench import (METRICS, REGRESSION_TOLERANCE, T_95, aggregate, confidence_interval, find_regressions, parse_size,
+                   t_critical, write_csv)
+
+
+def test_t_critical():
+    assert t_critical(1) == 12.706
+    assert t_critical(30) == 2.042
+    # Between entries the smaller df, past the table its last entry
+    assert t_critical(45) == T_95[40]
+    assert t_critical(1000) == T_95[120]
+
+
+def test_confidence_interval():
+    assert confidence_interval([5.0]) == (5.0, 0.0)
+    mean, half = confidence_interval([1.0, 2.0, 3.0])
+    assert mean == 2.0
+    assert half == pytest.approx(T_95[2] / math.sqrt(3))
+    assert confidence_interval([4.0] * 10) == (4.0, 0.0)
+
+
+def test_parse_size():
+    assert parse_size('256K') == 256 * 1024
+    assert parse_size('1.5m') == 1536 * 1024
+    assert parse_size('1000') == 1000
+
+
+def summary(throughput, delay=0.01, **values):
+    return {name: values.get(name, 1.0) for name in METRICS} | {'throughput': throughput, 'avg_packet_delay': delay}
+
+
+def trial(throughput, ok=True, algorithm='reno', **values):
+    return {'algorithm': algorithm, 'condition': 'wan', 'size': 1024, 'seed': 1, 'ok': ok,
+            'summary': summary(throughput, **values) if ok else None}
+
+
+def test_aggregate_uses_complete_trials_only():
+    rows = aggregate([trial(100.0), trial(110.0), trial(120.0), trial(0, ok=False), trial(50.0, algorithm='tahoe')])
+    reno, tahoe = rows
+    assert (reno['trials'], reno['ok']) == (4, 3)
+    assert reno['throughput'] == 110.0
+    assert reno['throughput_ci'] == pytest.approx(T_95[2] * 10 / math.sqrt(3))
+    assert tahoe['throughput'] == 50.0 and tahoe['throughput_ci'] == 0.0
+
+
+def test_aggregate_skips_missing_tail_metrics():
+    row, = aggregate([trial(100.0, delay_p99=None), trial(100.0, delay_p99=None)])
+    assert row['delay_p99'] is None and row['delay_p99_ci'] is None
+
+
+def rows(*throughputs, delay=0.01, ok=True):
+    return aggregate([trial(value, delay=delay, ok=ok) for value in throughputs])
+
+
+def test_drop_beyond_noise_and_tolerance_is_a_regression():
+    baseline = rows(1000.0, 1000.0, 1000.0)
+    regressions = find_regressions(rows(800.0, 800.0, 800.0), baseline)
+    assert [(regression['metric'], regression['baseline'], regression['current']) for regression in regressions] == \
+        [('throughput', 1000.0, 800.0)]
+
+
+def test_improvement_is_not_a_regression():
+    assert find_regressions(rows(1200.0, 1200.0), rows(1000.0, 1000.0)) == []
+
+
+def test_drop_within_the_tolerance_is_not_a_regression():
+    drop = 1000.0 * (1 - REGRESSION_TOLERANCE / 2)
+    assert find_regressions(rows(drop, drop), rows(1000.0, 1000.0)) == []
+
+
+def test_drop_within_the_confidence_intervals_is_not_a_regression():
+    # Noisy trials, the 20% drop is inside CI(old) + CI(new)
+    assert find_regressions(rows(600.0, 1000.0, 1400.0), rows(700.0, 1200.0, 1700.0)) == []
+
+
+def test_higher_delay_is_a_regression():
+    regressions = find_regressions(rows(1000.0, 1000.0, delay=0.02), rows(1000.0, 1000.0, delay=0.01))
+    assert [regression['metric'] for regression in regressions] == ['avg_packet_delay']
+
+
+def test_failed_trials_are_a_regression():
+    current = aggregate([trial(1000.0), trial(0, ok=False)])
+    regressions = find_regressions(current, rows(1000.0, 1000.0))
+    assert [(regression['metric'], regression['baseline'], regression['current']) for regression in regressions] == \
+        [('ok', 2, 1)]
+
+
+def test_new_combinations_have_no_baseline():
+    assert find_regressions(rows(1.0), aggregate([trial(1000.0, algorithm='tahoe')])) == []
+
+
+def test_csv_has_a_column_per_metric_and_interval(tmp_path):
+    path = tmp_path / 'results.csv'
+    write_csv(path, rows(100.0, 110.0, 120.0))
+    with open(path, newline='') as f:
+        row, = csv.DictReader(f)
+    assert float(row['throughput']) == 110.0
+    assert set(METRICS) <= set(row) and all(f'{name}_ci' in row for name in METRICS)
+
+
+def test_baseline_gates_the_exit_code(tmp_path, monkeypatch, capsys):
+    baseline = tmp_path / 'baseline.json'
+    arguments = ['-a', 'reno', '-c', 'wan', '-s', '1K', '-n', '3', '--workdir', str(tmp_path)]
+    monkeypatch.setattr(bench, 'run_trial', lambda algorithm, condition, path, size, seed, options: trial(1000.0))
+    assert bench.main(arguments + ['--save-baseline', str(baseline)]) == 0
+    assert bench.main(arguments + ['--baseline', str(baseline)]) == 0
+    assert 'No regressions' in capsys.readouterr().out
+
+    monkeypatch.setattr(bench, 'run_trial', lambda algorithm, condition, path, size, seed, options: trial(500.0))
+    assert bench.main(arguments + ['--baseline', str(baseline)]) == 1
+    assert 'REGRESSION reno wan 1024 throughput: 1000.0 -> 500.0' in capsys.readouterr().out
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from compress import Compressor, RAW, ZLIB, LZMA, compress, decode
+from payload import PayloadSource
+
+MESSAGE_SIZE = 1000
+TEXT = b''.join(b'%06d GET /index.html 200\n' % i for i in range(2000))
+
+
+@pytest.fixture
+def text(tmp_path):
+    path = tmp_path / 'text.log'
+    path.write_bytes(TEXT)
+    with PayloadSource(path, MESSAGE_SIZE) as data:
+        yield data
+
+
+@pytest.fixture
+def noise(tmp_path):
+    path = tmp_path / 'noise.bin'
+    path.write_bytes(os.urandom(20 * MESSAGE_SIZE))
+    with PayloadSource(path, MESSAGE_SIZE) as data:
+        yield data
+
+
+def encoded(compressor, data):
+    # Tagged payload of every chunk once the workers are done with them
+    compressor.submit()
+    for future in compressor.pending:
+        future.result()
+    return [compressor.encode(position, data.chunk(position)) for position in range(0, len(data), MESSAGE_SIZE)]
+
+
+@pytest.mark.parametrize('codec', [ZLIB, LZMA])
+def test_round_trip(codec):
+    chunk = TEXT[:MESSAGE_SIZE]
+    body = compress(codec, chunk)
+    assert len(body) < len(chunk)
+    assert decode(bytes((codec,)) + body) == chunk
+    assert decode(bytes((RAW,)) + chunk) == chunk
+
+
+@pytest.mark.parametrize('codec', ['zlib', 'lzma'])
+def test_compressor_round_trip(text, codec):
+    compressor = Compressor(text, codec)
+    payloads = encoded(compressor, text)
+    compressor.close()
+    assert b''.join(decode(payload) for payload in payloads) == TEXT
+    assert all(payload[0] == compressor.codec for payload in payloads)
+    assert compressor.compressed_chunks == len(payloads)
+
+
+def test_incompressible_chunks_go_raw(noise):
+    compressor = Compressor(noise, 'zlib')
+    payloads = encoded(compressor, noise)
+    compressor.close()
+    assert all(payload[0] == RAW for payload in payloads)
+    assert b''.join(decode(payload) for payload in payloads) == bytes(noise.view)
+    assert compressor.raw_chunks == len(payloads)
+
+
+def test_resends_are_raw_and_not_counted(text):
+    compressor = Compressor(text, 'zlib')
+    payloads = encoded(compressor, text)
+    resent = compressor.resend(text.chunk(0))
+    compressor.close()
+    assert resent[0] == RAW and decode(resent) == bytes(text.chunk(0))
+    assert compressor.compressed_chunks + compressor.raw_chunks == len(payloads)
@@ -0,0 +1,167 @@
+import pytest
+
+from congestion import (ABC_LIMIT, CONTROLLERS, SSH_THRESHOLD, TIMEOUT_DURATION, WINDOW_SIZE, get_controller, register,
+                        Controller)
+
+MSS = 1000
+
+
+def test_registry():
+    assert {'reno', 'tahoe', 'cubic', 'bbr', 'fixed_window'} <= set(CONTROLLERS)
+    assert get_controller('fixed_window', MSS, window=10).get_Window() == 5 * MSS
+    with pytest.raises(ValueError):
+        get_controller('vegas')
+
+
+@pytest.mark.parametrize('name', sorted(CONTROLLERS))
+def test_every_registered_name_resolves(name):
+    controller = get_controller(name, MSS)
+    assert isinstance(controller, CONTROLLERS[name]) and controller.name == name
+    assert controller.mss == MSS
+    assert controller.get_Window() >= MSS
+    assert controller.timeout_duration > 0
+
+
+@pytest.mark.parametrize('name', ['', 'Reno', 'sender_reno', 'vegas'])
+def test_unknown_names_are_rejected(name):
+    with pytest.raises(ValueError, match='choose from'):
+        get_controller(name, MSS)
+
+
+def test_stop_and_wait_keeps_one_packet_outstanding():
+    controller = get_controller('stop_and_wait', MSS)
+    assert controller.get_Window() == MSS
+    assert controller.timeout_duration == TIMEOUT_DURATION == 1
+    assert not controller.retransmit_all
+    for position in range(MSS, 10 * MSS, MSS):
+        assert controller.handle_ACK(position)
+    controller.handle_timeout()
+    assert controller.get_Window() == MSS
+
+
+def test_fixed_window_keeps_the_baseline_script_behaviour():
+    controller = get_controller('fixed_window', MSS)
+    # Half a window until the first ACK, the old script's first window timed out
+    assert controller.get_Window() == WINDOW_SIZE // 2 * MSS
+    controller.handle_ACK(MSS)
+    assert controller.get_Window() == WINDOW_SIZE * MSS
+    # The old fixed-window script waited TIMEOUT_DURATION = 2 seconds
+    assert controller.timeout_duration == 2 * TIMEOUT_DURATION == 2
+    assert controller.retransmit_all
+    controller.handle_timeout()
+    controller.handle_ACK(0)
+    assert controller.get_Window() == WINDOW_SIZE * MSS
+
+
+def test_slow_start_adds_what_an_ack_covers_up_to_the_limit():
+    reno = get_controller('reno', MSS)
+    reno.handle_ACK(MSS)
+    assert reno.cwnd == 2 * MSS
+    # A stretch ACK of five segments is credited with at most L of them
+    reno.handle_ACK(6 * MSS)
+    assert reno.cwnd == (2 + ABC_LIMIT) * MSS
+
+
+def test_routine_stretch_acks_raise_the_limit():
+    reno = get_controller('reno', MSS)
+    reno.sshThresh = 1000 * MSS
+    position = 0
+    for _ in range(40):
+        position += 4 * MSS
+        before = reno.cwnd
+        reno.handle_ACK(position)
+    # Every ACK covers 4 segments, the typical size follows and growth doesn't stall
+    assert reno.ackSize > 3 * MSS
+    assert reno.cwnd - before == 4 * MSS
+
+
+def test_lone_jump_is_clamped():
+    reno = get_controller('reno', MSS)
+    for position in range(MSS, 11 * MSS, MSS):
+        reno.handle_ACK(position)
+    before = reno.cwnd
+    reno.handle_ACK(60 * MSS)
+    assert reno.cwnd - before <= ABC_LIMIT * 1.2 * MSS
+
+
+def test_slow_start_stops_at_ssthresh_and_carries_the_rest():
+    tahoe = get_controller('tahoe', MSS)
+    tahoe.cwnd = (SSH_THRESHOLD - 1) * MSS
+    tahoe.handle_ACK(2 * MSS)
+    assert tahoe.cwnd == SSH_THRESHOLD * MSS
+    assert tahoe.congestionAvoid and not tahoe.slowStart
+    assert tahoe.bytesAcked == MSS
+
+
+def test_congestion_avoidance_adds_a_segment_per_window_of_bytes():
+    reno = get_controller('reno', MSS)
+    reno.slowStart, reno.congestionAvoid = False, True
+    reno.cwnd = 10 * MSS
+    for position in range(MSS, 10 * MSS, MSS):
+        reno.handle_ACK(position)
+    assert reno.cwnd == 10 * MSS
+    reno.handle_ACK(10 * MSS)
+    assert reno.cwnd == 11 * MSS
+    assert reno.bytesAcked == 0
+
+
+
+@pytest.mark.parametrize('algorithm', ['reno', 'tahoe'])
+def test_avoidance_grows_a_small_window_after_losses(algorithm):
+    # mss // cwnd per ACK is 0 past one segment, a window that repeated
+    # losses had pushed down to ssthresh never grew again
+    controller = get_controller(algorithm, MSS)
+    for _ in range(5):
+        controller.handle_timeout()
+    assert controller.sshThresh == 2 * MSS
+    for position in range(MSS, 21 * MSS, MSS):
+        controller.handle_ACK(position)
+    # 1 ACK of slow start, then 2 + 3 + 4 + 5 ACKs for one segment each
+    assert controller.cwnd == 6 * MSS
+
+def test_timeout_resets_avoidance_credit():
+    reno = get_controller('reno', MSS)
+    reno.slowStart, reno.congestionAvoid = False, True
+    reno.cwnd = 10 * MSS
+    reno.handle_ACK(5 * MSS)
+    reno.handle_timeout()
+    assert reno.cwnd == MSS and reno.sshThresh == 5 * MSS
+    assert reno.bytesAcked == 0 and reno.slowStart
+
+
+def test_reno_fast_recovery():
+    reno = get_controller('reno', MSS)
+    reno.handle_ACK(MSS)
+    reno.cwnd = 20 * MSS
+    for _ in range(3):
+        reno.handle_ACK(MSS)
+    assert reno.fastRecovery
+    assert reno.cwnd == 10 * MSS + 3 * MSS
+    reno.handle_ACK(MSS)
+    assert reno.cwnd == 14 * MSS
+    reno.handle_ACK(2 * MSS)
+    assert not reno.fastRecovery and reno.cwnd == reno.sshThresh
+
+
+def test_cubic_uses_byte_counting_in_slow_start():
+    cubic = get_controller('cubic', MSS)
+    cubic.handle_ACK(5 * MSS)
+    assert cubic.cwnd == (1 + ABC_LIMIT) * MSS
+
+
+def test_resume_does_not_count_as_progress():
+    reno = get_controller('reno', MSS)
+    reno.resume(50 * MSS)
+    reno.handle_ACK(51 * MSS)
+    assert reno.cwnd == 2 * MSS
+
+
+def test_register_adds_a_controller():
+    @register('test_constant')
+    class Constant(Controller):
+        pass
+    try:
+        assert isinstance(get_controller('test_constant', MSS), Constant)
+        assert Constant.name == 'test_constant'
+    finally:
+        del CONTROLLERS['test_constant']
@@ -0,0 +1,86 @@
+import os
+
+from fec import MAX_GROUP, MIN_GROUP, ParityDecoder, ParityEncoder, group_size, parse_report
+from payload import FEC_ID, HEADER
+
+SIZE = 64
+
+
+def chunks(count, last_size=SIZE):
+    return [(i * SIZE, os.urandom(SIZE if i < count - 1 else last_size)) for i in range(count)]
+
+
+def send_group(encoder, packets):
+    # Returns the parity payload the last packet closes the group with
+    parity = None
+    for i, (position, chunk) in enumerate(packets):
+        parity = encoder.add(position, chunk, i == len(packets) - 1)
+    return parity
+
+
+def receive(decoder, packets, lost):
+    # Delivers what arrives in order until the first loss, buffers the rest
+    expected = 0
+    buffered = {}
+    for position, chunk in packets:
+        if position in lost:
+            continue
+        if position == expected:
+            decoder.keep(position, chunk)
+            expected += len(chunk)
+        else:
+            buffered[position] = chunk
+    return expected, buffered
+
+
+def test_group_closes_after_size_packets():
+    encoder = ParityEncoder(SIZE, size=4, adaptive=False)
+    packets = chunks(8)
+    results = [encoder.add(position, chunk) for position, chunk in packets]
+    assert [result is not None for result in results] == [False, False, False, True] * 2
+    assert encoder.awaiting(0) and encoder.awaiting(7 * SIZE)
+
+
+def test_single_loss_is_rebuilt():
+    packets = chunks(4)
+    parity = send_group(ParityEncoder(SIZE, size=4), packets)
+    decoder = ParityDecoder()
+    expected, buffered = receive(decoder, packets, {SIZE})
+    report, rebuilt = decoder.repair(parity, expected, buffered)
+    assert rebuilt == packets[1]
+    assert HEADER.unpack_from(report)[0] == FEC_ID
+    assert parse_report(report) == (0, 4, 1, 1)
+
+
+def test_short_last_packet_is_rebuilt_to_its_length():
+    packets = chunks(3, last_size=10)
+    parity = send_group(ParityEncoder(SIZE, size=4), packets)
+    decoder = ParityDecoder()
+    expected, buffered = receive(decoder, packets, {2 * SIZE})
+    _, rebuilt = decoder.repair(parity, expected, buffered)
+    assert rebuilt == packets[2]
+
+
+def test_two_losses_are_reported_not_rebuilt():
+    packets = chunks(4)
+    parity = send_group(ParityEncoder(SIZE, size=4), packets)
+    decoder = ParityDecoder()
+    expected, buffered = receive(decoder, packets, {0, 2 * SIZE})
+    report, rebuilt = decoder.repair(parity, expected, buffered)
+    assert rebuilt is None
+    assert parse_report(report) == (0, 4, 2, 0)
+
+
+def test_report_adapts_group_size():
+    encoder = ParityEncoder(SIZE)
+    assert encoder.size == MAX_GROUP
+    send_group(encoder, chunks(4))
+    assert encoder.report(0, 4, 2) == 4 * SIZE
+    assert encoder.report(0, 4, 2) is None
+    assert MIN_GROUP <= encoder.size < MAX_GROUP
+
+
+def test_group_size_bounds():
+    assert group_size(0) == MAX_GROUP
+    assert group_size(0.5) == MIN_GROUP
+    assert group_size(0.025) == 9
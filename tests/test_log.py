@@ -0,0 +1,65 @@
+import atexit
+import io
+import logging
+import threading
+
+import pytest
+
+import log
+from log import SamplingFilter, get_logger, setup_logging
+
+
+@pytest.fixture
+def restore_logging():
+    yield
+    listener, _ = log.active_listener
+    atexit.unregister(listener.stop)
+    listener.stop()
+    log.active_listener = None
+    logging.getLogger(log.ROOT_LOGGER).handlers.clear()
+
+
+def record(message, level=logging.INFO):
+    return logging.LogRecord('udp.test', level, __file__, 1, message, None, None)
+
+
+def test_sampling_filter_passes_one_in_every():
+    sampler = SamplingFilter(every=3)
+    passed = [sampler.filter(record('Timeout at %d')) for _ in range(7)]
+    assert passed == [True, False, False, True, False, False, True]
+    # Other templates are counted apart, warnings always pass
+    assert sampler.filter(record('Retransmitting %d'))
+    assert all(sampler.filter(record('Timeout at %d', logging.WARNING)) for _ in range(3))
+
+
+def test_sampling_filter_notes_skipped_records():
+    sampler = SamplingFilter(every=2)
+    records = [record('Timeout at %d') for _ in range(3)]
+    for item in records:
+        sampler.filter(item)
+    assert records[0].msg == 'Timeout at %d'
+    assert records[2].msg == 'Timeout at %d [1 of 2, 2 so far]'
+
+
+def test_sampling_filter_every_one_logs_everything():
+    sampler = SamplingFilter(every=1)
+    assert all(sampler.filter(record('Timeout at %d')) for _ in range(5))
+
+
+def listener_threads():
+    return sum(thread.name.endswith('(_monitor)') for thread in threading.enumerate())
+
+
+def test_setup_logging_again_replaces_the_listener(restore_logging):
+    threads = listener_threads()
+    streams = [io.StringIO() for _ in range(3)]
+    for stream in streams:
+        setup_logging('info', 1, stream)
+    assert listener_threads() == threads + 1
+
+    get_logger('test').info('once')
+    # Replacing the listener drains what it still holds
+    setup_logging('info', 1, io.StringIO())
+    assert [stream.getvalue().count('once') for stream in streams] == [0, 0, 1]
+    assert listener_threads() == threads + 1
+    assert len(logging.getLogger(log.ROOT_LOGGER).handlers) == 1
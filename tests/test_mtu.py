@@ -0,0 +1,101 @@
+import errno
+import socket
+from collections import deque
+
+import pytest
+
+from batchio import GSO_MAX_SEGMENTS, GSOIO, UDP_SEGMENT
+from mtu import PROBE_ATTEMPTS, PROBE_PRECISION, build_probe_reply, parse_probe_reply, search_packet_size
+from payload import HEADER, MAX_PACKET_SIZE, PACKET_SIZE
+
+
+class LossyPath:
+    # Stands in for a socket to a receiver behind a path that drops every
+    # datagram above mtu bytes, or refuses to send above local_mtu
+    def __init__(self, mtu, local_mtu=MAX_PACKET_SIZE, answers=True):
+        self.mtu = mtu
+        self.local_mtu = local_mtu
+        self.answers = answers
+        self.probes = []
+        self.replies = deque()
+
+    def sendto(self, packet, address):
+        self.probes.append(len(packet))
+        if len(packet) > self.local_mtu:
+            raise OSError(errno.EMSGSIZE, 'Message too long')
+        if len(packet) <= self.mtu and self.answers:
+            self.replies.append(build_probe_reply(len(packet)))
+        return len(packet)
+
+    def recvfrom(self, size):
+        if not self.replies:
+            raise socket.timeout
+        return self.replies.popleft(), ('127.0.0.1', 5001)
+
+
+@pytest.mark.parametrize('mtu', [1500, 1472, 9000, 4000, MAX_PACKET_SIZE])
+def test_search_finds_the_largest_size_that_arrives(mtu):
+    path = LossyPath(mtu)
+    size = search_packet_size(path, ('127.0.0.1', 5001), PACKET_SIZE, MAX_PACKET_SIZE)
+    assert mtu - PROBE_PRECISION <= size <= mtu
+    # Binary search, not a walk: lost probes are retried PROBE_ATTEMPTS times
+    assert len(path.probes) < 20 * PROBE_ATTEMPTS
+
+
+def test_local_limit_counts_as_loss():
+    assert search_packet_size(LossyPath(MAX_PACKET_SIZE, local_mtu=9000), None, PACKET_SIZE, MAX_PACKET_SIZE) <= 9000
+
+
+def test_silent_receiver_keeps_the_base_size():
+    path = LossyPath(MAX_PACKET_SIZE, answers=False)
+    assert search_packet_size(path, None, PACKET_SIZE, MAX_PACKET_SIZE) == PACKET_SIZE
+    assert path.probes == [PACKET_SIZE] * PROBE_ATTEMPTS
+
+
+def test_search_never_exceeds_the_upper_bound():
+    assert search_packet_size(LossyPath(MAX_PACKET_SIZE), None, PACKET_SIZE, 512) == 512
+
+
+def test_probe_reply_round_trip():
+    assert parse_probe_reply(build_probe_reply(1400)) == 1400
+    assert parse_probe_reply(HEADER.pack(0) + b'ack') is None
+
+
+class Data:
+    def __init__(self, message_size):
+        self.message_size = message_size
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.calls = []
+
+    def sendmsg(self, buffers, ancillary=(), flags=0, address=None):
+        self.calls.append((b''.join(bytes(buffer) for buffer in buffers), ancillary))
+        return sum(len(buffer) for buffer in buffers)
+
+
+@pytest.mark.parametrize('segment_size', [1024, 1472, 8192, 9000, 40_000])
+def test_gso_batches_stay_within_one_udp_datagram(segment_size):
+    udp_socket = RecordingSocket()
+    io = GSOIO(udp_socket, ('127.0.0.1', 5001), Data(segment_size - HEADER.size))
+    assert io.max_segments == min(GSO_MAX_SEGMENTS, MAX_PACKET_SIZE // segment_size)
+
+    chunk = bytes(segment_size - HEADER.size)
+    for i in range(3 * io.max_segments + 1):
+        io.send(i * len(chunk), chunk)
+    io.flush()
+    sizes = [len(packet) for packet, _ in udp_socket.calls]
+    assert sizes == [io.max_segments * segment_size] * 3 + [segment_size]
+    assert all(size <= MAX_PACKET_SIZE for size in sizes)
+    assert all(ancillary[0][1] == UDP_SEGMENT for _, ancillary in udp_socket.calls)
+
+
+def test_gso_sends_short_packets_on_their_own():
+    udp_socket = RecordingSocket()
+    io = GSOIO(udp_socket, ('127.0.0.1', 5001), Data(1020))
+    io.send(0, bytes(1020))
+    io.send(1020, bytes(1020))
+    io.send(2040, bytes(100))
+    assert [(len(packet), bool(ancillary)) for packet, ancillary in udp_socket.calls] == [(2048, True), (104, False)]
+    assert udp_socket.calls[0][0][1024:1028] == HEADER.pack(1020)
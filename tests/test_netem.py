@@ -0,0 +1,69 @@
+import pytest
+
+from netem import Link
+
+PACKETS = 20_000
+
+
+def send(link, packets=PACKETS, size=1000, interval=0.001):
+    # Delivery times of a steady stream, one list per packet
+    return [link.transmit(size, i * interval) for i in range(packets)]
+
+
+def test_clean_link_adds_the_delay():
+    deliveries = send(Link(delay=0.02), packets=5)
+    assert deliveries == [(pytest.approx(i * 0.001 + 0.02),) for i in range(5)]
+
+
+def test_random_loss_rate():
+    link = Link(loss=0.05, seed=1)
+    lost = sum(not delivery for delivery in send(link))
+    assert lost == link.dropped
+    assert lost / PACKETS == pytest.approx(0.05, abs=0.01)
+
+
+def test_same_seed_same_losses():
+    first = send(Link(loss=0.1, jitter=0.005, delay=0.01, seed=7), packets=1000)
+    assert send(Link(loss=0.1, jitter=0.005, delay=0.01, seed=7), packets=1000) == first
+    assert send(Link(loss=0.1, jitter=0.005, delay=0.01, seed=8), packets=1000) != first
+
+
+def test_burst_loss_drops_runs():
+    # Mean burst length is 1 / burst_end = 4 packets
+    link = Link(burst_start=0.01, burst_end=0.25, seed=3)
+    lost = [not delivery for delivery in send(link)]
+    runs = []
+    length = 0
+    for dropped in lost + [False]:
+        if dropped:
+            length += 1
+        elif length:
+            runs.append(length)
+            length = 0
+    assert sum(runs) / len(runs) == pytest.approx(4, rel=0.25)
+
+
+def test_jitter_stays_in_bounds_and_in_order():
+    link = Link(delay=0.05, jitter=0.01, seed=2)
+    times = [delivery[0] for delivery in send(link, packets=2000)]
+    assert times == sorted(times)
+    assert all(0.04 - 1e-9 <= time - i * 0.001 <= 0.06 + 1e-9 for i, time in enumerate(times))
+
+
+def test_bandwidth_serializes_and_tail_drops():
+    # 100 KB/s with room for 10 queued packets, offered at 1 MB/s
+    link = Link(bandwidth=100_000, queue_size=10_000)
+    deliveries = send(link, packets=100)
+    delivered = [delivery[0] for delivery in deliveries if delivery]
+    gaps = [later - earlier for earlier, later in zip(delivered, delivered[1:])]
+    assert all(gap == pytest.approx(0.01) for gap in gaps)
+    assert link.dropped > 0 and link.forwarded == len(delivered)
+
+
+def test_reorder_and_duplicate():
+    link = Link(delay=0.01, reorder=0.1, duplicate=0.1, seed=4)
+    deliveries = send(link)
+    assert link.reordered / PACKETS == pytest.approx(0.1, abs=0.02)
+    assert sum(len(delivery) == 2 for delivery in deliveries) == link.duplicated
+    # Reordered packets skip the delay and overtake the ones before them
+    assert any(later[0] < earlier[0] for earlier, later in zip(deliveries, deliveries[1:]))
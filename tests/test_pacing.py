@@ -0,0 +1,126 @@
+import pytest
+
+from pacing import (BURST_PACKETS, CONGESTION_AVOID_GAIN, SLOW_START_GAIN, KernelPacer, NoPacer, TokenBucketPacer,
+                    get_pacing_rate, make_pacer)
+
+SEGMENT = 1000
+
+
+class FakeController:
+    def __init__(self, cwnd, sshThresh=0, rate=None):
+        self.cwnd = cwnd
+        self.sshThresh = sshThresh
+        self.rate = rate
+
+    def get_Window(self):
+        return self.cwnd
+
+    def get_PacingRate(self):
+        return self.rate
+
+
+class FakeRTT:
+    def __init__(self, srtt):
+        self.srtt = srtt
+
+
+def test_pacing_rate_spreads_the_window_over_srtt():
+    assert get_pacing_rate(FakeController(12_000), FakeRTT(0.1)) == pytest.approx(CONGESTION_AVOID_GAIN * 120_000)
+    assert get_pacing_rate(FakeController(12_000, 64_000), FakeRTT(0.1)) == pytest.approx(SLOW_START_GAIN * 120_000)
+    # No estimate yet, or a controller with its own rate
+    assert get_pacing_rate(FakeController(12_000), FakeRTT(None)) is None
+    assert get_pacing_rate(FakeController(12_000, rate=5000), FakeRTT(0.1)) == 5000
+
+
+def ten_packets_a_second():
+    # cwnd / srtt * 1.2 = 10 000 B/s, one segment every 0.1 s
+    return TokenBucketPacer(FakeController(10_000), FakeRTT(1.2), SEGMENT)
+
+
+def test_burst_then_one_packet_per_interval():
+    pacer = ten_packets_a_second()
+    for _ in range(BURST_PACKETS):
+        assert pacer.ready(0.0)
+        pacer.on_send(SEGMENT, 0.0)
+    assert not pacer.ready(0.0)
+
+    # Half a segment of tokens is enough to send, the overdraft is paid back
+    assert pacer.ready(0.05)
+    pacer.on_send(SEGMENT, 0.05)
+    assert pacer.next_time() == pytest.approx(0.1)
+    assert not pacer.ready(0.09)
+    assert pacer.ready(0.11)
+
+
+def release_times(pacer, packets, step=0.001):
+    # Sends whenever the pacer lets it, polling on a fake clock
+    times = []
+    now = 0.0
+    while len(times) < packets:
+        if pacer.ready(now):
+            pacer.on_send(SEGMENT, now)
+            times.append(now)
+        else:
+            now += step
+    return times
+
+
+def test_long_run_follows_the_rate():
+    times = release_times(ten_packets_a_second(), 52)
+    assert times[:BURST_PACKETS] == [0.0] * BURST_PACKETS
+    gaps = [later - earlier for earlier, later in zip(times[BURST_PACKETS:], times[BURST_PACKETS + 1:])]
+    assert all(gap == pytest.approx(0.1, abs=0.002) for gap in gaps)
+    # The third packet goes as soon as a token trickles in
+    assert times[-1] == pytest.approx(4.9, abs=0.05)
+
+
+def test_idle_time_does_not_build_up_a_burst():
+    pacer = ten_packets_a_second()
+    release_times(pacer, 10)
+    sent = 0
+    while pacer.ready(100.0):
+        pacer.on_send(SEGMENT, 100.0)
+        sent += 1
+    assert sent == BURST_PACKETS
+
+
+def test_coarse_wakeups_keep_the_rate():
+    # Woken every 0.5 s, the bucket holds half a second of the rate
+    coarse = TokenBucketPacer(FakeController(10_000), FakeRTT(1.2), SEGMENT, granularity=0.5)
+    assert release_times(coarse, 52, step=0.5)[-1] == pytest.approx(5.0, abs=0.5)
+    # Without that, every late wakeup loses all but a burst
+    fine = ten_packets_a_second()
+    assert release_times(fine, 52, step=0.5)[-1] > 10
+
+
+def test_unpaced_until_there_is_a_rate():
+    pacer = TokenBucketPacer(FakeController(10_000), FakeRTT(None), SEGMENT)
+    for _ in range(10):
+        assert pacer.ready(0.0)
+        pacer.on_send(SEGMENT, 0.0)
+    assert pacer.rate() is None
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.options = []
+
+    def setsockopt(self, level, option, value):
+        self.options.append(value)
+
+
+def test_kernel_pacer_updates_only_on_real_changes():
+    controller = FakeController(10_000)
+    udp_socket = RecordingSocket()
+    pacer = KernelPacer(controller, FakeRTT(1.2), udp_socket)
+    pacer.on_send(SEGMENT, 0.0)
+    controller.cwnd = 10_500
+    pacer.on_send(SEGMENT, 0.1)
+    controller.cwnd = 20_000
+    pacer.on_send(SEGMENT, 0.2)
+    assert udp_socket.options == [10_000, 20_000]
+
+
+def test_make_pacer():
+    assert isinstance(make_pacer('none', None, None, None, SEGMENT), NoPacer)
+    assert isinstance(make_pacer('rate', FakeController(1), FakeRTT(None), None, SEGMENT), TokenBucketPacer)
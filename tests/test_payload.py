@@ -0,0 +1,170 @@
+import gc
+
+import pytest
+
+import payload
+from payload import (HEADER, MAX_SACK_BLOCKS, SACK_MARKER, SEQ_HALF, SEQ_SPACE, FEC_ID, PROBE_ID, PacketWriter,
+                     PayloadSource, build_ack, build_hello, parse_ack, parse_hello, parse_sack, unwrap, wrap)
+
+CONTENT = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'file.bin'
+    path.write_bytes(CONTENT)
+    return path
+
+
+def test_chunks_cover_the_file(path):
+    with PayloadSource(path, 1000) as data:
+        assert len(data) == len(CONTENT)
+        chunks = [data.chunk(position) for position in range(0, len(data), 1000)]
+        assert [len(chunk) for chunk in chunks] == [1000] * 10 + [240]
+        assert b''.join(chunks) == CONTENT
+        assert isinstance(chunks[0], memoryview)
+        del chunks
+    assert data.map.closed
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.bin'
+    path.write_bytes(b'')
+    with PayloadSource(path, 1000) as data:
+        assert len(data) == 0
+        assert data.map is None
+        assert data.chunk(0) == b''
+
+
+@pytest.mark.parametrize('offset, length, expected', [
+    (1000, 500, (1000, 1500)),
+    (1000, None, (1000, len(CONTENT))),
+    (10_000, 1000, (10_000, len(CONTENT))),
+    (20_000, 1000, (len(CONTENT), len(CONTENT))),
+])
+def test_offset_and_length_are_clamped_to_the_file(path, offset, length, expected):
+    with PayloadSource(path, 1000, offset, length) as data:
+        start, end = expected
+        assert len(data) == end - start
+        # Positions are relative to the range
+        assert bytes(data.view) == CONTENT[start:end]
+        assert bytes(data.chunk(0)) == CONTENT[start:min(start + 1000, end)]
+
+
+def test_close_with_a_chunk_still_alive(path):
+    data = PayloadSource(path, 1000)
+    chunk = data.chunk(0)
+    data.close()
+    assert data.file.closed
+    # The mapping outlives close() until its last view goes
+    assert not data.map.closed
+    assert bytes(chunk) == CONTENT[:1000]
+    del chunk
+    gc.collect()
+
+
+class RecordingSocket:
+    def __init__(self, blocked=0):
+        self.sent = []
+        self.blocked = blocked
+
+    def sendmsg(self, buffers, ancdata, flags, address):
+        if self.blocked:
+            self.blocked -= 1
+            raise BlockingIOError
+        self.sent.append((b''.join(bytes(buffer) for buffer in buffers), address))
+        return sum(len(buffer) for buffer in buffers)
+
+
+class SendtoSocket:
+    # Like a socket on Windows, no sendmsg
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, packet, address):
+        self.sent.append((packet, address))
+        return len(packet)
+
+
+def test_writer_sends_header_and_chunk_together():
+    udp_socket = RecordingSocket()
+    writer = PacketWriter(udp_socket, ('127.0.0.1', 5001))
+    assert writer.send(2000, memoryview(b'abc')) == HEADER.size + 3
+    writer.send(SEQ_SPACE + 5)
+    assert udp_socket.sent == [(HEADER.pack(2000) + b'abc', ('127.0.0.1', 5001)), (HEADER.pack(5), ('127.0.0.1', 5001))]
+
+
+def test_writer_falls_back_to_sendto():
+    udp_socket = SendtoSocket()
+    writer = PacketWriter(udp_socket, ('127.0.0.1', 5001))
+    assert not writer.use_sendmsg
+    writer.send(1000, memoryview(b'abc'))
+    assert udp_socket.sent == [(HEADER.pack(1000) + b'abc', ('127.0.0.1', 5001))]
+
+
+def test_writer_waits_out_a_full_send_buffer(monkeypatch):
+    waits = []
+    monkeypatch.setattr(payload.select, 'select', lambda read, write, error: waits.append(write) or ([], write, []))
+    udp_socket = RecordingSocket(blocked=2)
+    PacketWriter(udp_socket, ('127.0.0.1', 5001)).send(0, b'x')
+    assert waits == [[udp_socket], [udp_socket]]
+    assert udp_socket.sent == [(HEADER.pack(0) + b'x', ('127.0.0.1', 5001))]
+
+
+def test_plain_ack_has_no_blocks():
+    ack = build_ack(5000)
+    assert parse_ack(ack) == 5000
+    assert parse_sack(ack) == ()
+
+
+def test_sack_blocks_round_trip():
+    blocks = [(3000, 4000), (6000, 8000)]
+    ack = build_ack(1000, blocks)
+    assert parse_ack(ack) == 1000
+    assert parse_sack(ack) == blocks
+
+
+def test_at_most_four_blocks():
+    blocks = [(i * 2000, i * 2000 + 1000) for i in range(1, 7)]
+    assert parse_sack(build_ack(0, blocks)) == blocks[:MAX_SACK_BLOCKS]
+
+
+def test_truncated_block_is_dropped():
+    ack = build_ack(0, [(1000, 2000), (3000, 4000)])
+    assert parse_sack(ack[:-1]) == [(1000, 2000)]
+
+
+def test_other_payloads_are_not_sack():
+    assert parse_sack(HEADER.pack(0) + b'fin') == ()
+    assert parse_sack(HEADER.pack(0) + SACK_MARKER) == []
+
+
+def test_wrap_leaves_small_positions_and_control_ids_alone():
+    assert wrap(12345) == 12345
+    assert wrap(SEQ_SPACE - 1) == SEQ_SPACE - 1
+    assert wrap(PROBE_ID) == PROBE_ID
+    assert wrap(SEQ_SPACE + 7) == 7
+
+
+def test_unwrap_picks_the_position_nearest_the_reference():
+    for reference in (0, SEQ_SPACE - 1000, SEQ_SPACE, 3 * SEQ_SPACE + 5):
+        for position in (reference, reference + 100_000, max(0, reference - 100_000), reference + SEQ_HALF - 1):
+            assert unwrap(wrap(position), reference) == position
+
+
+def test_unwrap_keeps_control_ids():
+    assert unwrap(FEC_ID, 5 * SEQ_SPACE) == FEC_ID
+
+
+def test_sack_blocks_unwrap_against_the_reference():
+    reference = 2 * SEQ_SPACE - 500
+    blocks = [(reference + 1000, reference + 3000)]
+    ack = build_ack(reference, blocks)
+    assert unwrap(parse_ack(ack), reference) == reference
+    assert parse_sack(ack, reference) == blocks
+
+
+def test_hello_round_trip():
+    assert parse_hello(build_hello(2)) == 2
+    assert parse_hello(build_hello(2) + b'x') is None
+    assert parse_hello(build_ack(0)) is None
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from payload import PayloadSource, RESUME_DIGEST_SIZE, build_resume, parse_resume
+from receiver import Receiver
+from resume import Checkpoint, prefix_digest
+
+SIZE = 10_000
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'file.bin'
+    path.write_bytes(os.urandom(SIZE))
+    with PayloadSource(path, 100) as data:
+        yield data
+
+
+def test_save_and_load(tmp_path, source):
+    state = tmp_path / 'state.json'
+    checkpoint = Checkpoint(state, source)
+    assert not checkpoint.valid
+    checkpoint.save(3000)
+    checkpoint.save(6000)
+    saved = json.loads(state.read_text())
+    assert saved == {'size': SIZE, 'offset': 6000, 'sha256': hashlib.sha256(source.view[:6000]).hexdigest()}
+
+    loaded = Checkpoint(state, source)
+    assert loaded.valid and loaded.offset == 6000
+
+
+def test_changed_file_is_not_resumed(tmp_path, source):
+    state = tmp_path / 'state.json'
+    Checkpoint(state, source).save(5000)
+    saved = json.loads(state.read_text())
+    saved['sha256'] = hashlib.sha256(b'other').hexdigest()
+    state.write_text(json.dumps(saved))
+    assert not Checkpoint(state, source).valid
+
+    state.write_text(json.dumps(dict(saved, size=SIZE + 1)))
+    assert not Checkpoint(state, source).valid
+    state.write_text('{not json')
+    assert not Checkpoint(state, source).valid
+
+
+def test_rewound_receiver_leaves_the_checkpoint(tmp_path, source):
+    checkpoint = Checkpoint(tmp_path / 'state.json', source)
+    checkpoint.save(5000)
+    checkpoint.save(2000)
+    assert checkpoint.offset == 5000
+
+
+def test_close_removes_a_finished_transfer(tmp_path, source):
+    state = tmp_path / 'state.json'
+    checkpoint = Checkpoint(state, source)
+    checkpoint.close(4000)
+    assert state.exists()
+    checkpoint.close(SIZE)
+    assert not state.exists()
+
+
+def test_digest_before_and_after_the_checkpoint(tmp_path, source):
+    checkpoint = Checkpoint(tmp_path / 'state.json', source)
+    checkpoint.save(5000)
+    for offset in (0, 2000, 5000, 8000, SIZE):
+        assert checkpoint.digest(offset) == hashlib.sha256(source.view[:offset]).digest()
+
+
+def test_prefix_digest(tmp_path):
+    path = tmp_path / 'out.bin'
+    path.write_bytes(b'abcdef')
+    with open(path, 'rb') as f:
+        assert prefix_digest(f, 4).digest() == hashlib.sha256(b'abcd').digest()
+        assert prefix_digest(f, 100).digest() == hashlib.sha256(b'abcdef').digest()
+
+
+def test_resume_packets():
+    digest = bytes(range(RESUME_DIGEST_SIZE))
+    assert parse_resume(build_resume(7, 5000, 100)) == (7, 5000, 100, b'')
+    assert parse_resume(build_resume(7, 5000, 100, digest)) == (7, 5000, 100, digest)
+    assert parse_resume(build_resume(7, 5000, 100, digest[:-1])) is None
+
+
+def resume_request(receiver, token, limit, unit=100):
+    replies = receiver.handle_packet(build_resume(token, limit, unit))
+    return parse_resume(replies[0])
+
+
+def test_receiver_rewinds_and_hashes_what_it_kept(tmp_path):
+    data = os.urandom(1000)
+    output = tmp_path / 'out.bin'
+    output.write_bytes(data)
+    receiver = Receiver(output=str(output), resume=True)
+    receiver.open_output()
+    assert receiver.expected == 1000
+
+    _, offset, _, digest = resume_request(receiver, 1, 10_000)
+    assert offset == 1000 and digest == hashlib.sha256(data).digest()
+    _, offset, _, digest = resume_request(receiver, 2, 550)
+    assert offset == 500 and digest == hashlib.sha256(data[:500]).digest()
+    # A duplicate request gets the same answer, even if the data moved on
+    receiver.handle_packet(b'\0\0\x01\xf4' + data[500:600])
+    assert resume_request(receiver, 2, 550)[1] == 500
+    receiver.out.close()
+    assert output.read_bytes() == data[:600]
+
+
+def test_receiver_without_output_starts_over():
+    receiver = Receiver()
+    for position in range(0, 500, 100):
+        receiver.handle_packet(position.to_bytes(4, 'big') + bytes(100))
+    assert resume_request(receiver, 1, 1000)[1:] == (500, 100, hashlib.sha256(bytes(500)).digest())
+    assert resume_request(receiver, 2, 300)[1:] == (0, 100, hashlib.sha256().digest())
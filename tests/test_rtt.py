@@ -0,0 +1,30 @@
+import pytest
+
+from rtt import RTTEstimator, CLOCK_GRANULARITY
+
+
+def test_first_sample():
+    rtt = RTTEstimator(initial_rto=1, min_rto=0.05, max_rto=4)
+    assert rtt.get_RTO() == 1
+    rtt.sample(0.1)
+    assert rtt.srtt == 0.1
+    assert rtt.rttvar == 0.05
+    assert rtt.get_RTO() == pytest.approx(0.3)
+
+
+def test_constant_samples_keep_rto_above_srtt():
+    rtt = RTTEstimator(min_rto=0)
+    for _ in range(200):
+        rtt.sample(0.1)
+    assert rtt.get_RTO() >= 0.1 + CLOCK_GRANULARITY
+
+
+def test_backoff_doubles_up_to_max_and_resets_on_sample():
+    rtt = RTTEstimator(initial_rto=0.5, max_rto=4)
+    timeouts = []
+    for _ in range(5):
+        rtt.handle_timeout()
+        timeouts.append(rtt.get_RTO())
+    assert timeouts == [1, 2, 4, 4, 4]
+    rtt.sample(0.1)
+    assert rtt.get_RTO() == pytest.approx(0.3)
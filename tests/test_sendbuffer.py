@@ -0,0 +1,69 @@
+from sendbuffer import SendBuffer
+
+SEGMENT = 100
+
+
+def filled(count, capacity=4, start=0):
+    buffer = SendBuffer(SEGMENT, capacity, start)
+    for i in range(count):
+        buffer.add(start + i * SEGMENT, float(i))
+    return buffer
+
+
+def test_release_yields_acknowledged_segments_in_order():
+    buffer = filled(5)
+    assert list(buffer.release(200)) == [(0, 0.0, 0), (100, 1.0, 0)]
+    assert len(buffer) == 3
+    assert 200 in buffer and 100 not in buffer
+    assert list(buffer) == [200, 300, 400]
+
+
+def test_release_rounds_a_partial_segment_up():
+    buffer = filled(3)
+    # The last segment of a file may be short, its end releases it
+    assert [pos for pos, _, _ in buffer.release(250)] == [0, 100, 200]
+
+
+def test_grows_past_capacity_and_keeps_flags():
+    buffer = filled(3, capacity=4)
+    buffer.resent(100, 9.0)
+    for i in range(3, 10):
+        buffer.add(i * SEGMENT, float(i))
+    assert buffer.capacity >= 10
+    assert buffer.is_retransmitted(100)
+    assert buffer.send_time(100) == 9.0
+    assert [time for _, time, _ in buffer.release(1000)] == [0.0, 9.0] + [float(i) for i in range(2, 10)]
+    assert not buffer
+
+
+def test_wraps_around_the_ring():
+    buffer = filled(4, capacity=4)
+    for round_ in range(1, 4):
+        list(buffer.release(round_ * 400))
+        for i in range(4):
+            buffer.add((round_ * 4 + i) * SEGMENT, float(round_))
+    assert buffer.capacity == 4
+    assert list(buffer) == [1200, 1300, 1400, 1500]
+
+
+def test_sack_marks_segments_once_and_release_skips_them():
+    buffer = filled(6)
+    assert [pos for pos, _, _ in buffer.sack(200, 400)] == [200, 300]
+    assert list(buffer.sack(200, 400)) == []
+    assert buffer.has_sacks()
+    assert list(buffer.holes()) == [0, 100]
+    assert [pos for pos, _, _ in buffer.release(500)] == [0, 100, 400]
+    assert not buffer.has_sacks()
+
+
+def test_sack_outside_the_window_is_ignored():
+    buffer = filled(2)
+    assert list(buffer.sack(500, 900)) == []
+    assert not buffer.has_sacks()
+
+
+def test_start_offset():
+    buffer = filled(2, start=1000)
+    assert 1000 in buffer and 0 not in buffer
+    assert [pos for pos, _, _ in buffer.release(1100)] == [1000]
+    assert list(buffer) == [1100]
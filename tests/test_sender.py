@@ -0,0 +1,258 @@
+import socket
+import threading
+
+import pytest
+
+from congestion import get_controller
+from netem import Link
+from payload import build_ack, parse_ack
+from pacing import make_pacer
+from receiver import Receiver
+from sender import Sender
+from simulator import EventLoop, Network, SimulatedSender, VirtualPayload
+from timers import TimerWheel
+
+MESSAGE_SIZE = 1000
+
+
+def blackholed(algorithm):
+    # A transfer whose every data packet is lost, resends of position 0 are
+    # recorded with their virtual times
+    loop = EventLoop()
+    network = Network(loop, Link(delay=0.01, loss=1.0, seed=1), Link(delay=0.01, seed=2), Receiver())
+    sender = SimulatedSender(VirtualPayload(100 * MESSAGE_SIZE, MESSAGE_SIZE), get_controller(algorithm, MESSAGE_SIZE),
+                             loop, network, 'none')
+    resends = []
+    retransmit = sender.retransmit
+
+    def record(pos, now):
+        if pos == 0:
+            resends.append(now)
+        retransmit(pos, now)
+    sender.retransmit = record
+    return loop, sender, resends
+
+
+def test_expired_retransmission_backs_off():
+    loop, sender, resends = blackholed('reno')
+    sender.start()
+    loop.run(12)
+    gaps = [later - earlier for earlier, later in zip(resends, resends[1:])]
+    assert gaps[:3] == [2, 4, 4]
+    assert sender.stats.timeout_count == len(resends)
+
+
+def test_expired_retransmission_collapses_window_again():
+    loop, sender, resends = blackholed('reno')
+    sender.start()
+    loop.run(1.5)
+    sender.tcp.cwnd = 10 * MESSAGE_SIZE
+    loop.run(4)
+    assert sender.tcp.get_Window() == MESSAGE_SIZE
+
+
+class RecordingIO:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, position, chunk=b''):
+        self.sent.append(position)
+
+    def flush(self):
+        pass
+
+
+def idle_sender(window, algorithm='go_back_n'):
+    # A Sender without a socket, driven by hand on a settable clock
+    sender = Sender(VirtualPayload(100 * MESSAGE_SIZE, MESSAGE_SIZE), get_controller(algorithm, MESSAGE_SIZE, window),
+                    pacing='none')
+    sender.io = RecordingIO()
+    sender.pacer = make_pacer('none', sender.tcp, sender.rtt, None, MESSAGE_SIZE)
+    sender.timers = TimerWheel(0)
+    sender.stats.start(0)
+    sender.now = 0.0
+    sender.clock = lambda: sender.now
+    return sender
+
+
+def record_samples(sender):
+    samples = []
+    controller_samples = []
+    sample, handle_RTT = sender.rtt.sample, sender.tcp.handle_RTT
+    sender.rtt.sample = lambda rtt: (samples.append(rtt), sample(rtt))
+    sender.tcp.handle_RTT = lambda rtt: (controller_samples.append(rtt), handle_RTT(rtt))
+    return samples, controller_samples
+
+
+def test_one_rtt_sample_per_ack():
+    sender = idle_sender(2)
+    sender.send_window()
+    sender.now = 0.1
+    sender.tcp.set_Window(4)
+    sender.send_window()
+    assert sender.io.sent == [0, 1000, 2000, 3000]
+
+    samples, controller_samples = record_samples(sender)
+    sender.handle_ack(4000, now=0.3)
+    # The RTO is timed from the oldest segment, the controller from the newest
+    assert samples == [pytest.approx(0.3)]
+    assert controller_samples == [pytest.approx(0.2)]
+
+
+def test_sack_blocks_add_no_samples():
+    sender = idle_sender(6)
+    sender.send_window()
+    samples, _ = record_samples(sender)
+    sender.handle_ack(1000, [(2000, 4000), (5000, 6000)], now=0.2)
+    assert len(samples) == 1
+
+
+def test_ack_of_retransmitted_segments_is_not_timed():
+    sender = idle_sender(2)
+    sender.send_window()
+    sender.retransmit(0, 0.5)
+    sender.retransmit(1000, 0.5)
+    samples, controller_samples = record_samples(sender)
+    sender.handle_ack(2000, now=0.6)
+    assert samples == controller_samples == []
+
+
+def test_ack_past_next_position_is_rejected():
+    sender = idle_sender(2)
+    sender.send_window()
+    with pytest.raises(ConnectionError):
+        sender.handle_ack(1_000_000, now=0.1)
+    assert len(sender.in_flight) == 2
+
+
+
+def test_third_duplicate_ack_resends_the_base():
+    sender = idle_sender(5, 'reno')
+    sender.send_window()
+    sender.handle_ack(1000, now=0.1)
+    sender.io.sent.clear()
+    for _ in range(3):
+        sender.handle_ack(1000, now=0.1)
+    assert sender.io.sent == [1000]
+    sender.handle_ack(1000, now=0.1)
+    assert sender.io.sent == [1000]
+
+
+def test_duplicate_acks_with_sack_resend_only_holes():
+    sender = idle_sender(5, 'reno')
+    sender.send_window()
+    sender.io.sent.clear()
+    for _ in range(3):
+        sender.handle_ack(0, [(1000, 2000), (3000, 4000)], now=0.1)
+    assert sender.io.sent == [0, 2000]
+
+
+def test_partial_ack_after_timeout_resends_the_next_hole():
+    sender = idle_sender(4, 'reno')
+    sender.send_window()
+    sender.now = 2.0
+    sender.handle_timeout(sender.timers.expire(2.0))
+    assert sender.io.sent[4:] == [0]
+    sender.handle_ack(1000, now=2.1)
+    assert sender.io.sent[4:] == [0, 1000]
+    # Past the losses of that timeout an ACK is just an ACK
+    sender.handle_ack(4000, now=2.2)
+    assert sender.io.sent[4:] == [0, 1000]
+
+
+def test_stop_and_wait_sends_the_next_packet_after_its_ack():
+    sender = idle_sender(None, 'stop_and_wait')
+    sender.send_window()
+    sender.send_window()
+    assert sender.io.sent == [0]
+    sender.handle_ack(1000, now=0.1)
+    sender.send_window()
+    assert sender.io.sent == [0, 1000]
+
+
+def test_fixed_window_starts_with_the_old_timeout():
+    sender = idle_sender(None, 'fixed_window')
+    assert sender.rtt.get_RTO() == 2
+    sender.send_window()
+    assert len(sender.io.sent) == 50
+    assert sender.timers.next_deadline() == pytest.approx(2, abs=0.01)
+
+
+def staggered(algorithm):
+    # Position 0 sent at 0, 1000-3000 half an RTO later, so only 0 has
+    # expired at 1 s
+    sender = idle_sender(1, algorithm)
+    sender.send_window()
+    sender.now = 0.5
+    sender.tcp.set_Window(4)
+    sender.send_window()
+    sender.io.sent.clear()
+    sender.now = 1.0
+    sender.handle_timeout(sender.timers.expire(1.0))
+    return sender
+
+
+def test_go_back_n_resends_every_outstanding_packet():
+    assert staggered('go_back_n').io.sent == [0, 1000, 2000, 3000]
+
+
+def test_selective_repeat_resends_only_the_expired_packet():
+    sender = staggered('selective_repeat')
+    assert sender.io.sent == [0]
+    assert sender.timers.expire(1.4) == []
+    assert sorted(sender.timers.expire(1.6)) == [1000, 2000, 3000]
+
+
+@pytest.mark.parametrize('algorithm', ['go_back_n', 'selective_repeat'])
+def test_set_window_while_running(algorithm):
+    sender = idle_sender(2, algorithm)
+    sender.send_window()
+    assert sender.io.sent == [0, 1000]
+    sender.tcp.set_Window(5)
+    sender.send_window()
+    assert sender.io.sent == [0, 1000, 2000, 3000, 4000]
+    # A smaller window holds new packets back until the ACKs catch up
+    sender.tcp.set_Window(2)
+    sender.handle_ack(2000, now=0.1)
+    sender.send_window()
+    assert len(sender.io.sent) == 5
+    sender.handle_ack(4000, now=0.1)
+    sender.send_window()
+    assert sender.io.sent[5:] == [5000]
+
+class RecordingCheckpoint:
+    def __init__(self):
+        self.closed = []
+
+    def close(self, position):
+        self.closed.append(position)
+
+
+def test_failed_transfer_raises_without_fin():
+    # A receiver that ACKs bytes we never sent, then records what else arrives
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as receiver:
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(0.5)
+        packets = []
+
+        def answer():
+            packet, address = receiver.recvfrom(2048)
+            receiver.sendto(build_ack(1_000_000), address)
+            try:
+                while True:
+                    packets.append(receiver.recv(2048))
+            except socket.timeout:
+                pass
+        thread = threading.Thread(target=answer)
+        thread.start()
+
+        data = VirtualPayload(10 * MESSAGE_SIZE, MESSAGE_SIZE)
+        sender = Sender(data, get_controller('reno', MESSAGE_SIZE), receiver.getsockname(), ('127.0.0.1', 0),
+                        pacing='none', io='plain')
+        sender.checkpoint = RecordingCheckpoint()
+        with pytest.raises(ConnectionError):
+            sender.run()
+        thread.join()
+
+    assert sender.checkpoint.closed == [0]
+    assert not any(parse_ack(packet) == len(data) or packet.endswith(b'==FINACK==') for packet in packets)
@@ -0,0 +1,60 @@
+import argparse
+
+import pytest
+
+import congestion
+from congestion import get_controller
+from netem import Link
+from simulator import SIM_CONDITIONS, constants, parse_sweep, run_point, simulate
+
+OPTIONS = {'packet_size': 1024, 'pacing': 'rate', 'window': None, 'sack': False, 'fec': False, 'ack_aggregation': 0}
+
+
+def test_same_seed_same_result():
+    first = run_point('reno', 'lossy_wan', 256 * 1024, 3, {}, OPTIONS)
+    second = run_point('reno', 'lossy_wan', 256 * 1024, 3, {}, OPTIONS)
+    assert first['ok']
+    assert first == second
+
+
+def test_different_seeds_differ():
+    first = run_point('reno', 'lossy_wan', 256 * 1024, 3, {}, OPTIONS)
+    second = run_point('reno', 'lossy_wan', 256 * 1024, 4, {}, OPTIONS)
+    assert first['summary'] != second['summary']
+
+
+def test_constants_are_restored():
+    with constants(DUPE_ACK_THRESHOLD=5):
+        assert congestion.DUPE_ACK_THRESHOLD == 5
+    assert congestion.DUPE_ACK_THRESHOLD == 3
+    with pytest.raises(ValueError):
+        with constants(MESSAGE_SIZE=10):
+            pass
+
+
+def test_timeout_duration_sweep_applies():
+    with constants(TIMEOUT_DURATION=0.25):
+        assert get_controller('reno').timeout_duration == 0.25
+        assert get_controller('auto_window').timeout_duration == 0.25
+        assert get_controller('fixed_window').timeout_duration == 0.5
+    assert get_controller('reno').timeout_duration == congestion.TIMEOUT_DURATION
+
+
+def test_timeout_duration_sweep_changes_the_transfer():
+    # A lossy link where the first packets time out before any RTT sample
+    link = dict(SIM_CONDITIONS['lossy_wan'], loss=0.5)
+    durations = []
+    for value in (0.25, 2):
+        with constants(TIMEOUT_DURATION=value):
+            summary = simulate('stop_and_wait', 16 * 1024, Link(**link, seed=1), Link(delay=0.02, seed=2))
+        durations.append(summary['duration'])
+    assert durations[0] < durations[1]
+
+
+def test_parse_sweep():
+    assert parse_sweep('ssh_threshold=16,32') == ('SSH_THRESHOLD', [16, 32])
+    assert parse_sweep('TIMEOUT_DURATION=0.5,1.0') == ('TIMEOUT_DURATION', [0.5, 1])
+    assert isinstance(parse_sweep('ABC_LIMIT=2.0')[1][0], int)
+    for value in ('MESSAGE_SIZE=1', 'ABC_LIMIT=', 'ABC_LIMIT=two'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_sweep(value)
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from stats import Histogram, Statistics, HIGHEST_TRACKABLE, SUB_BUCKET_BITS, UNITS_PER_SECOND
+
+# Bucket midpoints are within half a bucket, 1 / 2**SUB_BUCKET_BITS relative
+RESOLUTION = 1 / (1 << SUB_BUCKET_BITS)
+
+
+def test_empty_histogram():
+    histogram = Histogram()
+    assert histogram.quantile(0.5) is None
+    assert histogram.mean() is None
+
+
+def test_quantiles_match_sorted_values_within_resolution():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(-4, 1) for _ in range(20000)]
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    for q in (0.5, 0.9, 0.99, 0.999):
+        exact = values[int(q * len(values)) - 1]
+        assert histogram.quantile(q) == pytest.approx(exact, rel=RESOLUTION, abs=1e-6)
+    assert histogram.mean() == pytest.approx(sum(values) / len(values))
+
+
+def test_quantiles_stay_within_the_exact_extremes():
+    histogram = Histogram()
+    for value in (0.0101, 0.0102, 0.0103):
+        histogram.record(value)
+    assert histogram.quantile(0) == 0.0101
+    assert histogram.quantile(1) == 0.0103
+
+
+def test_zero_and_huge_values():
+    histogram = Histogram()
+    histogram.record(0)
+    histogram.record(-1)
+    histogram.record(10 ** 9)
+    assert histogram.count == 3
+    assert histogram.quantile(0.5) == 0
+    # Clamped to the trackable range, the exact maximum is kept apart
+    assert histogram.quantile(1) == pytest.approx(HIGHEST_TRACKABLE / UNITS_PER_SECOND, rel=RESOLUTION)
+    assert histogram.max == 10 ** 9
+
+
+def test_statistics_summary():
+    stats = Statistics(window=1)
+    stats.start(0)
+    for delay in (0.1, 0.3, 0.2):
+        stats.record_delay(delay)
+    stats.record_delivered(1000, 0.5)
+    stats.record_delivered(3000, 2.5)
+    stats.stop(4)
+    summary = stats.summary(4000)
+    assert summary['throughput'] == 1000
+    assert summary['avg_packet_delay'] == pytest.approx(0.2)
+    assert summary['avg_jitter'] == pytest.approx(0.15)
+    assert stats.throughput_windows() == [1000, 0, 3000]
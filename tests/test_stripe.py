@@ -0,0 +1,69 @@
+import os
+import threading
+
+import pytest
+
+import stripe
+from payload import SEQ_SPACE
+from receiver import Receiver
+from stripe import send_range, stripe_ranges
+
+
+@pytest.fixture
+def huge(tmp_path):
+    # Sparse, takes no space on disk
+    path = tmp_path / 'huge.bin'
+    with open(path, 'wb') as f:
+        f.truncate(SEQ_SPACE + 1000)
+    return path
+
+
+def test_wrapping_range_needs_a_version_2_receiver(huge, monkeypatch):
+    offered = []
+    monkeypatch.setattr(stripe, 'negotiate_version', lambda address, bind_address: offered.append(address) or 1)
+    with pytest.raises(ConnectionError):
+        stripe.send_range('reno', huge, 0, SEQ_SPACE, ('127.0.0.1', 5002), 'none', 'plain', 1024)
+    assert offered == [('127.0.0.1', 5002)]
+
+
+def test_short_range_skips_the_hello(huge, monkeypatch):
+    monkeypatch.setattr(stripe, 'negotiate_version', lambda address, bind_address: pytest.fail('hello sent'))
+    sent = []
+    monkeypatch.setattr(stripe.Sender, 'run', lambda sender: sent.append(len(sender.data)))
+    stripe.send_range('reno', huge, SEQ_SPACE - 1000, 2000, ('127.0.0.1', 5002), 'none', 'plain', 1024)
+    assert sent == [2000]
+
+
+@pytest.mark.parametrize('size, flows', [(10_000, 4), (10_240, 4), (1000, 3), (999, 1), (0, 2)])
+def test_ranges_cover_the_file_on_packet_boundaries(size, flows):
+    ranges = stripe_ranges(size, flows, 100)
+    assert len(ranges) == flows
+    assert ranges[0][0] == 0 and sum(length for _, length in ranges) == size
+    for (offset, length), (following, _) in zip(ranges, ranges[1:]):
+        assert offset + length == following
+        assert length % 100 == 0
+    # Flows differ by at most one packet
+    packets = [-(-length // 100) for _, length in ranges]
+    assert max(packets) - min(packets) <= 1
+
+
+def test_more_flows_than_packets_leaves_some_empty():
+    assert stripe_ranges(250, 5, 100) == [(0, 0), (0, 100), (100, 0), (100, 100), (200, 50)]
+
+
+def test_flows_join_back_into_the_file(tmp_path):
+    data = os.urandom(50_000)
+    path = tmp_path / 'file.bin'
+    path.write_bytes(data)
+    parts = []
+    for i, (offset, length) in enumerate(stripe_ranges(len(data), 3, 1020)):
+        part = tmp_path / f'part{i}'
+        receiver = Receiver(('127.0.0.1', 0), str(part))
+        ready = threading.Event()
+        thread = threading.Thread(target=receiver.run, args=(ready,), daemon=True)
+        thread.start()
+        assert ready.wait(5)
+        send_range('reno', path, offset, length, receiver.udp_socket.getsockname(), 'none', 'auto', 1024)
+        thread.join(5)
+        parts.append(part.read_bytes())
+    assert b''.join(parts) == data
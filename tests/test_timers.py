@@ -0,0 +1,55 @@
+from timers import TimerWheel, TICK, WHEEL_SLOTS
+
+
+def test_expires_only_due_timers():
+    wheel = TimerWheel(0)
+    wheel.schedule('a', 0.010)
+    wheel.schedule('b', 0.020)
+    assert wheel.expire(0.005) == []
+    assert wheel.expire(0.015) == ['a']
+    assert 'a' not in wheel and 'b' in wheel
+    assert wheel.expire(0.020) == ['b']
+    assert len(wheel) == 0
+
+
+def test_cancel_and_reschedule():
+    wheel = TimerWheel(0)
+    wheel.schedule('a', 0.010)
+    wheel.cancel('a')
+    wheel.cancel('a')
+    assert wheel.expire(1) == []
+
+    wheel.schedule('b', 1.010)
+    wheel.schedule('b', 1.500)
+    assert len(wheel) == 1
+    assert wheel.expire(1.100) == []
+    assert wheel.expire(1.500) == ['b']
+
+
+def test_timer_longer_than_one_turn():
+    wheel = TimerWheel(0)
+    turn = TICK * WHEEL_SLOTS
+    wheel.schedule('late', 2.5 * turn)
+    wheel.schedule('soon', 0.002)
+    assert wheel.expire(0.003) == ['soon']
+    # The hand passes the late timer's slot once before it is due
+    assert wheel.expire(1.6 * turn) == []
+    assert wheel.expire(2.5 * turn) == ['late']
+
+
+def test_deadline_in_the_past_fires_on_next_expire():
+    wheel = TimerWheel(1.0)
+    wheel.schedule('a', 0.5)
+    assert wheel.expire(1.0) == ['a']
+
+
+def test_next_deadline():
+    wheel = TimerWheel(0)
+    assert wheel.next_deadline() is None
+    turn = TICK * WHEEL_SLOTS
+    wheel.schedule('far', 3 * turn)
+    assert wheel.next_deadline() == 3 * turn
+    wheel.schedule('near', 0.25)
+    assert wheel.next_deadline() == 0.25
+    wheel.cancel('near')
+    assert wheel.next_deadline() == 3 * turn
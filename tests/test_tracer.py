@@ -0,0 +1,83 @@
+import pytest
+
+from congestion import get_controller
+from rtt import RTTEstimator
+from tracer import ACK, EVENTS, FIELDS, STATES, TIMEOUT, Tracer, analyze, load
+
+
+def traced(capacity=64):
+    # A reno sender's trace: ACKs every 10 ms, a 0.5 s stall, three duplicate
+    # ACKs into fast recovery, a new ACK out of it, then a timeout
+    tracer = Tracer(capacity, enabled=True)
+    tcp = get_controller('reno')
+    rtt = RTTEstimator()
+    rtt.sample(0.01)
+    now = 0.0
+    positions = [1024 * i for i in range(1, 11)] + [10240] * 3 + [1024 * i for i in range(20, 27)]
+    for i, position in enumerate(positions):
+        now += 0.5 if i == 10 else 0.01
+        tcp.handle_ACK(position)
+        tracer.trace(ACK, now, tcp, rtt, 2048, tcp.dupeACKS)
+    tcp.handle_timeout()
+    tracer.trace(TIMEOUT, now + 1, tcp, rtt, 2048, 1)
+    return tracer
+
+
+def load_rows(tracer):
+    # The ring as load() returns it, without a file
+    columns = {field: [] for field in FIELDS}
+    for row in tracer.rows():
+        for field, value in zip(FIELDS, row):
+            columns[field].append(value)
+    columns['event'] = [EVENTS[int(code)] for code in columns['event']]
+    columns['state'] = [STATES[int(code)] for code in columns['state']]
+    return columns
+
+
+def test_state_changes_are_recorded_once():
+    columns = load_rows(traced())
+    transitions = [(STATES[int(value)] if value >= 0 else None, state)
+                   for event, value, state in zip(columns['event'], columns['value'], columns['state']) if event == 'state']
+    assert transitions == [(None, 'slow_start'), ('slow_start', 'fast_recovery'),
+                           ('fast_recovery', 'congestion_avoidance'), ('congestion_avoidance', 'slow_start')]
+    assert columns['event'][-2:] == ['state', 'timeout']
+
+
+@pytest.mark.parametrize('name', ['trace.csv', 'trace.bin'])
+def test_export_load_round_trip(tmp_path, name):
+    tracer = traced()
+    path = str(tmp_path / name)
+    tracer.export(path)
+    assert load(path) == load_rows(tracer)
+
+
+@pytest.mark.parametrize('name', ['trace.csv', 'trace.bin'])
+def test_wrapped_ring_exports_the_newest_records(tmp_path, name):
+    tracer = traced(capacity=8)
+    assert tracer.count > 8 and len(tracer) == 8
+    path = str(tmp_path / name)
+    tracer.export(path)
+    columns = load(path)
+    assert len(columns['time']) == 8
+    assert columns['time'] == sorted(columns['time'])
+    assert columns['event'][-1] == 'timeout'
+
+
+def test_empty_trace(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    Tracer().export(path)
+    assert load(path) == {field: [] for field in FIELDS}
+    assert analyze(load(path)) is None
+
+
+def test_analysis_finds_the_stall(tmp_path):
+    path = str(tmp_path / 'trace.bin')
+    traced().export(path)
+    analysis = analyze(load(path))
+    assert analysis['events']['ack'] == 20 and analysis['events']['timeout'] == 1
+    assert analysis['transitions'] == 4
+    stall, = analysis['stalls']
+    assert stall['length'] == pytest.approx(0.5)
+    # Measured from the first record, 10 ms in
+    assert stall['start'] == pytest.approx(0.09)
+    assert analysis['max_dupacks'] == 3
@@ -0,0 +1,76 @@
+import math
+
+# 1 ms ticks, one turn of the wheel covers ~0.5 s, longer timers wait extra turns
+TICK = 0.001
+WHEEL_SLOTS = 512
+
+
+class TimerWheel:
+    # Hashed timer wheel: schedule and cancel are O(1), expiring only touches
+    # the slots the clock moved across since the last call
+    def __init__(self, now, tick=TICK, slots=WHEEL_SLOTS):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]
+        # {key: slot index}
+        self.where = {}
+        self.current = self.to_tick(now)
+
+    def to_tick(self, when):
+        return math.floor(when / self.tick)
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, key):
+        return key in self.where
+
+    def schedule(self, key, deadline):
+        # Rescheduling an armed key moves it
+        self.cancel(key)
+        # Never file a timer behind the hand, it would wait a whole turn
+        index = max(self.to_tick(deadline), self.current) % len(self.slots)
+        self.slots[index][key] = deadline
+        self.where[key] = index
+
+    def cancel(self, key):
+        index = self.where.pop(key, None)
+        if index is not None:
+            del self.slots[index][key]
+
+    def expire(self, now):
+        expired = []
+        if not self.where:
+            self.current = self.to_tick(now)
+            return expired
+
+        target = self.to_tick(now)
+        # A full turn visits every slot, no need to go around twice
+        steps = min(target - self.current, len(self.slots) - 1)
+        for offset in range(steps + 1):
+            slot = self.slots[(self.current + offset) % len(self.slots)]
+            if not slot:
+                continue
+            for key, deadline in list(slot.items()):
+                if deadline <= now:
+                    del slot[key]
+                    del self.where[key]
+                    expired.append(key)
+
+        self.current = target
+        return expired
+
+    def next_deadline(self):
+        if not self.where:
+            return None
+
+        # Closest non-empty slot ahead of the hand, entries from later turns are skipped
+        horizon = (self.current + len(self.slots)) * self.tick
+        for offset in range(len(self.slots)):
+            slot = self.slots[(self.current + offset) % len(self.slots)]
+            if slot:
+                deadline = min(slot.values())
+                if deadline < horizon:
+                    return deadline
+
+        # Everything is at least one turn away
+        return min(min(slot.values()) for slot in self.slots if slot)
@@ -0,0 +1,253 @@
+import argparse
+import csv
+import struct
+import sys
+from array import array
+
+# One record is FIELDS doubles, the ring holds CAPACITY records
+FIELDS = ('time', 'event', 'cwnd', 'ssthresh', 'srtt', 'in_flight', 'state', 'value')
+CAPACITY = 1 << 16
+
+# Codes stored in the event and state columns
+EVENTS = ('ack', 'state', 'retransmit', 'timeout')
+ACK, STATE, RETRANSMIT, TIMEOUT = range(len(EVENTS))
+STATES = ('slow_start', 'congestion_avoidance', 'fast_recovery', 'fixed', 'startup', 'drain', 'probe_bw', 'probe_rtt')
+
+# Binary trace: header, then little-endian doubles row by row
+MAGIC = b'UDPTRACE'
+VERSION = 1
+BINARY_HEADER = struct.Struct('<8sHHQ')
+
+# A gap between ACKs longer than this many SRTTs counts as a stall
+STALL_SRTTS = 4
+MIN_STALL = 0.05
+
+
+def controller_state(controller):
+    # Maps the controllers' own flags onto one state name
+    state = getattr(controller, 'state', None)
+    if state in STATES:
+        return state
+    if getattr(controller, 'fastRecovery', False):
+        return 'fast_recovery'
+    ssthresh = getattr(controller, 'sshThresh', None)
+    if ssthresh is None:
+        return 'fixed'
+    if getattr(controller, 'slowStart', controller.cwnd < ssthresh):
+        return 'slow_start'
+    return 'congestion_avoidance'
+
+
+class Tracer:
+    # Fixed-size ring of trace records, the oldest are overwritten once it
+    # wraps. Callers check `enabled` before doing any work, so a disabled
+    # tracer costs one attribute lookup per hook. enabled can be flipped at
+    # any time, e.g. from a signal handler
+    def __init__(self, capacity=CAPACITY, enabled=False):
+        self.capacity = capacity
+        self.records = array('d', bytes(8 * len(FIELDS) * capacity))
+        self.count = 0
+        self.enabled = enabled
+        self.last_state = None
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def record(self, event, now, cwnd, ssthresh, srtt, in_flight, state, value=0):
+        records = self.records
+        offset = (self.count % self.capacity) * len(FIELDS)
+        records[offset] = now
+        records[offset + 1] = event
+        records[offset + 2] = cwnd
+        records[offset + 3] = ssthresh
+        records[offset + 4] = srtt
+        records[offset + 5] = in_flight
+        records[offset + 6] = state
+        records[offset + 7] = value
+        self.count += 1
+
+    def trace(self, event, now, controller, rtt, in_flight, value=0):
+        # Snapshot of the controller, with a state record first when it changed
+        state = STATES.index(controller_state(controller))
+        cwnd = controller.get_Window()
+        ssthresh = getattr(controller, 'sshThresh', 0)
+        srtt = rtt.srtt or 0
+        if state != self.last_state:
+            self.record(STATE, now, cwnd, ssthresh, srtt, in_flight, state, -1 if self.last_state is None else self.last_state)
+            self.last_state = state
+        self.record(event, now, cwnd, ssthresh, srtt, in_flight, state, value)
+
+    def rows(self):
+        # Records oldest first
+        width = len(FIELDS)
+        start = self.count - len(self)
+        for index in range(start, self.count):
+            offset = (index % self.capacity) * width
+            yield self.records[offset:offset + width]
+
+    def export(self, path):
+        # .csv is written as text with event and state names, anything else binary
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(FIELDS)
+                for row in self.rows():
+                    row = list(row)
+                    row[1] = EVENTS[int(row[1])]
+                    row[6] = STATES[int(row[6])]
+                    writer.writerow(row)
+            return
+
+        with open(path, 'wb') as f:
+            f.write(BINARY_HEADER.pack(MAGIC, VERSION, len(FIELDS), len(self)))
+            for row in self.rows():
+                if sys.byteorder != 'little':
+                    row.byteswap()
+                f.write(row.tobytes())
+
+
+def load(path):
+    # {field: list} from either export format, event and state as names
+    columns = {field: [] for field in FIELDS}
+    with open(path, 'rb') as f:
+        head = f.read(BINARY_HEADER.size)
+        if head[:len(MAGIC)] == MAGIC:
+            _, _, width, count = BINARY_HEADER.unpack(head)
+            values = array('d')
+            values.frombytes(f.read(8 * width * count))
+            if sys.byteorder != 'little':
+                values.byteswap()
+            for index, field in enumerate(FIELDS):
+                columns[field] = list(values[index::width])
+            columns['event'] = [EVENTS[int(code)] for code in columns['event']]
+            columns['state'] = [STATES[int(code)] for code in columns['state']]
+            return columns
+
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            for field in FIELDS:
+                columns[field].append(row[field] if field in ('event', 'state') else float(row[field]))
+    return columns
+
+
+def analyze(columns):
+    times = columns['time']
+    if not times:
+        return None
+    events = columns['event']
+    states = columns['state']
+
+    counts = {name: events.count(name) for name in EVENTS}
+    # Time spent in each state, each record's state holds until the next record
+    in_state = {}
+    for i in range(1, len(times)):
+        in_state[states[i - 1]] = in_state.get(states[i - 1], 0) + times[i] - times[i - 1]
+
+    transitions = [(times[i], STATES[int(columns['value'][i])] if columns['value'][i] >= 0 else None, states[i])
+                   for i in range(len(times)) if events[i] == 'state']
+
+    # Stalls: no ACK for several SRTTs, reported with what the sender looked like
+    stalls = []
+    last_ack = None
+    for i in range(len(times)):
+        if events[i] != 'ack':
+            continue
+        if last_ack is not None:
+            gap = times[i] - times[last_ack]
+            if gap > max(STALL_SRTTS * columns['srtt'][last_ack], MIN_STALL):
+                stalls.append({'start': times[last_ack] - times[0], 'length': gap, 'state': states[last_ack],
+                               'cwnd': columns['cwnd'][last_ack], 'in_flight': columns['in_flight'][last_ack]})
+        last_ack = i
+    stalls.sort(key=lambda stall: -stall['length'])
+
+    acks = [i for i in range(len(times)) if events[i] == 'ack']
+    cwnds = [columns['cwnd'][i] for i in acks] or columns['cwnd']
+    srtts = [columns['srtt'][i] for i in acks if columns['srtt'][i]]
+    return {
+        'duration': times[-1] - times[0],
+        'records': len(times),
+        'events': counts,
+        'time_in_state': in_state,
+        'transitions': len(transitions),
+        'cwnd_min': min(cwnds),
+        'cwnd_mean': sum(cwnds) / len(cwnds),
+        'cwnd_max': max(cwnds),
+        'srtt_min': min(srtts) if srtts else None,
+        'srtt_max': max(srtts) if srtts else None,
+        'max_dupacks': max((columns['value'][i] for i in acks), default=0),
+        'stalls': stalls,
+    }
+
+
+def print_analysis(analysis, top=5):
+    print(f"Duration: {round(analysis['duration'], 4)} s, {analysis['records']} records")
+    print('Events: ' + ', '.join(f'{name} {count}' for name, count in analysis['events'].items()))
+    print('Time in state: ' + ', '.join(f'{name} {round(seconds, 4)} s' for name, seconds in analysis['time_in_state'].items()))
+    print(f"State transitions: {analysis['transitions']}")
+    print(f"cwnd min/mean/max: {analysis['cwnd_min']:.0f} / {analysis['cwnd_mean']:.0f} / {analysis['cwnd_max']:.0f}")
+    if analysis['srtt_min'] is not None:
+        print(f"SRTT min/max: {round(analysis['srtt_min'], 6)} / {round(analysis['srtt_max'], 6)}")
+    print(f"Max duplicate ACKs: {analysis['max_dupacks']:.0f}")
+    print(f"Stalls: {len(analysis['stalls'])}")
+    for stall in analysis['stalls'][:top]:
+        print(f"  at {round(stall['start'], 4)} s for {round(stall['length'], 4)} s in {stall['state']}, "
+              f"cwnd {stall['cwnd']:.0f}, in flight {stall['in_flight']:.0f}")
+
+
+def plot(columns, output=None):
+    # matplotlib is only needed here, tracing and analysis work without it
+    try:
+        import matplotlib
+        if output:
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        raise SystemExit('plotting needs matplotlib (pip install matplotlib)')
+
+    start = columns['time'][0]
+    times = [t - start for t in columns['time']]
+    acks = [i for i, event in enumerate(columns['event']) if event == 'ack']
+
+    figure, (window_axis, rtt_axis) = plt.subplots(2, 1, sharex=True, figsize=(12, 7))
+    for field in ('cwnd', 'ssthresh', 'in_flight'):
+        window_axis.plot([times[i] for i in acks], [columns[field][i] for i in acks], label=field, linewidth=0.8)
+    for name, marker in (('retransmit', 'x'), ('timeout', 'v')):
+        marks = [i for i, event in enumerate(columns['event']) if event == name]
+        window_axis.scatter([times[i] for i in marks], [columns['cwnd'][i] for i in marks], marker=marker, label=name, zorder=3)
+    window_axis.set_ylabel('bytes')
+    window_axis.legend(loc='upper right')
+
+    rtt_axis.plot([times[i] for i in acks], [columns['srtt'][i] for i in acks], label='srtt', linewidth=0.8)
+    rtt_axis.set_ylabel('seconds')
+    rtt_axis.set_xlabel('time (s)')
+    for i, event in enumerate(columns['event']):
+        if event == 'state':
+            for axis in (window_axis, rtt_axis):
+                axis.axvline(times[i], color='grey', linewidth=0.4, alpha=0.5)
+
+    figure.tight_layout()
+    if output:
+        figure.savefig(output)
+    else:
+        plt.show()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze or plot a sender trace (written with sender.py --trace)')
+    parser.add_argument('trace', help='trace file, .csv or binary')
+    parser.add_argument('--plot', nargs='?', const='', metavar='PNG', help='plot the trace, to a file if given')
+    parser.add_argument('--stalls', type=int, default=5, help='longest stalls to list')
+    args = parser.parse_args(argv)
+
+    columns = load(args.trace)
+    analysis = analyze(columns)
+    if analysis is None:
+        print('Empty trace')
+        return
+    print_analysis(analysis, args.stalls)
+    if args.plot is not None:
+        plot(columns, args.plot or None)
+
+
+if __name__ == '__main__':
+    main()